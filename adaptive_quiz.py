@@ -0,0 +1,137 @@
+"""
+Adaptive quiz assembly from the question bank and recorded results.
+
+Each concept cluster of a document gets a target difficulty from the
+student's accuracy on it so far (quiz_store.cluster_accuracy): clusters they
+do well on get harder questions, weak ones easier questions, and the weakest
+clusters are visited first. An item's difficulty is the accuracy band it has
+actually shown once it has enough recorded answers, and its labeled
+difficulty before that.
+
+Bank items are indexed in buckets by (difficulty, cluster). The index is
+rebuilt only when the bank or the recorded answers change, so assembling a
+quiz is a handful of bucket lookups. Slots no bucket can fill are returned as
+per-difficulty counts for the LLM to generate.
+"""
+import random
+import threading
+
+import question_bank
+import quiz_store
+import sharding
+
+DIFFICULTIES = quiz_store.DIFFICULTIES
+# Accuracy assumed for clusters and concepts without recorded answers
+PRIOR_ACCURACY = 0.65
+# Accuracy at or above which questions step up to Medium / Hard
+LEVEL_UP_MEDIUM = 0.5
+LEVEL_UP_HARD = 0.8
+
+_lock = threading.Lock()
+_indexes = {}
+
+
+def target_level(accuracy):
+    """Difficulty index (0 Easy .. 2 Hard) to ask next at a given accuracy."""
+    if accuracy >= LEVEL_UP_HARD:
+        return 2
+    if accuracy >= LEVEL_UP_MEDIUM:
+        return 1
+    return 0
+
+
+def item_level(item, stats):
+    """An item's difficulty index: observed once it has enough answers, else its label."""
+    answered, correct = stats.get(sharding.question_key(item["question"]), (0, 0))
+    if answered >= quiz_store.MIN_CALIBRATION_ANSWERS:
+        easy_band, medium_band = quiz_store.CALIBRATION_BANDS
+        rate = correct / answered
+        return 0 if rate >= easy_band else 1 if rate >= medium_band else 2
+    level = item.get("difficulty")
+    return DIFFICULTIES.index(level) if level in DIFFICULTIES else 1
+
+
+def build_index(items, stats):
+    """Bucket items as {(difficulty index, cluster): [item, ...]}, shuffled within buckets."""
+    buckets = {}
+    for item in items:
+        buckets.setdefault((item_level(item, stats), item.get("cluster")), []).append(item)
+    for bucket in buckets.values():
+        random.shuffle(bucket)
+    return buckets
+
+
+def _index(doc_hash):
+    """(buckets, cluster accuracy, overall accuracy) for a document, rebuilt when its bank or answers change."""
+    items = question_bank.load_bank(doc_hash)["mcqs"]
+    answers = quiz_store.load_columns(doc_hash)
+    version = (len(items), len(answers["id"]))
+    with _lock:
+        cached = _indexes.get(doc_hash)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+    stats = quiz_store.question_stats(doc_hash) if len(answers["id"]) else {}
+    entry = (
+        build_index(list(items), stats),
+        quiz_store.cluster_accuracy(doc_hash),
+        float(answers["is_correct"].mean()) if len(answers["id"]) else PRIOR_ACCURACY,
+    )
+    with _lock:
+        _indexes[doc_hash] = (version, entry)
+    return entry
+
+
+def concept_level(doc_hash, concept):
+    """Difficulty to ask next for a focus concept, from its recorded accuracy."""
+    for row in quiz_store.concept_accuracy(doc_hash):
+        if row["concept"].strip().lower() == concept.strip().lower():
+            return DIFFICULTIES[target_level(row["accuracy"])]
+    return DIFFICULTIES[target_level(_index(doc_hash)[2])]
+
+
+def assemble(doc_hash, num_questions, exclude_questions=()):
+    """
+    Pick bank items matched to the student's level in each cluster.
+    Args:
+        doc_hash: Document whose bank and recorded answers are used
+        num_questions: Questions wanted
+        exclude_questions: Questions not to serve again (e.g. seen this session)
+    Returns:
+        tuple: (items, {difficulty: count the LLM still has to generate})
+    """
+    buckets, accuracy, overall = _index(doc_hash)
+    used = {sharding.question_key(q) for q in exclude_questions}
+    positions = dict.fromkeys(buckets, 0)
+
+    def take(key):
+        bucket = buckets.get(key, ())
+        while positions.get(key, 0) < len(bucket):
+            item = bucket[positions[key]]
+            positions[key] += 1
+            item_key = sharding.question_key(item["question"])
+            if item_key not in used:
+                used.add(item_key)
+                return item
+        return None
+
+    # Weakest clusters first, one question per cluster per round
+    clusters = sorted({cluster for _, cluster in buckets},
+                      key=lambda cluster: (accuracy.get(cluster, PRIOR_ACCURACY), str(cluster)))
+    picked = []
+    while clusters and len(picked) < num_questions:
+        for cluster in list(clusters):
+            if len(picked) >= num_questions:
+                break
+            level = target_level(accuracy.get(cluster, PRIOR_ACCURACY))
+            # Nearest level with an unused item, preferring the easier neighbour
+            for candidate in (level, level - 1, level + 1, level - 2, level + 2):
+                item = take((candidate, cluster)) if 0 <= candidate < len(DIFFICULTIES) else None
+                if item:
+                    picked.append(dict(item, difficulty=DIFFICULTIES[candidate]))
+                    break
+            else:
+                clusters.remove(cluster)  # nothing left for this cluster
+
+    missing = num_questions - len(picked)
+    needed = {DIFFICULTIES[target_level(overall)]: missing} if missing else {}
+    return picked, needed
@@ -0,0 +1,118 @@
+"""
+Concurrent load test against a chat completions endpoint.
+
+By default it starts the local mock server so it runs fully offline:
+    python benchmarks/bench_llm_load.py --requests 200 --concurrency 16
+
+Point it at any other server (e.g. a mock started separately) with:
+    GROK_API_URL=http://127.0.0.1:8000/v1/chat/completions python benchmarks/bench_llm_load.py
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import mock_llm_server  # noqa: E402
+
+PROMPTS = {
+    "flashcards": "Create 5 flashcards based on the entire PDF from the following content.",
+    "mcq": "Create 5 multiple choice questions from the following content.",
+    "summary": "Create a concise summary of approximately 200 words.",
+}
+
+
+def send_request(url, api_key, model, prompt, stream, timeout):
+    """Send one completion request. Returns (status, seconds, time_to_first_byte)."""
+    body = json.dumps({
+        "model": model,
+        "messages": [{"role": "user", "content": prompt}],
+        "max_tokens": 512,
+        "stream": stream,
+    }).encode()
+    request = urllib.request.Request(url, data=body, headers={
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json",
+    })
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            first = response.read(1)
+            ttfb = time.perf_counter() - start
+            response.read()
+            return response.status, time.perf_counter() - start, ttfb if first else None
+    except urllib.error.HTTPError as e:
+        return e.code, time.perf_counter() - start, None
+    except Exception:
+        return "timeout", time.perf_counter() - start, None
+
+
+def percentile(values, pct):
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--kind", choices=sorted(PROMPTS), default="mcq")
+    parser.add_argument("--stream", action="store_true")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--latency", default="lognormal:0.3:0.5", help="Latency spec for the built-in mock")
+    parser.add_argument("--error-rate", type=float, default=0.02)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.03)
+    args = parser.parse_args()
+
+    url = os.getenv("GROK_API_URL")
+    server = None
+    if not url:
+        config = mock_llm_server.MockConfig(
+            latency=args.latency,
+            error_rate=args.error_rate,
+            rate_limit_rate=args.rate_limit_rate,
+            think_rate=0.5,
+            seed=0,
+        )
+        server, url = mock_llm_server.start_background_server(config=config)
+    api_key = os.getenv("GROK_API_KEY", "mock-key")
+    model = os.getenv("GROK_MODEL", "qwen/qwen3-32b")
+
+    print(f"Target: {url}  requests={args.requests}  concurrency={args.concurrency}  stream={args.stream}")
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(
+            lambda _: send_request(url, api_key, model, PROMPTS[args.kind], args.stream, args.timeout),
+            range(args.requests),
+        ))
+    wall = time.perf_counter() - start
+
+    ok = [seconds for status, seconds, _ in results if status == 200]
+    ttfb = [first for status, _, first in results if status == 200 and first is not None]
+    statuses = {}
+    for status, _, _ in results:
+        statuses[status] = statuses.get(status, 0) + 1
+
+    print(f"Wall time: {wall:.2f}s  throughput: {len(results) / wall:.1f} req/s")
+    print(f"Status counts: {statuses}")
+    if ok:
+        print(f"Latency  p50={percentile(ok, 50):.3f}s  p95={percentile(ok, 95):.3f}s  "
+              f"p99={percentile(ok, 99):.3f}s  mean={statistics.mean(ok):.3f}s")
+    if ttfb:
+        print(f"TTFB     p50={percentile(ttfb, 50):.3f}s  p95={percentile(ttfb, 95):.3f}s")
+
+    if server:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+"""
+Fuzz corpus and throughput benchmark for the text-format MCQ / flashcard parser.
+
+    python benchmarks/bench_parser.py                  # run on benchmarks/parser_corpus.jsonl
+    python benchmarks/bench_parser.py --write-corpus   # regenerate the corpus
+    python benchmarks/bench_parser.py --cases 2000     # fresh fuzzed cases instead of the corpus
+
+Each corpus case is a response in a format variant seen from the models
+(numbering, A. / A) / (A) options, bold markers, one-line items, <think>
+blocks, preambles, CRLF, truncation) with the items it should yield, plus
+REGRESSION_CASES whose option or question text looks like a marker. The
+report compares qa_parser with the line-splitting parsers it replaced:
+items recovered, and responses that parse to nothing, each of which used to
+cost a create_simple_* fallback LLM call.
+"""
+import argparse
+import json
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import qa_parser  # noqa: E402
+
+CORPUS = Path(__file__).resolve().parent / "parser_corpus.jsonl"
+
+MCQ_FACTS = [
+    ("Which library is used for semantic search?", ["FAISS", "ReportLab", "Pandas", "Streamlit"], "A"),
+    ("What does PyMuPDF extract?", ["Audio", "Text from PDFs", "Images from video", "Spreadsheets"], "B"),
+    ("Which technique retrieves context before generation?", ["Fine-tuning", "Pruning", "RAG", "Quantization"], "C"),
+    ("What do sentence embeddings capture?", ["Meaning", "File size", "Font style", "Page count"], "A"),
+    ("Which measure compares two embeddings?", ["Word count", "Cosine similarity", "Page number", "Line length"], "B"),
+    ("What is the capital of France?", ["Berlin", "Madrid", "Rome", "Paris"], "D"),
+    ("Which gas do plants absorb during photosynthesis?", ["Oxygen", "Carbon dioxide", "Nitrogen", "Helium"], "B"),
+    ("What is 2 + 2?", ["3", "4", "5", "22"], "B"),
+]
+FLASHCARD_FACTS = [
+    ("What does RAG stand for?", "RAG stands for Retrieval-Augmented Generation."),
+    ("What does FAISS provide?", "FAISS provides fast similarity search over dense vectors."),
+    ("What is an embedding?", "An embedding is a numeric vector that represents the meaning of a text."),
+    ("What is cosine similarity?", "Cosine similarity measures the angle between two vectors."),
+    ("What does an LLM generate?", "An LLM generates text one token at a time."),
+    ("Why chunk a long document?", "Chunking keeps each request within the model's context window."),
+]
+PREAMBLES = ["", "Here are the questions:\n\n", "Sure! Below are your items.\n", "### Study set\n\n"]
+# Share of responses that follow the requested format exactly
+CANONICAL_SHARE = 0.4
+THINK = "<think>\nThe user wants questions. A) maybe? Q: draft\n</think>\n"
+
+# Hand-written responses whose option or question text looks like a marker
+REGRESSION_CASES = [
+    {"kind": "mcqs",
+     "text": "Q: When was the town founded?\nA) In 1066\nB) Founded c. 1200 AD\nC) In 1300\nD) In 1400\n"
+             "Correct Answer: B",
+     "expected": [{"question": "When was the town founded?",
+                   "options": ["In 1066", "Founded c. 1200 AD", "In 1300", "In 1400"], "correct_answer": "B"}]},
+    {"kind": "mcqs",
+     "text": "Q: Which vitamin is made in the skin?\nA) Vitamin A\nB) Vitamin B12\n"
+             "C) Vitamin d. Also known as calciferol\nD) None is correct.\nCorrect Answer: C",
+     "expected": [{"question": "Which vitamin is made in the skin?",
+                   "options": ["Vitamin A", "Vitamin B12", "Vitamin d. Also known as calciferol",
+                               "None is correct."], "correct_answer": "C"}]},
+    {"kind": "mcqs",
+     "text": "Q: Which form field is labelled Answer: yes/no?\nA) Consent\nB) Name\nC) Date\nD) Address\n"
+             "Correct Answer: A\n\nQ: What does A: mean in a DNS record?\nA) An address record\n"
+             "B) An alias\nC) A mail server\nD) A text note\nCorrect Answer: A",
+     "expected": [{"question": "Which form field is labelled Answer: yes/no?",
+                   "options": ["Consent", "Name", "Date", "Address"], "correct_answer": "A"},
+                  {"question": "What does A: mean in a DNS record?",
+                   "options": ["An address record", "An alias", "A mail server", "A text note"],
+                   "correct_answer": "A"}]},
+    {"kind": "mcqs",
+     "text": "Q: Which deficiency does vitamin A) treat? A) Night blindness B) Scurvy C) Rickets D) Anemia "
+             "Correct Answer: A",
+     "expected": [{"question": "Which deficiency does vitamin A) treat?",
+                   "options": ["Night blindness", "Scurvy", "Rickets", "Anemia"], "correct_answer": "A"}]},
+    {"kind": "flashcards",
+     "text": "Q: What does A: mean in a DNS record?\nA: It maps a name to an IPv4 address.\n\n"
+             "Q: What is the Answer: field on the form?\nA: Where the student writes the result.",
+     "expected": [{"question": "What does A: mean in a DNS record?",
+                   "answer": "It maps a name to an IPv4 address."},
+                  {"question": "What is the Answer: field on the form?",
+                   "answer": "Where the student writes the result."}]},
+]
+
+
+# ==================== Legacy parsers (before qa_parser) ====================
+def legacy_parse_mcqs(text):
+    mcqs = []
+    for block in re.split(r'(?:^|\n)\s*Q[:\.]?\s*', text, flags=re.IGNORECASE):
+        lines = block.strip().split('\n')
+        if len(lines) < 5 or not lines[0].strip():
+            continue
+        options, correct_answer = [], None
+        for line in lines[1:]:
+            line = line.strip()
+            if line.startswith(('A)', 'A.', 'B)', 'B.', 'C)', 'C.', 'D)', 'D.')):
+                options.append(line[2:].strip())
+            elif line.startswith('Correct Answer:'):
+                correct = line.split(':')[1].strip().upper()
+                if correct in ['A', 'B', 'C', 'D']:
+                    correct_answer = correct
+        if len(options) == 4 and correct_answer:
+            mcqs.append({"question": lines[0].strip(), "options": options, "correct_answer": correct_answer})
+    return mcqs
+
+
+def legacy_parse_flashcards(text):
+    cards = []
+    for raw in text.strip().split("\n\n"):
+        lines = raw.strip().split('\n')
+        if len(lines) >= 2 and lines[0].startswith("Q:") and lines[1].startswith("A:"):
+            cards.append({"question": lines[0][2:].strip(), "answer": lines[1][2:].strip()})
+    return cards
+
+
+# ==================== Fuzzer ====================
+def fuzz_mcq(rng, count):
+    facts = rng.sample(MCQ_FACTS, count)
+    q_style = rng.choice(["Q: {q}", "Q{n}: {q}", "{n}. {q}", "{n}) {q}", "Question {n}: {q}",
+                          "**Q{n}:** {q}", "**{n}. {q}**", "### Question {n}\n{q}"])
+    o_style = rng.choice(["{l}) {o}", "{l}. {o}", "({l}) {o}", "{ll}) {o}", "**{l})** {o}", "- {l}) {o}"])
+    a_style = rng.choice(["Correct Answer: {l}", "**Correct Answer:** {l}", "Answer: {l}",
+                          "Correct Answer: {l}) {o}", "Correct answer: ({l})", "Correct Answer: {o}"])
+    if rng.random() < CANONICAL_SHARE:
+        q_style, o_style, a_style = "Q: {q}", "{l}) {o}", "Correct Answer: {l}"
+    one_line = rng.random() < 0.15
+    if one_line:
+        # Options inside a line are only recognised as uppercase "A)" / "A."
+        o_style = rng.choice(["{l}) {o}", "{l}. {o}", "**{l})** {o}"])
+    blocks = []
+    for n, (question, options, correct) in enumerate(facts, 1):
+        head = q_style.format(n=n, q=question)
+        opts = [o_style.format(l="ABCD"[i], ll="abcd"[i], o=option) for i, option in enumerate(options)]
+        answer = a_style.format(l=correct, o=options["ABCD".index(correct)])
+        blocks.append(" ".join([head] + opts + [answer]) if one_line else "\n".join([head] + opts + [answer]))
+    expected = [{"question": q, "options": o, "correct_answer": c} for q, o, c in facts]
+    return _wrap(rng, blocks, expected)
+
+
+def fuzz_flashcards(rng, count):
+    facts = rng.sample(FLASHCARD_FACTS, count)
+    style = rng.choice(["Q: {q}\nA: {a}", "Question: {q}\nAnswer: {a}", "{n}. Q: {q} A: {a}",
+                        "**Q:** {q}\n**A:** {a}", "Q{n}: {q}\nA{n}: {a}", "Q: {q}\nA: {wrapped}"])
+    if rng.random() < CANONICAL_SHARE:
+        style = "Q: {q}\nA: {a}"
+    blocks = []
+    for n, (question, answer) in enumerate(facts, 1):
+        wrapped = answer.replace(" ", "\n", 1) if " " in answer else answer
+        blocks.append(style.format(n=n, q=question, a=answer, wrapped=wrapped))
+    expected = [{"question": q, "answer": " ".join(a.split())} for q, a in facts]
+    return _wrap(rng, blocks, expected)
+
+
+def _wrap(rng, blocks, expected):
+    separator = rng.choice(["\n\n", "\n\n", "\n"])
+    text = rng.choice(PREAMBLES) + separator.join(blocks)
+    if rng.random() < 0.25:
+        text = THINK + text
+    if rng.random() < 0.2:
+        text += "\n\nLet me know if you need more!"
+    if rng.random() < 0.15:
+        # Truncated at max_tokens: the last item is cut mid-way
+        text = text[:text.rindex(blocks[-1]) + len(blocks[-1]) // 2]
+        expected = expected[:-1]
+    if rng.random() < 0.2:
+        text = text.replace("\n", "\r\n")
+    return text, expected
+
+
+def make_cases(num_cases, seed=0):
+    rng = random.Random(seed)
+    cases = []
+    for _ in range(num_cases):
+        kind = rng.choice(["mcqs", "flashcards"])
+        if kind == "mcqs":
+            text, expected = fuzz_mcq(rng, rng.randint(2, 6))
+        else:
+            text, expected = fuzz_flashcards(rng, rng.randint(2, 6))
+        cases.append({"kind": kind, "text": text, "expected": expected})
+    return cases
+
+
+# ==================== Benchmark ====================
+PARSERS = {
+    "legacy": {"mcqs": legacy_parse_mcqs, "flashcards": legacy_parse_flashcards},
+    "qa_parser": {"mcqs": qa_parser.parse_mcqs, "flashcards": qa_parser.parse_flashcards},
+}
+
+
+def evaluate(name, cases, repeats=5):
+    parsers = PARSERS[name]
+    recovered = wanted = empty = 0
+    for case in cases:
+        got = parsers[case["kind"]](case["text"])
+        wanted += len(case["expected"])
+        recovered += sum(1 for item in case["expected"] if item in got)
+        empty += not got and bool(case["expected"])
+    size = sum(len(case["text"]) for case in cases)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for case in cases:
+            parsers[case["kind"]](case["text"])
+    seconds = (time.perf_counter() - start) / repeats
+    print(f"{name:<10} items recovered={recovered:>5}/{wanted:<5} ({recovered / max(1, wanted):6.1%})  "
+          f"fallback calls={empty:>4}/{len(cases)}  "
+          f"throughput={size / seconds / 1e6:6.2f} MB/s ({len(cases) / seconds:,.0f} responses/s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--write-corpus", action="store_true", help="regenerate parser_corpus.jsonl")
+    parser.add_argument("--cases", type=int, default=0, help="use this many fresh fuzzed cases")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.write_corpus:
+        cases = make_cases(args.cases or 300, args.seed) + REGRESSION_CASES
+        CORPUS.write_text("".join(json.dumps(case) + "\n" for case in cases), encoding="utf-8")
+        print(f"Wrote {len(cases)} cases to {CORPUS}")
+        return
+    if args.cases:
+        cases = make_cases(args.cases, args.seed) + REGRESSION_CASES
+    else:
+        cases = [json.loads(line) for line in CORPUS.read_text(encoding="utf-8").splitlines() if line]
+    print(f"Cases: {len(cases)} ({sum(c['kind'] == 'mcqs' for c in cases)} MCQ responses, "
+          f"{sum(c['kind'] == 'flashcards' for c in cases)} flashcard responses)")
+    for name in PARSERS:
+        evaluate(name, cases)
+
+
+if __name__ == "__main__":
+    main()
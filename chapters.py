@@ -0,0 +1,173 @@
+"""
+Chapter detection and chapter-wise summaries.
+
+Chapters come from the PDF outline (PyMuPDF's doc.get_toc()) when there is
+one, otherwise from heading-like lines at the top of pages. Each chapter is a
+page range and is summarized on its own, so one chapter can be summarized
+without paying for the whole book, and chapter summaries are cached per
+chapter text:
+
+    chapter = {"title": "3 Attention", "level": 1, "start_page": 41, "end_page": 58}
+
+Page numbers are 1-based and inclusive.
+"""
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import chunking
+import summary
+import summary_cache
+
+CHAPTER_MAX_WORKERS = int(os.getenv("CHAPTER_MAX_WORKERS", "3"))
+
+# Heuristic fallback only treats top-level headings as chapter starts
+_CHAPTER_HEADING = re.compile(
+    r"^(?:(?:chapter|part|unit)\s+[\dIVXLC]+\b.*|\d{1,2}\.?\s+[A-Z][^.!?]{0,80})$",
+    re.IGNORECASE
+)
+# Lines looked at on each page when searching for a chapter heading
+HEADING_SCAN_LINES = 5
+
+
+def outline_chapters(toc, num_pages):
+    """
+    Turn a PyMuPDF outline ([[level, title, page], ...]) into chapter page ranges.
+    Uses the shallowest outline level that has more than one entry, so a book
+    whose outline is a single title entry falls through to its chapters.
+    """
+    entries = [(level, title.strip(), page) for level, title, page, *_ in toc or [] if page and page > 0]
+    if not entries:
+        return []
+    levels = sorted({level for level, _, _ in entries})
+    top = next((lvl for lvl in levels if sum(1 for e in entries if e[0] == lvl) > 1), levels[0])
+    starts = [(title, min(page, num_pages)) for level, title, page in entries if level == top]
+
+    chapters = []
+    for i, (title, start) in enumerate(starts):
+        end = starts[i + 1][1] - 1 if i + 1 < len(starts) else num_pages
+        chapters.append({
+            "title": title or f"Chapter {i + 1}",
+            "level": top,
+            "start_page": start,
+            "end_page": max(start, end),
+        })
+    # Front matter before the first outline entry
+    if chapters and chapters[0]["start_page"] > 1:
+        chapters.insert(0, {"title": "Front matter", "level": top, "start_page": 1,
+                            "end_page": chapters[0]["start_page"] - 1})
+    return chapters
+
+
+def heading_chapters(pages):
+    """Fallback: start a chapter on each page whose first lines hold a chapter heading."""
+    starts = []
+    for number, page in enumerate(pages, 1):
+        lines = [line.strip() for line in page.splitlines() if line.strip()][:HEADING_SCAN_LINES]
+        for line in lines:
+            if chunking.is_heading(line) and _CHAPTER_HEADING.match(line):
+                starts.append((line, number))
+                break
+    if len(starts) < 2:
+        return []
+    return outline_chapters([[1, title, page] for title, page in starts], len(pages))
+
+
+def detect_chapters(pages, toc=None):
+    """Chapters from the outline when available, otherwise from page headings."""
+    if not pages:
+        return []
+    return outline_chapters(toc, len(pages)) or heading_chapters(pages)
+
+
+def chapter_pages(pages, chapter):
+    return pages[chapter["start_page"] - 1:chapter["end_page"]]
+
+
+def chapter_label(chapter):
+    if chapter["start_page"] == chapter["end_page"]:
+        return f"{chapter['title']} (p. {chapter['start_page']})"
+    return f"{chapter['title']} (pp. {chapter['start_page']}-{chapter['end_page']})"
+
+
+def summarize_chapter(pages, chapter, num_words, focus, grok_api_key, grok_api_url, grok_model,
+                      max_workers=summary.SUMMARY_MAX_WORKERS, use_cache=True, doc_hash=None):
+    """
+    Summarize one chapter's page range. The finished summary is cached by
+    document, chapter, length and focus, on top of summarize_pdf's chunk cache.
+    Returns:
+        tuple: (summary text, timings dict)
+    """
+    section = chapter_pages(pages, chapter)
+    text = "".join(page + "\n" for page in section)
+    doc_hash = doc_hash or summary_cache.document_hash("".join(page + "\n" for page in pages))
+    if use_cache:
+        cached = summary_cache.get_chapter(doc_hash, chapter, num_words, focus)
+        if cached:
+            return cached, {"cached_chapter": True}
+
+    timings = {}
+    result = summary.summarize_pdf(
+        text, num_words, focus, grok_api_key, grok_api_url, grok_model,
+        max_workers=max_workers, timings=timings, use_cache=use_cache, pages=section
+    )
+    if use_cache and not result.startswith("[Error]"):
+        summary_cache.put_chapter(doc_hash, chapter, num_words, focus, result)
+    return result, timings
+
+
+def summarize_chapters(pages, chapters, num_words, focus, grok_api_key, grok_api_url, grok_model,
+                       max_workers=CHAPTER_MAX_WORKERS, use_cache=True, timings=None, on_progress=None,
+                       doc_hash=None):
+    """
+    Summarize several chapters in parallel.
+    Args:
+        pages: Per-page texts of the document
+        chapters: Chapters to summarize (from detect_chapters)
+        num_words: Target words per chapter summary
+        max_workers: Chapters summarized at once; each chapter's map phase
+            shares the summary worker budget
+        timings: Optional dict filled with chapters, cached_chapters, total_seconds
+        on_progress: Optional callback on_progress("chapter", done, total, index, text),
+            called from the caller's thread as each chapter finishes
+        doc_hash: Optional summary_cache.document_hash of the whole document (saves re-hashing it)
+    Returns:
+        list[str]: Chapter summaries in the order of chapters
+    """
+    start = time.perf_counter()
+    results = [None] * len(chapters)
+    cached = 0
+    workers = max(1, min(max_workers, len(chapters)))
+    inner_workers = max(1, summary.SUMMARY_MAX_WORKERS // workers)
+    doc_hash = doc_hash or summary_cache.document_hash("".join(page + "\n" for page in pages))
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(summarize_chapter, pages, chapter, num_words, focus,
+                            grok_api_key, grok_api_url, grok_model, inner_workers, use_cache, doc_hash): idx
+            for idx, chapter in enumerate(chapters)
+        }
+        for done, future in enumerate(as_completed(futures), 1):
+            idx = futures[future]
+            try:
+                results[idx], chapter_timings = future.result()
+                cached += bool(chapter_timings.get("cached_chapter"))
+            except Exception as e:
+                print(f"[chapters] Chapter '{chapters[idx]['title']}' failed: {e}")
+                results[idx] = f"[Error] Could not summarize this chapter: {e}"
+            if on_progress:
+                on_progress("chapter", done, len(chapters), idx, results[idx])
+
+    if timings is not None:
+        timings.update({
+            "chapters": len(chapters),
+            "cached_chapters": cached,
+            "total_seconds": round(time.perf_counter() - start, 2),
+        })
+    return results
+
+
+def format_chapter_summaries(chapters, summaries):
+    """Join chapter summaries into one text with a title line per chapter."""
+    return "\n\n".join(f"{chapter_label(chapter)}:\n{text}" for chapter, text in zip(chapters, summaries))
@@ -0,0 +1,123 @@
+"""
+Structure-aware chunking for summarization.
+
+Instead of cutting the text every N characters, whole paragraphs are packed
+into chunks up to a token budget. A new chunk is preferred at section headings,
+and page breaks from extraction count as paragraph boundaries. Only a paragraph
+that is larger than the budget on its own is split, first at sentence
+boundaries and then by tokens.
+"""
+import re
+
+import token_budget
+
+DEFAULT_CHUNK_TOKENS = 2500
+
+_PARAGRAPH_SPLIT = re.compile(r"\n\s*\n")
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9\"'(\[])")
+_HEADING = re.compile(
+    r"^(?:"
+    r"(?:chapter|section|part|unit|appendix)\s+[\dIVXLC]+[.:]?(?:\s+.*)?"  # Chapter 3 / Section IV: ...
+    r"|\d+(?:\.\d+){0,3}\.?\s+[A-Z][^.!?]{0,80}"                        # 2.1 Title
+    r"|[A-Z][A-Z0-9 ,:&'\-]{3,80}"                                      # ALL CAPS TITLE
+    r")$",
+    re.IGNORECASE
+)
+
+
+def is_heading(paragraph):
+    """Heuristic: a short single line that looks like a chapter/section title."""
+    line = paragraph.strip()
+    if not line or "\n" in line or len(line) > 90 or line.endswith((".", ",", ";")):
+        return False
+    if line[0].isdigit() or line.lower().startswith(("chapter", "section", "part", "unit", "appendix")):
+        return bool(_HEADING.match(line))
+    return line.isupper() and bool(_HEADING.match(line))
+
+
+def split_paragraphs(text):
+    paragraphs = []
+    for block in _PARAGRAPH_SPLIT.split(text):
+        block = block.strip()
+        if not block:
+            continue
+        # A heading glued to its first paragraph by a single newline gets its own block
+        first, _, rest = block.partition("\n")
+        if rest and is_heading(first):
+            paragraphs.append(first.strip())
+            block = rest.strip()
+        paragraphs.append(block)
+    return paragraphs
+
+
+def _split_oversized(paragraph, max_tokens):
+    """Split a paragraph bigger than max_tokens at sentence boundaries (then by tokens)."""
+    pieces, current, current_tokens = [], [], 0
+    for sentence in _SENTENCE_SPLIT.split(paragraph):
+        tokens = token_budget.count_tokens(sentence)
+        if tokens > max_tokens:
+            if current:
+                pieces.append(" ".join(current))
+                current, current_tokens = [], 0
+            pieces.extend(token_budget.split_by_tokens(sentence, max_tokens))
+            continue
+        if current and current_tokens + tokens > max_tokens:
+            pieces.append(" ".join(current))
+            current, current_tokens = [], 0
+        current.append(sentence)
+        current_tokens += tokens
+    if current:
+        pieces.append(" ".join(current))
+    return pieces
+
+
+def chunk_for_summary(text, max_tokens=DEFAULT_CHUNK_TOKENS, pages=None):
+    """
+    Pack whole paragraphs into chunks of at most max_tokens tokens.
+    Args:
+        text: Full document text (used when pages is not given)
+        max_tokens: Token budget per chunk
+        pages: Optional list of per-page texts from extraction; page breaks are
+            treated as paragraph boundaries
+    Returns:
+        list[str]: Chunks in document order
+    """
+    if pages:
+        paragraphs = [p for page in pages for p in split_paragraphs(page)]
+    else:
+        paragraphs = split_paragraphs(text or "")
+
+    chunks, current, current_tokens = [], [], 0
+
+    def flush():
+        nonlocal current, current_tokens
+        if current:
+            chunks.append("\n\n".join(current))
+        current, current_tokens = [], 0
+
+    for paragraph in paragraphs:
+        tokens = token_budget.count_tokens(paragraph)
+        # Start a new chunk at a heading once the current one is mostly full
+        if is_heading(paragraph) and current_tokens > max_tokens * 3 // 4:
+            flush()
+        if tokens > max_tokens:
+            flush()
+            chunks.extend(_split_oversized(paragraph, max_tokens))
+            continue
+        if current and current_tokens + tokens > max_tokens:
+            # Don't leave a heading stranded at the end of a chunk
+            carried = current.pop() if len(current) > 1 and is_heading(current[-1]) else None
+            if carried:
+                current_tokens -= token_budget.count_tokens(carried)
+            flush()
+            if carried:
+                current, current_tokens = [carried], token_budget.count_tokens(carried)
+        current.append(paragraph)
+        current_tokens += tokens
+    flush()
+    return chunks
+
+
+def fixed_chunks(text, max_chars=10000):
+    """The original fixed-size character slicing, kept for comparison."""
+    return [text[i:i + max_chars] for i in range(0, len(text), max_chars)]
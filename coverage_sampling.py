@@ -0,0 +1,103 @@
+"""
+Coverage-aware sampling of source passages for flashcards and MCQs.
+
+Instead of the first pages (text[:3000]) or one generic summary, the stored
+paragraph embeddings are clustered with k-means (one cluster per requested
+card / question) and each cluster contributes its most representative
+passages in proportion to its size. Every topic of the document gets a say
+and the prompt stays within COVERAGE_MAX_TOKENS whatever the document size.
+"""
+import os
+
+import numpy as np
+
+import extractive
+import token_budget
+
+COVERAGE_MAX_TOKENS = int(os.getenv("COVERAGE_MAX_TOKENS", "3000"))
+KMEANS_ITERATIONS = 25
+# With a focus concept, clustering runs over this many of the most relevant passages per item
+FOCUS_CANDIDATES_PER_ITEM = 4
+
+
+def kmeans(vectors, k, iterations=KMEANS_ITERATIONS, seed=0):
+    """
+    Spherical k-means (cosine) with k-means++ seeding.
+    Returns:
+        tuple: (centroids of shape (k, dim), labels of shape (n,))
+    """
+    rng = np.random.default_rng(seed)
+    n = len(vectors)
+    k = max(1, min(k, n))
+    centroids = [vectors[rng.integers(n)]]
+    closest = 1.0 - vectors @ centroids[0]
+    for _ in range(1, k):
+        weights = np.maximum(closest, 0) ** 2
+        total = weights.sum()
+        pick = rng.choice(n, p=weights / total) if total > 0 else rng.integers(n)
+        centroids.append(vectors[pick])
+        closest = np.minimum(closest, 1.0 - vectors @ vectors[pick])
+    centroids = np.stack(centroids)
+
+    labels = None
+    for _ in range(iterations):
+        new_labels = np.argmax(vectors @ centroids.T, axis=1)
+        if labels is not None and np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        for c in range(k):
+            members = vectors[labels == c]
+            if len(members):
+                centroids[c] = extractive.normalize(members.sum(axis=0))
+    return centroids, labels
+
+
+def sample_passages(passages, embeddings, num_items, max_tokens=COVERAGE_MAX_TOKENS, focus_embedding=None):
+    """
+    Pick representative passages from every cluster, sized by cluster share.
+    Args:
+        passages: Passage texts (one per embedding row)
+        embeddings: Array of shape (len(passages), dim)
+        num_items: Cards / questions requested; sets the number of clusters
+        max_tokens: Token budget for the whole sample
+        focus_embedding: Optional query vector restricting the sample to relevant passages
+    Returns:
+        list[int]: Selected passage indices in document order
+    """
+    if not passages:
+        return []
+    vectors = extractive.normalize(embeddings)
+    tokens = np.array([token_budget.count_tokens(p) for p in passages])
+    candidates = np.flatnonzero((tokens >= extractive.MIN_PASSAGE_TOKENS) & (tokens <= max_tokens))
+    if not len(candidates):
+        return []
+    if focus_embedding is not None:
+        relevance = vectors[candidates] @ extractive.normalize(focus_embedding).reshape(-1)
+        keep = max(FOCUS_CANDIDATES_PER_ITEM * num_items, 20)
+        candidates = candidates[np.argsort(-relevance)[:keep]]
+
+    centroids, labels = kmeans(vectors[candidates], num_items)
+    selected, remaining = [], max_tokens
+    # Largest clusters first, so a tight budget still covers the main topics
+    sizes = np.bincount(labels, minlength=len(centroids))
+    for cluster in np.argsort(-sizes):
+        members = candidates[labels == cluster]
+        if not len(members) or remaining <= 0:
+            continue
+        quota = max_tokens * sizes[cluster] / len(candidates)
+        used = 0
+        for idx in members[np.argsort(-(vectors[members] @ centroids[cluster]))]:
+            if tokens[idx] > remaining or (used and used + tokens[idx] > quota):
+                continue
+            selected.append(int(idx))
+            used += tokens[idx]
+            remaining -= tokens[idx]
+            if used >= quota:
+                break
+    return sorted(selected)
+
+
+def sample_text(passages, embeddings, num_items, max_tokens=COVERAGE_MAX_TOKENS, focus_embedding=None):
+    """Join a coverage sample into prompt text (empty string if nothing qualifies)."""
+    picked = sample_passages(passages, embeddings, num_items, max_tokens, focus_embedding)
+    return "\n\n".join(passages[i] for i in picked)
@@ -0,0 +1,100 @@
+"""
+Embedding-based near-duplicate suppression for generated questions.
+
+Generated questions are embedded with the app's sentence embedder and compared
+(cosine, vectorized with NumPy) against each other and against questions the
+student has already seen this session. Paraphrases above DUPLICATE_THRESHOLD
+are dropped, and if that leaves the batch short a follow-up call asks for only
+the missing items, listing the existing questions to avoid.
+"""
+import os
+
+import numpy as np
+
+import extractive
+
+DUPLICATE_THRESHOLD = float(os.getenv("DUPLICATE_THRESHOLD", "0.9"))
+MAX_FOLLOWUPS = 1
+
+
+def embed_cached(texts, embed_fn, cache):
+    """
+    Embed texts, reusing vectors stored in cache (a dict text -> vector).
+    Returns:
+        np.ndarray: L2-normalized rows, one per text
+    """
+    missing = list(dict.fromkeys(t for t in texts if t not in cache))
+    if missing:
+        for text, vector in zip(missing, extractive.normalize(embed_fn(missing))):
+            cache[text] = vector
+    if not texts:
+        return np.zeros((0, 0), dtype="float32")
+    return np.stack([cache[t] for t in texts])
+
+
+def novel_mask(vectors, reference=None, threshold=DUPLICATE_THRESHOLD):
+    """
+    Which rows are not near-duplicates of a reference row or of an earlier row.
+    Args:
+        vectors: Normalized candidate rows (n, dim)
+        reference: Normalized rows already accepted (m, dim), or None
+    Returns:
+        np.ndarray: Boolean mask of length n
+    """
+    n = len(vectors)
+    keep = np.ones(n, dtype=bool)
+    if n == 0:
+        return keep
+    if reference is not None and len(reference):
+        keep &= (vectors @ reference.T).max(axis=1) < threshold
+    # Within the batch an item is a duplicate if an earlier kept item is too close
+    similar = np.triu(vectors @ vectors.T >= threshold, k=1)
+    for i in range(n):
+        if keep[i]:
+            keep[similar[i]] = False
+    return keep
+
+
+def generate_unique(generate, num_items, embed_fn, seen_questions=(), cache=None,
+                    threshold=DUPLICATE_THRESHOLD, max_followups=MAX_FOLLOWUPS):
+    """
+    Generate num_items items whose questions are not near-duplicates of each
+    other or of seen_questions.
+    Args:
+        generate: Callable generate(count, exclude_questions) -> list of item dicts
+        num_items: Items wanted
+        embed_fn: Callable mapping a list of texts to an embedding array
+        seen_questions: Questions already shown this session
+        cache: Optional dict reused across calls for question embeddings
+    Returns:
+        tuple: (items, number of near-duplicates suppressed)
+    """
+    cache = {} if cache is None else cache
+    seen_questions = [q for q in seen_questions if q]
+    reference = embed_cached(seen_questions, embed_fn, cache) if seen_questions else None
+    items, suppressed = [], 0
+
+    for attempt in range(max_followups + 1):
+        wanted = num_items - len(items)
+        if wanted <= 0:
+            break
+        exclude = seen_questions + [item["question"] for item in items] if attempt else seen_questions
+        batch = [item for item in generate(wanted, exclude) if item.get("question")]
+        if not batch:
+            break
+        vectors = embed_cached([item["question"] for item in batch], embed_fn, cache)
+        keep = novel_mask(vectors, reference, threshold)
+        suppressed += int((~keep).sum())
+        items.extend(item for item, kept in zip(batch, keep) if kept)
+        accepted = vectors[keep]
+        reference = accepted if reference is None else np.vstack([reference, accepted])
+    return items[:num_items], suppressed
+
+
+def exclusion_instruction(questions, limit=30):
+    """Prompt sentence asking the model not to repeat existing questions."""
+    recent = [q for q in questions if q][-limit:]
+    if not recent:
+        return ""
+    listed = "\n".join(f"- {q}" for q in recent)
+    return f"\nDo not repeat or paraphrase any of these existing questions:\n{listed}"
@@ -0,0 +1,240 @@
+"""
+Background document digest.
+
+When DIGEST_ON_UPLOAD is set, a background job reads the document once right
+after upload and stores a reusable digest for it:
+
+    {
+        "doc_hash": "...",
+        "sections": ["<~100-word summary of section 1>", ...],
+        "key_terms": [{"term": "...", "definition": "..."}, ...],
+        "condensed_text": "<~500-word study text covering every section>",
+        "seconds": 12.3
+    }
+
+Summaries then reduce the section summaries instead of re-reading the text,
+and flashcard / MCQ generation start from the condensed text instead of a
+blocking pre-summary call. Digests are JSON files under DIGEST_DIR (default
+.cache/digests), keyed by the document hash, so they survive restarts.
+
+Until a digest exists, condensed_text() makes one shared pre-summary call per
+document and caches it next to the digests, so flashcards and MCQs never pay
+for the same condensation twice.
+"""
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+import chunking
+import llm_client
+import structured_output
+import summary
+import summary_cache
+import token_budget
+
+DIGEST_DIR = Path(os.getenv("DIGEST_DIR", Path(__file__).resolve().parent / ".cache" / "digests"))
+DIGEST_ON_UPLOAD = os.getenv("DIGEST_ON_UPLOAD", "false").lower() in ("1", "true", "yes")
+
+SECTION_WORDS = 100
+CONDENSED_WORDS = 500
+NUM_KEY_TERMS = 20
+
+CONDENSE_INSTRUCTION = "Summarize the following content in 500 words to create flashcards and MCQs from:\n\n"
+
+# One digest job at a time; each job runs its own section workers
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="digest")
+_jobs_lock = threading.Lock()
+_jobs = {}
+_memory = {}
+_condense_locks = {}
+
+
+def _path(doc_hash):
+    return DIGEST_DIR / f"{doc_hash}.json"
+
+
+def load_digest(doc_hash):
+    """Return the stored digest for a document hash, or None."""
+    if doc_hash in _memory:
+        return _memory[doc_hash]
+    try:
+        digest = json.loads(_path(doc_hash).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    _memory[doc_hash] = digest
+    return digest
+
+
+def save_digest(digest):
+    path = _path(digest["doc_hash"])
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+        tmp.write_text(json.dumps(digest), encoding="utf-8")
+        os.replace(tmp, path)
+    except OSError as e:
+        print(f"[digest] Could not write {path}: {e}")
+    _memory[digest["doc_hash"]] = digest
+
+
+def extract_key_terms(sections, grok_api_key, grok_api_url, grok_model, num_terms=NUM_KEY_TERMS):
+    """One JSON-mode call listing the document's key terms with short definitions."""
+    template = (f'List the {num_terms} most important terms in this material with a one-sentence definition each. '
+                'Respond with JSON: {"terms": [{"term": "...", "definition": "..."}]}\n\nMaterial:\n')
+    material = token_budget.fit_to_budget("\n\n".join(sections), grok_model, 1024, prompt_template=template)
+    response = llm_client.complete(
+        template + material, grok_api_key, grok_api_url, grok_model,
+        feature="digest_terms", max_tokens=1024, temperature=0.2,
+        response_format=structured_output.JSON_RESPONSE_FORMAT
+    )
+    terms = []
+    for item in structured_output.extract_items(response, "terms"):
+        term = str(item.get("term", "")).strip()
+        if term:
+            terms.append({"term": term, "definition": str(item.get("definition", "")).strip()})
+    return terms[:num_terms]
+
+
+def condense_sections(sections, grok_api_key, grok_api_url, grok_model, num_words=CONDENSED_WORDS):
+    """Condense section summaries into one study text that still covers every section."""
+    sections, _ = summary.tree_reduce(sections, num_words, "all key aspects",
+                                      grok_api_key, grok_api_url, grok_model)
+    template = (f"Rewrite these section summaries as one study text of about {num_words} words. "
+                "Cover every section and keep definitions, facts and figures:\n\n")
+    material = token_budget.fit_to_budget("\n\n".join(sections), grok_model, 1024, prompt_template=template)
+    return summary.clean_generated_text(llm_client.complete(
+        template + material, grok_api_key, grok_api_url, grok_model,
+        feature="digest_condense", max_tokens=1024, temperature=0.3
+    ))
+
+
+def build_digest(text, grok_api_key, grok_api_url, grok_model, pages=None,
+                 max_workers=summary.SUMMARY_MAX_WORKERS):
+    """
+    Read the document once and build its digest.
+    Section summaries share the summary_cache entries of summarize_pdf.
+    Returns:
+        dict: The digest (also saved to disk)
+    """
+    start = time.perf_counter()
+    doc_hash = summary_cache.document_hash(text)
+    chunks = chunking.chunk_for_summary(text, chunking.DEFAULT_CHUNK_TOKENS, pages=pages) or [text]
+    sections = [summary_cache.get(doc_hash, idx, SECTION_WORDS, chunk) for idx, chunk in enumerate(chunks)]
+    pending = [idx for idx, cached in enumerate(sections) if cached is None]
+
+    if pending:
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(pending)))) as pool:
+            futures = {
+                pool.submit(summary.summarize_chunk, chunks[idx], SECTION_WORDS,
+                            grok_api_key, grok_api_url, grok_model): idx
+                for idx in pending
+            }
+            for future in as_completed(futures):
+                idx = futures[future]
+                try:
+                    sections[idx] = future.result()
+                except Exception as e:
+                    print(f"[digest] Section {idx + 1}/{len(chunks)} failed: {e}")
+                    continue
+                summary_cache.put(doc_hash, idx, SECTION_WORDS, chunks[idx], sections[idx])
+    sections = [section for section in sections if section]
+    if not sections:
+        raise RuntimeError(f"All {len(chunks)} sections failed to summarize")
+
+    try:
+        key_terms = extract_key_terms(sections, grok_api_key, grok_api_url, grok_model)
+    except Exception as e:
+        print(f"[digest] Key terms failed: {e}")
+        key_terms = []
+    if len(sections) == 1:
+        condensed = sections[0]
+    else:
+        condensed = condense_sections(sections, grok_api_key, grok_api_url, grok_model)
+
+    digest = {
+        "doc_hash": doc_hash,
+        "sections": sections,
+        "key_terms": key_terms,
+        "condensed_text": condensed or token_budget.truncate_to_tokens(" ".join(sections), CONDENSED_WORDS * 2),
+        "seconds": round(time.perf_counter() - start, 2),
+    }
+    save_digest(digest)
+    return digest
+
+
+def start_digest(text, grok_api_key, grok_api_url, grok_model, pages=None):
+    """
+    Start building the digest in the background unless it exists or is running.
+    Returns:
+        str: The document hash to poll with digest_status()
+    """
+    doc_hash = summary_cache.document_hash(text)
+    with _jobs_lock:
+        job = _jobs.get(doc_hash)
+        # A failed job is not retried on every rerun; its status stays "failed"
+        if job or load_digest(doc_hash):
+            return doc_hash
+        _jobs[doc_hash] = _executor.submit(build_digest, text, grok_api_key, grok_api_url, grok_model, pages)
+    return doc_hash
+
+
+def digest_status(doc_hash):
+    """"ready", "running", "failed" or "missing"."""
+    if load_digest(doc_hash):
+        return "ready"
+    with _jobs_lock:
+        job = _jobs.get(doc_hash)
+    if job is None:
+        return "missing"
+    if not job.done():
+        return "running"
+    return "failed" if job.exception() else "ready"
+
+
+def get_digest(doc_hash):
+    """The digest if it is ready, without waiting for a running job."""
+    return load_digest(doc_hash) if doc_hash else None
+
+
+def ready_condensed_text(text):
+    """The ready digest's condensed study text for a document, or None (no LLM call)."""
+    ready = load_digest(summary_cache.document_hash(text))
+    return ready.get("condensed_text") if ready else None
+
+
+def condensed_text(text, grok_api_key, grok_api_url, grok_model):
+    """
+    Condensed study text for a document, shared by flashcard and MCQ generation.
+    Uses the digest when ready, then the per-document cache, and otherwise makes
+    one pre-summary call (concurrent callers for the same document wait for it).
+    Raises on failure so callers can fall back to truncated text.
+    """
+    doc_hash = summary_cache.document_hash(text)
+    ready = load_digest(doc_hash)
+    if ready and ready.get("condensed_text"):
+        return ready["condensed_text"]
+
+    path = DIGEST_DIR / f"{doc_hash}.condensed.txt"
+    with _jobs_lock:
+        lock = _condense_locks.setdefault(doc_hash, threading.Lock())
+    with lock:
+        try:
+            return path.read_text(encoding="utf-8")
+        except OSError:
+            pass
+        material = token_budget.fit_to_budget(text, grok_model, 1024, prompt_template=CONDENSE_INSTRUCTION)
+        condensed = summary.clean_generated_text(llm_client.complete(
+            CONDENSE_INSTRUCTION + material, grok_api_key, grok_api_url, grok_model,
+            feature="study_pre_summary", max_tokens=1024, temperature=0.3
+        ))
+        if not condensed:
+            raise ValueError("Empty condensed text")
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(condensed, encoding="utf-8")
+        except OSError as e:
+            print(f"[digest] Could not write {path}: {e}")
+        return condensed
@@ -0,0 +1,136 @@
+"""
+On-demand, memoized PDF / CSV exports of the session histories.
+
+An export is built only when the user asks for it, and at most once per
+version of the history it covers: the version is a hash of the history's
+content, so appending, editing or deleting an entry invalidates it while
+plain reruns reuse the stored bytes. One version per export is kept.
+
+The create_*_pdf / create_*_csv writers return the finished file as bytes.
+CSV rows are written with the csv module straight from the history, without
+a DataFrame. PDFs are laid out from a generator of flowables instead of a
+prebuilt story list, so flowables are created only as their page is reached.
+The output is not streamed: ReportLab keeps every page until save(), and
+Streamlit's download_button needs the full payload anyway.
+"""
+import csv
+import hashlib
+import io
+import json
+
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.pdfgen import canvas
+from reportlab.platypus import Frame, Paragraph, Spacer
+
+
+def history_version(history):
+    """Content hash of a history (list of dicts) used to key its exports."""
+    payload = json.dumps(history, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _as_bytes(data):
+    if hasattr(data, "getvalue"):
+        data = data.getvalue()
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return data
+
+
+def build_csv(header, rows):
+    """
+    Write a CSV with the csv module.
+    Args:
+        header: Column names
+        rows: Iterable of row sequences (may be a generator)
+    Returns:
+        bytes: UTF-8 CSV
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(header)
+    writer.writerows(rows)
+    return buffer.getvalue().encode("utf-8")
+
+
+def title_flowables(title):
+    """The centered heading every exported PDF starts with."""
+    style = ParagraphStyle('CustomTitle', parent=getSampleStyleSheet()['Heading1'],
+                           fontSize=16, spaceAfter=30, alignment=1)
+    return [Paragraph(title, style), Spacer(1, 20)]
+
+
+def build_pdf(flowables, pagesize=letter, margin=inch):
+    """
+    Lay out flowables page by page, pulling them from the iterable as needed.
+    Args:
+        flowables: Iterable of ReportLab flowables (may be a generator)
+        pagesize: Page size (same letter page and 1 inch margins as SimpleDocTemplate)
+        margin: Page margin in points
+    Returns:
+        bytes: The PDF
+    """
+    buffer = io.BytesIO()
+    canv = canvas.Canvas(buffer, pagesize=pagesize, pageCompression=1)
+    width, height = pagesize
+    source = iter(flowables)
+    pending = []  # flowables (or split remainders) not yet placed
+    while True:
+        frame = Frame(margin, margin, width - 2 * margin, height - 2 * margin)
+        drawn = False
+        while True:
+            if not pending:
+                head = next(source, None)
+                if head is None:
+                    break
+                pending.append(head)
+            head = pending[0]
+            if frame.add(head, canv):
+                pending.pop(0)
+                drawn = True
+                continue
+            # Doesn't fit: place the part that does and carry the rest over
+            parts = frame.split(head, canv)
+            if parts and frame.add(parts[0], canv):
+                pending[0:1] = parts[1:]
+                drawn = True
+            elif not drawn:
+                print(f"[exports] Skipping a {type(head).__name__} too large for one page")
+                pending.pop(0)
+                continue
+            break
+        if not drawn:
+            break
+        canv.showPage()
+    canv.save()
+    return buffer.getvalue()
+
+
+class ExportCache:
+    """Latest built bytes per export name, tagged with the history version."""
+
+    def __init__(self):
+        self._entries = {}
+
+    def get(self, name, version):
+        """The stored bytes for name if they were built from this version, else None."""
+        entry = self._entries.get(name)
+        return entry[1] if entry and entry[0] == version else None
+
+    def build(self, name, version, builder, *args):
+        """
+        Return the export for this version, building it with builder(*args) if needed.
+        Args:
+            name: Export key (e.g. "qa.pdf")
+            version: history_version() of the data being exported
+            builder: A create_*_pdf / create_*_csv function
+        Returns:
+            bytes: The export file contents
+        """
+        data = self.get(name, version)
+        if data is None:
+            data = _as_bytes(builder(*args))
+            self._entries[name] = (version, data)
+        return data
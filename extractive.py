@@ -0,0 +1,85 @@
+"""
+Extractive pre-selection of passages before LLM summarization.
+
+The paragraph embeddings computed at upload time (L2-normalized, as stored in
+the FAISS index) are reused to pick the passages that are most central to the
+document while staying diverse (maximal marginal relevance around the
+centroid). Only that selection, sized to the requested summary length, is sent
+to the LLM, so summary cost grows with summary length rather than document
+length.
+"""
+import os
+
+import numpy as np
+
+import token_budget
+
+# Source tokens selected per requested summary word
+EXTRACTIVE_TOKENS_PER_WORD = int(os.getenv("SUMMARY_EXTRACTIVE_TOKENS_PER_WORD", "15"))
+MIN_SELECTION_TOKENS = 1500
+# Trade-off between centrality (1.0) and diversity (0.0)
+MMR_LAMBDA = 0.7
+# Page numbers, running headers and similar fragments are never selected
+MIN_PASSAGE_TOKENS = 12
+
+
+def selection_budget(num_words):
+    """Source tokens to select for a summary of num_words words."""
+    return max(MIN_SELECTION_TOKENS, num_words * EXTRACTIVE_TOKENS_PER_WORD)
+
+
+def normalize(vectors):
+    """L2-normalize vectors along the last axis."""
+    vectors = np.asarray(vectors, dtype="float32")
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def select_passages(passages, embeddings, max_tokens, focus_embedding=None, mmr_lambda=MMR_LAMBDA):
+    """
+    Greedy MMR selection of central, non-redundant passages within a token budget.
+    Args:
+        passages: Passage texts (one per embedding row)
+        embeddings: Array of shape (len(passages), dim)
+        max_tokens: Token budget for the selection
+        focus_embedding: Optional query vector; relevance is measured against it
+            (blended with the centroid) instead of the centroid alone
+    Returns:
+        list[int]: Selected passage indices in document order
+    """
+    if not passages:
+        return []
+    vectors = normalize(embeddings)
+    tokens = np.array([token_budget.count_tokens(p) for p in passages])
+    if tokens.sum() <= max_tokens:
+        return list(range(len(passages)))
+
+    target = vectors.mean(axis=0)
+    if focus_embedding is not None:
+        target = 0.3 * normalize(target) + 0.7 * normalize(focus_embedding).reshape(-1)
+    relevance = vectors @ normalize(target)
+
+    available = tokens >= MIN_PASSAGE_TOKENS
+    redundancy = np.full(len(passages), -1.0, dtype="float32")
+    selected, remaining = [], max_tokens
+    while remaining > 0:
+        available &= tokens <= remaining
+        if not available.any():
+            break
+        scores = mmr_lambda * relevance - (1 - mmr_lambda) * redundancy
+        pick = int(np.argmax(np.where(available, scores, -np.inf)))
+        selected.append(pick)
+        available[pick] = False
+        remaining -= tokens[pick]
+        redundancy = np.maximum(redundancy, vectors @ vectors[pick])
+    return sorted(selected)
+
+
+def preselect_text(passages, embeddings, num_words, focus_embedding=None):
+    """
+    Join the selected passages for a num_words summary.
+    Returns:
+        tuple: (selected text, number of passages selected)
+    """
+    picked = select_passages(passages, embeddings, selection_budget(num_words), focus_embedding)
+    return "\n\n".join(passages[i] for i in picked), len(picked)
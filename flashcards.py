@@ -1,44 +1,162 @@
-import requests
-import re
-import pandas as pd
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-import io
 import re
+from reportlab.platypus import Paragraph, Spacer
+from reportlab.lib.styles import getSampleStyleSheet
+import coverage_sampling
+import dedup
+import digest
+import exports
+import llm_client
+import qa_parser
+import sharding
+import structured_output
+import token_budget
+
+# Returned when generation fails; shown once but never added to a review deck
+ERROR_CARD_PREFIX = "Error generating flashcards:"
+PLACEHOLDER_CARD = {"question": "What is the main topic?", "answer": "The content covers various topics."}
+
+
+def reviewable_cards(cards):
+    """Drop error and placeholder cards so only generated content is scheduled for review."""
+    return [card for card in cards
+            if card != PLACEHOLDER_CARD and not str(card.get("question", "")).startswith(ERROR_CARD_PREFIX)]
+
 
-def generate_flashcards(text, num_cards, concept, groq_api_key, groq_api_url, groq_model):
+def generate_flashcards(text, num_cards, concept, groq_api_key, groq_api_url, groq_model, output_format="json",
+                        condensed_text=None, passages=None, embeddings=None, focus_embedding=None,
+                        exclude_questions=None):
     """
     Generate flashcards from PDF text using Groq's LLM.
     Each question and answer is exactly one sentence.
+    output_format "json" uses JSON-mode generation; "text" uses the Q:/A: format.
+    condensed_text, when given, replaces the shared pre-summary (digest.condensed_text).
+    passages/embeddings (the stored paragraph embeddings) switch long documents to a
+    coverage sample across embedding clusters (coverage_sampling.py) instead of the pre-summary.
+    Decks larger than sharding.SHARD_SIZE are generated in concurrent shards.
+    exclude_questions are listed in the prompt as questions not to repeat.
     """
-    max_text_length = 3000
-    if len(text) > max_text_length:
-        summary_prompt = f"Summarize the following content in 500 words to create flashcards from:\n\n{text}"
-        headers = {
-            "Authorization": f"Bearer {groq_api_key}",
-            "Content-Type": "application/json"
-        }
-        payload = {
-            "model": groq_model,
-            "messages": [{"role": "user", "content": summary_prompt}],
-            "max_tokens": 512,
-            "temperature": 0.3
-        }
-        try:
-            response = requests.post(groq_api_url, headers=headers, json=payload, timeout=120)
-            response.raise_for_status()
-            data = response.json()
-            text = data.get("choices", [{}])[0].get("message", {}).get("content", text[:max_text_length]).strip()
-        except Exception as e:
-            text = text[:max_text_length]  # Fallback to truncated text
+    if concept.lower() == "entire pdf":
+        concept_instruction = "Use the contents in the entire PDF to generate flashcards."
+    else:
+        concept_instruction = f"Focus deeply ONLY on: **{concept}** (ignore unrelated content). All cards must be about this specific concept."
+    if exclude_questions:
+        concept_instruction += dedup.exclusion_instruction(exclude_questions)
 
+    # Large decks: concurrent sub-requests over different content slices
+    if output_format == "json" and num_cards > sharding.SHARD_SIZE:
+        slices = sharding.source_slices(
+            condensed_text or text, len(sharding.shard_counts(num_cards)),
+            passages=None if condensed_text else passages, embeddings=embeddings, focus_embedding=focus_embedding
+        )
+        flashcards = sharding.generate_in_shards(
+            num_cards, slices,
+            lambda source, count: generate_flashcards_json(
+                source, count, concept_instruction, groq_api_key, groq_api_url, groq_model,
+                max_tokens=384 + 80 * count
+            )
+        )
+        if flashcards:
+            return flashcards
+
+    text = _source_text(text, num_cards, groq_api_key, groq_api_url, groq_model,
+                        condensed_text, passages, embeddings, focus_embedding)
+
+    if output_format == "json":
+        flashcards = generate_flashcards_json(text, num_cards, concept_instruction,
+                                              groq_api_key, groq_api_url, groq_model)
+        if flashcards:
+            return flashcards[:num_cards]
+
+    prompt = _text_prompt(text, num_cards, concept_instruction)
+    
+    try:
+        flashcard_text = llm_client.complete(
+            prompt, groq_api_key, groq_api_url, groq_model,
+            feature="flashcards", max_tokens=1024, temperature=0.3
+        ).strip()
+
+        flashcards = parse_flashcards(flashcard_text)
+        if not flashcards:
+            flashcards = create_simple_flashcards(text, num_cards, groq_api_key, groq_api_url, groq_model)
+
+        return flashcards[:num_cards]
+    except Exception as e:
+        return [{"question": f"{ERROR_CARD_PREFIX} {e}", "answer": "Please try again."}]
+
+def stream_flashcards(text, num_cards, concept, groq_api_key, groq_api_url, groq_model,
+                      condensed_text=None, passages=None, embeddings=None, focus_embedding=None,
+                      exclude_questions=None):
+    """
+    Generate flashcards with a streamed Q:/A: completion, yielding each card as
+    soon as it is complete (qa_parser.FlashcardStreamParser).
+    Takes the same arguments as generate_flashcards. Decks larger than
+    sharding.SHARD_SIZE run as concurrent JSON shards and yield each shard's
+    cards as it finishes.
+    """
     if concept.lower() == "entire pdf":
         concept_instruction = "Use the contents in the entire PDF to generate flashcards."
     else:
         concept_instruction = f"Focus deeply ONLY on: **{concept}** (ignore unrelated content). All cards must be about this specific concept."
+    if exclude_questions:
+        concept_instruction += dedup.exclusion_instruction(exclude_questions)
 
-    prompt = f"""Create {num_cards} flashcards based on {concept_instruction} from the following content.
+    if num_cards > sharding.SHARD_SIZE:
+        slices = sharding.source_slices(
+            condensed_text or text, len(sharding.shard_counts(num_cards)),
+            passages=None if condensed_text else passages, embeddings=embeddings, focus_embedding=focus_embedding
+        )
+        yield from sharding.iter_shards(
+            num_cards, slices,
+            lambda source, count: generate_flashcards_json(
+                source, count, concept_instruction, groq_api_key, groq_api_url, groq_model,
+                max_tokens=384 + 80 * count
+            )
+        )
+        return
+
+    text = _source_text(text, num_cards, groq_api_key, groq_api_url, groq_model,
+                        condensed_text, passages, embeddings, focus_embedding)
+
+    parser = qa_parser.FlashcardStreamParser()
+    emitted = 0
+    for delta in llm_client.stream_complete(
+            _text_prompt(text, num_cards, concept_instruction), groq_api_key, groq_api_url, groq_model,
+            feature="flashcards", max_tokens=384 + 80 * num_cards, temperature=0.3):
+        for card in parser.feed(delta):
+            if emitted < num_cards:
+                emitted += 1
+                yield card
+    for card in parser.close():
+        if emitted < num_cards:
+            emitted += 1
+            yield card
+
+def _source_text(text, num_cards, groq_api_key, groq_api_url, groq_model,
+                 condensed_text=None, passages=None, embeddings=None, focus_embedding=None):
+    """The content a single flashcard request is generated from."""
+    # ~750 tokens is roughly the old 3000-character limit
+    max_text_tokens = 750
+    if condensed_text:
+        return condensed_text
+    if token_budget.count_tokens(text) <= max_text_tokens:
+        return text
+    if focus_embedding is None:
+        # A finished upload digest already condenses the whole document
+        ready = digest.ready_condensed_text(text)
+        if ready:
+            return ready
+    if passages and embeddings is not None:
+        # Representative passages from every topic cluster, not just the first pages
+        return coverage_sampling.sample_text(passages, embeddings, num_cards, focus_embedding=focus_embedding) or \
+            token_budget.truncate_to_tokens(text, max_text_tokens)
+    # One condensation per document, shared with the other generator
+    try:
+        return digest.condensed_text(text, groq_api_key, groq_api_url, groq_model)
+    except Exception as e:
+        return token_budget.truncate_to_tokens(text, max_text_tokens)  # Fallback to truncated text
+
+def _text_prompt(text, num_cards, concept_instruction):
+    return f"""Create {num_cards} flashcards based on {concept_instruction} from the following content.
                 Each question must be exactly one sentence.
                 Each answer must be exactly one sentence.
                 Format the output so that each flashcard is on two separate lines:
@@ -51,31 +169,50 @@ def generate_flashcards(text, num_cards, concept, groq_api_key, groq_api_url, gr
                 {text}
 
                 Flashcards: """
-    
-    headers = {
-        "Authorization": f"Bearer {groq_api_key}",
-        "Content-Type": "application/json"
-    }
-    payload = {
-        "model": groq_model,
-        "messages": [{"role": "user", "content": prompt}],
-        "max_tokens": 1024,
-        "temperature": 0.3
-    }
-    
-    try:
-        response = requests.post(groq_api_url, headers=headers, json=payload, timeout=120)
-        response.raise_for_status()
-        data = response.json()
-        flashcard_text = data.get("choices", [{}])[0].get("message", {}).get("content", "").strip()
 
-        flashcards = parse_flashcards(flashcard_text)
-        if not flashcards:
-            flashcards = create_simple_flashcards(text, num_cards, groq_api_key, groq_api_url, groq_model)
+def generate_flashcards_json(text, num_cards, concept_instruction, groq_api_key, groq_api_url, groq_model,
+                             max_tokens=1024):
+    """
+    Generate flashcards in JSON mode and parse them locally.
+    Damaged JSON is repaired and plain Q:/A: output is still accepted, so a bad
+    response does not trigger a second LLM call. Returns [] if nothing is usable.
+    """
+    prompt = f"""Create {num_cards} flashcards based on {concept_instruction} from the following content.
+Each question must be exactly one sentence.
+Each answer must be exactly one sentence.
+Respond with JSON only, using exactly this structure:
+{{"flashcards": [{{"question": "...", "answer": "..."}}]}}
 
-        return flashcards[:num_cards]
+Content:
+{text}"""
+
+    try:
+        raw = llm_client.complete(
+            prompt, groq_api_key, groq_api_url, groq_model,
+            feature="flashcards", max_tokens=max_tokens, temperature=0.3,
+            response_format=structured_output.JSON_RESPONSE_FORMAT
+        )
     except Exception as e:
-        return [{"question": f"Error generating flashcards: {e}", "answer": "Please try again."}]
+        raw = structured_output.failed_generation_from_error(e)
+        if not raw:
+            return []
+
+    flashcards = parse_flashcard_json(raw)
+    if not flashcards:
+        flashcards = parse_flashcards(structured_output.strip_wrappers(raw))
+    return flashcards
+
+def parse_flashcard_json(text):
+    """Parse a JSON flashcard response (tolerating damage) into question/answer dicts."""
+    cards = []
+    for item in structured_output.extract_items(text, "flashcards"):
+        question = str(item.get("question") or item.get("q") or item.get("front") or "").strip()
+        answer = str(item.get("answer") or item.get("a") or item.get("back") or "").strip()
+        if question and answer:
+            # Several Q:/A: pairs packed into one item's fields are split apart
+            nested = parse_flashcards(f"Q: {question}\nA: {answer}") if "\nQ" in question + answer else []
+            cards.extend(nested or [{"question": question, "answer": answer}])
+    return cards
 
 def parse_flashcards(text):
     """
@@ -83,24 +220,9 @@ def parse_flashcards(text):
     Q: question sentence
     A: answer sentence
 
-    Each flashcard is separated by a single empty line (\n)
+    Numbered, bold and one-line variants are accepted too (see qa_parser).
     """
-    cards = []
-    raw_cards = text.strip().split("\n\n")  # split by single blank line
-
-    for raw in raw_cards:
-        raw = raw.strip()
-        if not raw:
-            continue
-
-        # Extract question and answer lines
-        lines = raw.split('\n')
-        if len(lines) >= 2 and lines[0].startswith("Q:") and lines[1].startswith("A:"):
-            question = lines[0][2:].strip()
-            answer = lines[1][2:].strip()
-            cards.append({"question": question, "answer": answer})
-
-    return cards
+    return qa_parser.parse_flashcards(text)
 
 def create_simple_flashcards(text, num_cards, groq_api_key, groq_api_url, groq_model):
     """
@@ -111,47 +233,20 @@ def create_simple_flashcards(text, num_cards, groq_api_key, groq_api_url, groq_m
 For each concept, create a question and answer pair.
 Format: "1. Q: [question] A: [answer]"
 
-Content: {text[:2000]}
+Content: {token_budget.truncate_to_tokens(text, 500)}
 
 Simple flashcards:"""
     
-    headers = {
-        "Authorization": f"Bearer {groq_api_key}",
-        "Content-Type": "application/json"
-    }
-    payload = {
-        "model": groq_model,
-        "messages": [{"role": "user", "content": prompt}],
-        "max_tokens": 1024,
-        "temperature": 0.3
-    }
-    
     try:
-        response = requests.post(groq_api_url, headers=headers, json=payload, timeout=120)
-        response.raise_for_status()
-        data = response.json()
-        result = data.get("choices", [{}])[0].get("message", {}).get("content", "").strip()
-        
-        # Simple parsing for numbered format
-        flashcards = []
-        lines = result.split('\n')
-        current_q = None
-        
-        for line in lines:
-            line = line.strip()
-            if line.startswith('Q:') or line.startswith('Question:'):
-                current_q = line.split(':', 1)[1].strip()
-            elif line.startswith('A:') or line.startswith('Answer:') and current_q:
-                answer = line.split(':', 1)[1].strip()
-                flashcards.append({
-                    "question": current_q,
-                    "answer": answer
-                })
-                current_q = None
+        result = llm_client.complete(
+            prompt, groq_api_key, groq_api_url, groq_model,
+            feature="flashcards_fallback", max_tokens=1024, temperature=0.3
+        ).strip()
         
+        flashcards = parse_flashcards(result)
         return flashcards[:num_cards]
     except Exception as e:
-        return [{"question": "What is the main topic?", "answer": "The content covers various topics."}]
+        return [dict(PLACEHOLDER_CARD)]
 
 def format_flashcard_display(flashcards):
     """
@@ -171,50 +266,24 @@ def format_flashcard_display(flashcards):
 
 def create_flashcards_pdf(flashcards_list, filename="flashcards.pdf"):
     """Create a PDF file from flashcards"""
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter)
+    return exports.build_pdf(_flashcards_flowables(flashcards_list))
+
+
+def _flashcards_flowables(flashcards_list):
     styles = getSampleStyleSheet()
-    story = []
-    
-    # Title
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=16,
-        spaceAfter=30,
-        alignment=1  # Center alignment
-    )
-    story.append(Paragraph("📚 Flashcards", title_style))
-    story.append(Spacer(1, 20))
-    
-    # Add each flashcard
+    yield from exports.title_flowables("📚 Flashcards")
     for i, card in enumerate(flashcards_list, 1):
         # Question
-        question_text = f"<b>Question {i}:</b> {card['question']}"
-        story.append(Paragraph(question_text, styles['Normal']))
-        story.append(Spacer(1, 10))
-        
+        yield Paragraph(f"<b>Question {i}:</b> {card['question']}", styles['Normal'])
+        yield Spacer(1, 10)
+
         # Answer
-        answer_text = f"<b>Answer:</b> {card['answer']}"
-        story.append(Paragraph(answer_text, styles['Normal']))
-        story.append(Spacer(1, 20))
-    
-    doc.build(story)
-    buffer.seek(0)
-    return buffer
+        yield Paragraph(f"<b>Answer:</b> {card['answer']}", styles['Normal'])
+        yield Spacer(1, 20)
 
 def create_flashcards_csv(flashcards_list):
     """Create a CSV file from flashcards"""
-    data = []
-    for i, card in enumerate(flashcards_list, 1):
-        data.append({
-            'Card Number': i,
-            'Question': card['question'],
-            'Answer': card['answer']
-        })
-    
-    df = pd.DataFrame(data)
-    csv_buffer = io.StringIO()
-    df.to_csv(csv_buffer, index=False)
-    csv_buffer.seek(0)
-    return csv_buffer.getvalue() 
\ No newline at end of file
+    return exports.build_csv(
+        ['Card Number', 'Question', 'Answer'],
+        ((i, card['question'], card['answer']) for i, card in enumerate(flashcards_list, 1))
+    )
@@ -1,12 +1,10 @@
 import numpy as np
-import requests
-from reportlab.lib.styles import ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-from reportlab.lib.pagesizes import letter
+from reportlab.platypus import Paragraph, Spacer
 from reportlab.lib.styles import getSampleStyleSheet
-import pandas as pd
-import io
 import re
+import exports
+import llm_client
+import token_budget
 
 def clean_generated_text(text):
     """
@@ -51,30 +49,27 @@ def rag_generate_answer_insights(context_chunks, question, groq_api_key, groq_ap
     else:
         context_str = str(context_chunks)
     
-    prompt = (
+    instructions = (
         "You are an expert assistant. Use the context below to answer the question thoughtfully. "
         "Provide deep insights, real-world applications, and practical examples that go beyond "
         "the basic information in the context. Explain why this matters and how it applies in "
         "different scenarios. If the question can't be answered from the context, say so.\n\n"
+    )
+    context_str = token_budget.fit_to_budget(
+        context_str, groq_model, 1024,
+        prompt_template=f"{instructions}Context:\n\n\nQuestion: {question}\nAnswer:"
+    )
+    prompt = (
+        instructions +
         f"Context:\n{context_str}\n\nQuestion: {question}\nAnswer:"
     )
     
-    headers = {
-        "Authorization": f"Bearer {groq_api_key}",
-        "Content-Type": "application/json"
-    }
-    payload = {
-        "model": groq_model,
-        "messages": [{"role": "user", "content": prompt}],
-        "max_tokens": 1024,
-        "temperature": 0.5  # Balanced temperature for insightful yet focused answers
-    }
-    
     try:
-        response = requests.post(groq_api_url, headers=headers, json=payload, timeout=120)
-        response.raise_for_status()
-        data = response.json()
-        raw_output = data.get("choices", [{}])[0].get("message", {}).get("content", "No answer generated.").strip()
+        raw_output = llm_client.complete(
+            prompt, groq_api_key, groq_api_url, groq_model,
+            feature="insights", max_tokens=1024,
+            temperature=0.5  # Balanced temperature for insightful yet focused answers
+        ).strip() or "No answer generated."
         return clean_generated_text(raw_output)
     except Exception as e:
         return f"Error querying Groq API: {e}"
@@ -99,50 +94,24 @@ def answer_question(query, embedder, index, chunks, groq_api_key, groq_api_url,
 
 def create_insights_pdf(qa_list, filename="insights_qa.pdf"):
     """Create a PDF file from insightful Q&A pairs"""
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter)
+    return exports.build_pdf(_insights_flowables(qa_list))
+
+
+def _insights_flowables(qa_list):
     styles = getSampleStyleSheet()
-    story = []
-    
-    # Title
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=16,
-        spaceAfter=30,
-        alignment=1
-    )
-    story.append(Paragraph("💡 Insightful Q&A", title_style))
-    story.append(Spacer(1, 20))
-    
-    # Add each QA pair
+    yield from exports.title_flowables("💡 Insightful Q&A")
     for i, qa in enumerate(qa_list, 1):
         # Question
-        question_text = f"<b>Question {i}:</b> {qa['question']}"
-        story.append(Paragraph(question_text, styles['Normal']))
-        story.append(Spacer(1, 10))
-        
+        yield Paragraph(f"<b>Question {i}:</b> {qa['question']}", styles['Normal'])
+        yield Spacer(1, 10)
+
         # Answer
-        answer_text = f"<b>Insightful Answer:</b> {qa['answer']}"
-        story.append(Paragraph(answer_text, styles['Normal']))
-        story.append(Spacer(1, 20))
-    
-    doc.build(story)
-    buffer.seek(0)
-    return buffer
+        yield Paragraph(f"<b>Insightful Answer:</b> {qa['answer']}", styles['Normal'])
+        yield Spacer(1, 20)
 
 def create_insights_csv(qa_list):
     """Create a CSV file from insightful Q&A pairs"""
-    data = []
-    for i, qa in enumerate(qa_list, 1):
-        data.append({
-            'Question Number': i,
-            'Question': qa['question'],
-            'Insightful Answer': qa['answer']
-        })
-    
-    df = pd.DataFrame(data)
-    csv_buffer = io.StringIO()
-    df.to_csv(csv_buffer, index=False)
-    csv_buffer.seek(0)
-    return csv_buffer.getvalue()
\ No newline at end of file
+    return exports.build_csv(
+        ['Question Number', 'Question', 'Insightful Answer'],
+        ((i, qa['question'], qa['answer']) for i, qa in enumerate(qa_list, 1))
+    )
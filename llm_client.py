@@ -0,0 +1,261 @@
+"""
+Shared client for the OpenAI-compatible chat completions endpoint.
+
+Every generator sends its requests through chat_completion() so prompt budgets
+are enforced and token usage is recorded per feature in one place.
+
+Identical concurrent requests (same endpoint, key, model, messages and params)
+are coalesced: the first caller makes the upstream call and the others wait for
+its result instead of sending duplicates.
+
+Models are picked per route by model_router; when a model fails with a
+retryable error the next model in the route's fallback chain is tried.
+
+stream_completion() yields the response as it is generated (server-sent
+events) for callers that render partial output.
+"""
+import hashlib
+import json
+import threading
+import time
+from concurrent.futures import Future
+
+import requests
+
+import model_router
+import token_budget
+
+
+_inflight_lock = threading.Lock()
+_inflight = {}
+_stats = {"requests": 0, "upstream_calls": 0, "coalesced": 0}
+
+
+def build_headers(api_key):
+    return {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json"
+    }
+
+
+def build_messages(prompt, system_prompt=None):
+    messages = []
+    if system_prompt:
+        messages.append({"role": "system", "content": system_prompt})
+    messages.append({"role": "user", "content": prompt})
+    return messages
+
+
+def request_key(api_url, api_key, model, messages, params):
+    """Stable hash identifying a request for coalescing."""
+    key_material = json.dumps(
+        [api_url, hashlib.sha256(str(api_key).encode()).hexdigest(), model, messages, params],
+        sort_keys=True, default=str
+    )
+    return hashlib.sha256(key_material.encode()).hexdigest()
+
+
+def chat_completion(messages, api_key, api_url, model, feature="general",
+                    temperature=0.7, max_tokens=1024, timeout=120, coalesce=True,
+                    route=None, **params):
+    """
+    Send a chat completion request and return the assistant's raw text.
+    Args:
+        messages: Chat messages ([{"role": ..., "content": ...}])
+        api_key: API key
+        api_url: Chat completions endpoint
+        model: Main model; used directly unless the route names other models
+        feature: Name used for usage accounting (e.g. "mcq", "summary_map")
+        temperature, max_tokens, timeout: Request settings
+        coalesce: Share one upstream call between identical concurrent requests
+        route: Routing table entry to use (defaults to the feature name)
+        **params: Extra payload fields (e.g. response_format)
+    Raises:
+        token_budget.PromptBudgetError if the prompt does not fit any model
+        requests.RequestException on HTTP or network errors from the last model
+    """
+    route = route or feature
+    chain = model_router.resolve(route, model)
+    for position, candidate in enumerate(chain):
+        start = time.perf_counter()
+        try:
+            content = _single_model_completion(
+                messages, api_key, api_url, candidate, feature,
+                temperature, max_tokens, timeout, coalesce, params
+            )
+        except Exception as e:
+            model_router.record_call(route, candidate, time.perf_counter() - start, ok=False)
+            if position == len(chain) - 1 or not model_router.is_retryable(e):
+                raise
+            print(f"[llm_client] {candidate} failed for {route} ({e}); falling back to {chain[position + 1]}")
+            continue
+        model_router.record_call(route, candidate, time.perf_counter() - start, ok=True)
+        return content
+
+
+def _single_model_completion(messages, api_key, api_url, model, feature,
+                             temperature, max_tokens, timeout, coalesce, params):
+    """Run one request against one model, coalescing identical in-flight calls."""
+    prompt_tokens = token_budget.enforce_budget(messages, model, max_tokens)
+    request_params = {"temperature": temperature, "max_tokens": max_tokens, **params}
+
+    if not coalesce:
+        with _inflight_lock:
+            _stats["requests"] += 1
+        return _send(messages, api_key, api_url, model, feature, prompt_tokens, timeout, request_params)
+
+    key = request_key(api_url, api_key, model, messages, request_params)
+    with _inflight_lock:
+        _stats["requests"] += 1
+        future = _inflight.get(key)
+        is_leader = future is None
+        if is_leader:
+            future = Future()
+            _inflight[key] = future
+        else:
+            _stats["coalesced"] += 1
+
+    if not is_leader:
+        # Re-raises the leader's exception if its call failed
+        return future.result()
+
+    try:
+        content = _send(messages, api_key, api_url, model, feature, prompt_tokens, timeout, request_params)
+        future.set_result(content)
+        return content
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+
+
+def _send(messages, api_key, api_url, model, feature, prompt_tokens, timeout, request_params):
+    """Make the actual HTTP call and record its usage."""
+    payload = {
+        "model": model,
+        "messages": messages,
+        **request_params
+    }
+
+    with _inflight_lock:
+        _stats["upstream_calls"] += 1
+    start = time.perf_counter()
+    response = requests.post(api_url, headers=build_headers(api_key), json=payload, timeout=timeout)
+    response.raise_for_status()
+    data = response.json()
+    latency = time.perf_counter() - start
+
+    content = (data.get("choices", [{}])[0].get("message", {}).get("content") or "")
+    usage = data.get("usage") or {}
+    token_budget.record_usage(
+        feature,
+        model,
+        usage.get("prompt_tokens", prompt_tokens),
+        usage.get("completion_tokens", token_budget.count_tokens(content)),
+        latency
+    )
+    return content
+
+
+def stream_completion(messages, api_key, api_url, model, feature="general",
+                      temperature=0.7, max_tokens=1024, timeout=120, route=None, **params):
+    """
+    Stream a chat completion, yielding text deltas as they arrive (SSE).
+    Fallback to the next model in the route's chain only happens before the
+    first delta; streamed requests are never coalesced.
+    Raises:
+        token_budget.PromptBudgetError if the prompt does not fit any model
+        requests.RequestException on HTTP or network errors from the last model
+    """
+    route = route or feature
+    chain = model_router.resolve(route, model)
+    for position, candidate in enumerate(chain):
+        start = time.perf_counter()
+        try:
+            prompt_tokens = token_budget.enforce_budget(messages, candidate, max_tokens)
+            response = _open_stream(messages, api_key, api_url, candidate, timeout,
+                                    {"temperature": temperature, "max_tokens": max_tokens, **params})
+        except Exception as e:
+            model_router.record_call(route, candidate, time.perf_counter() - start, ok=False)
+            if position == len(chain) - 1 or not model_router.is_retryable(e):
+                raise
+            print(f"[llm_client] {candidate} failed for {route} ({e}); falling back to {chain[position + 1]}")
+            continue
+
+        parts, usage = [], {}
+        try:
+            for delta, chunk_usage in _iter_sse(response):
+                usage = chunk_usage or usage
+                if delta:
+                    parts.append(delta)
+                    yield delta
+        except Exception:
+            model_router.record_call(route, candidate, time.perf_counter() - start, ok=False)
+            raise
+        finally:
+            response.close()
+        latency = time.perf_counter() - start
+        model_router.record_call(route, candidate, latency, ok=True)
+        token_budget.record_usage(
+            feature,
+            candidate,
+            usage.get("prompt_tokens", prompt_tokens),
+            usage.get("completion_tokens", token_budget.count_tokens("".join(parts))),
+            latency
+        )
+        return
+
+
+def _open_stream(messages, api_key, api_url, model, timeout, request_params):
+    payload = {"model": model, "messages": messages, "stream": True, **request_params}
+    with _inflight_lock:
+        _stats["requests"] += 1
+        _stats["upstream_calls"] += 1
+    response = requests.post(api_url, headers=build_headers(api_key), json=payload, timeout=timeout, stream=True)
+    response.raise_for_status()
+    return response
+
+
+def _iter_sse(response):
+    """Yield (content delta, usage or None) for each server-sent event."""
+    for line in response.iter_lines(decode_unicode=True):
+        if not line or not line.startswith("data:"):
+            continue
+        data = line[len("data:"):].strip()
+        if data == "[DONE]":
+            break
+        try:
+            event = json.loads(data)
+        except ValueError:
+            continue
+        choices = event.get("choices") or [{}]
+        delta = (choices[0].get("delta") or {}).get("content") or ""
+        # Groq reports usage in x_groq.usage on the last chunk; OpenAI in usage
+        usage = event.get("usage") or (event.get("x_groq") or {}).get("usage")
+        yield delta, usage
+
+
+def stream_complete(prompt, api_key, api_url, model, feature="general", system_prompt=None, **kwargs):
+    """Streaming counterpart of complete(): yields text deltas."""
+    return stream_completion(build_messages(prompt, system_prompt), api_key, api_url, model,
+                             feature=feature, **kwargs)
+
+
+def get_coalescing_stats():
+    """Counters for request coalescing: requests, upstream_calls, coalesced, in_flight."""
+    with _inflight_lock:
+        return dict(_stats, in_flight=len(_inflight))
+
+
+def reset_coalescing_stats():
+    with _inflight_lock:
+        for name in _stats:
+            _stats[name] = 0
+
+
+def complete(prompt, api_key, api_url, model, feature="general", system_prompt=None, **kwargs):
+    """Convenience wrapper for a single user prompt."""
+    return chat_completion(build_messages(prompt, system_prompt), api_key, api_url, model,
+                           feature=feature, **kwargs)
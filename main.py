@@ -6,18 +6,29 @@ import numpy as np
 from sentence_transformers import SentenceTransformer
 from datetime import datetime
 import time
-import requests
 import re 
 import summary
+import chapters
+import dedup
+import digest
+import exports
+import adaptive_quiz
+import question_bank
+import quiz_store
+import spaced_repetition
+import summary_cache
+import study_pack
 import quest_ans
 import flashcards
 import mcq_generator
 import exp_5
 import insights
+import llm_client
+import model_router
+import token_budget
 from styles_main import FEATURE_CARDS_CSS
 import base64
 from pathlib import Path
-import uuid
 from dotenv import load_dotenv
 
 load_dotenv() 
@@ -134,32 +145,18 @@ st.markdown(
 
 # --- Config ---
 GROK_API_KEY = os.getenv("GROK_API_KEY")  # You'll need to set this
-GROK_API_URL = "https://api.groq.com/openai/v1/chat/completions"  # Update if different
-GROK_MODEL = "qwen/qwen3-32b"
+# Set GROK_API_URL=http://127.0.0.1:8000/v1/chat/completions to use mock_llm_server.py offline
+GROK_API_URL = os.getenv("GROK_API_URL", "https://api.groq.com/openai/v1/chat/completions")
+GROK_MODEL = os.getenv("GROK_MODEL", "qwen/qwen3-32b")
 EMBEDDING_MODEL = "sentence-transformers/multi-qa-MiniLM-L6-cos-v1"
 TOP_K = 3
 
 def grok_api_call(prompt, system_prompt=None):
-    headers = {
-        "Authorization": f"Bearer {GROK_API_KEY}",
-        "Content-Type": "application/json"
-    }
-    
-    messages = []
-    if system_prompt:
-        messages.append({"role": "system", "content": system_prompt})
-    messages.append({"role": "user", "content": prompt})
-    
-    data = {
-        "model": GROK_MODEL,
-        "messages": messages,
-        "temperature": 0.7
-    }
-    
     try:
-        response = requests.post(GROK_API_URL, headers=headers, json=data)
-        response.raise_for_status()
-        return response.json()["choices"][0]["message"]["content"]
+        return llm_client.complete(
+            prompt, GROK_API_KEY, GROK_API_URL, GROK_MODEL,
+            feature="general", system_prompt=system_prompt, temperature=0.7
+        )
     except Exception as e:
         st.error(f"Error calling Grok API: {str(e)}")
         return None
@@ -169,12 +166,10 @@ def grok_api_call(prompt, system_prompt=None):
 def load_embedder():
     return SentenceTransformer(EMBEDDING_MODEL)
 
-def extract_text_from_pdf(pdf_file):
+def extract_pdf(pdf_file):
+    """Per-page texts and the outline ([[level, title, page], ...]) of a PDF."""
     doc = fitz.open(stream=pdf_file.read(), filetype="pdf")
-    text = ""
-    for page in doc:
-        text += page.get_text()+"\n"
-    return text
+    return [page.get_text() for page in doc], doc.get_toc()
 
 def split_into_paragraphs(text):
     paragraphs = re.split(r'\n\s*\n', text)
@@ -185,6 +180,59 @@ def embed_chunks(chunks, embedder):
     embeddings = embedder.encode(chunks, show_progress_bar=True)
     return np.array(embeddings).astype("float32")
 
+def embed_focus(concept):
+    """Embedding of a focus concept, or None for the entire PDF."""
+    if not concept or concept.strip().lower() == "entire pdf" or st.session_state.get("embedder") is None:
+        return None
+    return embed_chunks([concept], st.session_state.embedder)[0]
+
+def embed_texts(texts):
+    """Embed short texts (e.g. generated questions) with the session's embedder."""
+    return embed_chunks(texts, st.session_state.embedder)
+
+def collect_stream(stream, render, fallback):
+    """
+    Drain a stream of generated items, rendering each one as it arrives.
+    If the stream fails or ends without producing anything, fallback() is used instead.
+    """
+    items = []
+    try:
+        for item in stream:
+            render(len(items) + 1, item)
+            items.append(item)
+    except Exception as e:
+        print(f"[main] Streamed generation failed after {len(items)} item(s): {e}")
+    if not items:
+        return fallback()
+    return items
+
+def export_buttons(name, data, create_pdf, create_csv, file_stem, label="Download"):
+    """
+    PDF / CSV download buttons whose files are built only on request.
+    Each export is built once per version of data and reused on later reruns.
+    """
+    version = exports.history_version(data)
+    cache = st.session_state.setdefault("export_cache", exports.ExportCache())
+    col1, col2 = st.columns(2)
+    for col, fmt, create, icon, mime in ((col1, "pdf", create_pdf, "📄", "application/pdf"),
+                                         (col2, "csv", create_csv, "📊", "text/csv")):
+        with col:
+            export_name = f"{name}.{fmt}"
+            file_data = cache.get(export_name, version)
+            if file_data is None and st.button(f"{icon} Prepare {fmt.upper()}", key=f"prepare_{export_name}",
+                                               use_container_width=True):
+                with st.spinner(f"Building {fmt.upper()}..."):
+                    file_data = cache.build(export_name, version, create, data)
+            if file_data is not None:
+                st.download_button(
+                    label=f"{icon} {label} as {fmt.upper()}",
+                    data=file_data,
+                    file_name=f"{file_stem}.{fmt}",
+                    mime=mime,
+                    use_container_width=True,
+                    key=f"download_{export_name}"
+                )
+
 def build_faiss_index(embeddings):
     faiss.normalize_L2(embeddings)
     dim = embeddings.shape[1]
@@ -263,24 +311,44 @@ st.markdown("""
 if "faiss_index" not in st.session_state:
     st.session_state.faiss_index = None
     st.session_state.chunks = None
+    st.session_state.embeddings = None
     st.session_state.embedder = None
     st.session_state.text = None
+    st.session_state.pages = None
+    st.session_state.chapters = []
     st.session_state.filename = None
+    st.session_state.doc_hash = None
 
 uploaded_file = st.file_uploader("Upload a PDF file", type=["pdf"])
 
 if uploaded_file:
     with st.spinner("Extracting and processing PDF..."):
-        text = extract_text_from_pdf(uploaded_file)
+        pages, toc = extract_pdf(uploaded_file)
+        text = "".join(page + "\n" for page in pages)
         chunks = split_into_paragraphs(text)
         embedder = load_embedder()
         embeddings = embed_chunks(chunks, embedder)
         index = build_faiss_index(embeddings)
         st.session_state.faiss_index = index
         st.session_state.chunks = chunks
+        st.session_state.embeddings = embeddings  # L2-normalized by build_faiss_index
         st.session_state.embedder = embedder
         st.session_state.text = text
+        st.session_state.pages = pages
+        st.session_state.chapters = chapters.detect_chapters(pages, toc)
         st.session_state.filename = uploaded_file.name
+        st.session_state.doc_hash = summary_cache.document_hash(text)
+        # Section summaries, key terms and condensed study text, built once per document
+        if digest.DIGEST_ON_UPLOAD and GROK_API_KEY:
+            digest.start_digest(text, GROK_API_KEY, GROK_API_URL, GROK_MODEL, pages=pages)
+        # MCQs and flashcards per concept cluster, served instantly by the generator tabs
+        if question_bank.BANK_ON_UPLOAD and GROK_API_KEY:
+            question_bank.start_bank(st.session_state.doc_hash, chunks, embeddings,
+                                     GROK_API_KEY, GROK_API_URL, GROK_MODEL)
+        elif GROK_API_KEY:
+            # No upfront fill; the bank grows from generated items and on-demand top-ups
+            question_bank.register(st.session_state.doc_hash, chunks, embeddings,
+                                   GROK_API_KEY, GROK_API_URL, GROK_MODEL)
     st.success("✅ PDF uploaded and processed successfully!")
 
 
@@ -295,6 +363,74 @@ if st.session_state.text:
             st.write(f"**File:** {st.session_state.filename}")
             st.write(f"**Word count:** {num_words}")
             #st.write(f"**Chunk count:** {num_chunks}")
+            doc_hash = st.session_state.get("doc_hash")
+            if doc_hash:
+                status = digest.digest_status(doc_hash)
+                if status == "ready":
+                    doc_digest = digest.get_digest(doc_hash)
+                    st.write(f"**Study digest:** ready ({len(doc_digest['sections'])} sections, "
+                             f"{len(doc_digest['key_terms'])} key terms)")
+                    if doc_digest["key_terms"]:
+                        st.caption(" · ".join(term["term"] for term in doc_digest["key_terms"]))
+                elif status == "running":
+                    st.write("**Study digest:** being prepared in the background; summaries, flashcards and MCQs get faster once it is ready.")
+                elif status == "failed":
+                    st.write("**Study digest:** could not be prepared; tools read the full text instead.")
+                bank = question_bank.bank_stats(doc_hash)
+                if sum(bank["mcqs"].values()) or bank["flashcards"] or bank["filling"]:
+                    mcq_counts = ", ".join(f"{count} {level.lower()}" for level, count in bank["mcqs"].items())
+                    st.write(f"**Question bank:** {mcq_counts} MCQs · {bank['flashcards']} flashcards"
+                             + (" (filling in the background)" if bank["filling"] else ""))
+
+        with st.expander("🎒 Study pack"):
+            st.caption("Generate flashcards and MCQs together from one shared condensation of the PDF. "
+                       "Results appear in the Flashcards and MCQ Generator tabs.")
+            with st.form(key="study_pack_form"):
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    pack_cards = st.number_input("Flashcards", min_value=3, max_value=20, value=5, step=1)
+                with col2:
+                    pack_questions = st.number_input("MCQs", min_value=1, max_value=20, value=5, step=1)
+                with col3:
+                    pack_difficulty = st.selectbox("Difficulty", ["Easy", "Medium", "Hard"], index=1)
+                pack_concept = st.text_input("📌 Focus on:", value="Entire PDF", key="study_pack_concept")
+                if st.form_submit_button("Generate Study Pack"):
+                    with st.spinner("Creating flashcards and MCQs..."):
+                        pack_flashcards, pack_mcqs = study_pack.generate_study_pack(
+                            st.session_state.text,
+                            pack_cards,
+                            pack_questions,
+                            pack_difficulty,
+                            pack_concept.strip() or "Entire PDF",
+                            GROK_API_KEY,
+                            GROK_API_URL,
+                            GROK_MODEL,
+                            passages=st.session_state.chunks,
+                            embeddings=st.session_state.get("embeddings"),
+                            focus_embedding=embed_focus(pack_concept)
+                        )
+                    if pack_flashcards:
+                        st.session_state.setdefault("flashcard_history", []).append({
+                            'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                            'requested_cards': pack_cards,
+                            'actual_cards': len(pack_flashcards),
+                            'cards': pack_flashcards
+                        })
+                        if st.session_state.get("doc_hash"):
+                            spaced_repetition.load_deck(st.session_state.doc_hash).add_cards(
+                                flashcards.reviewable_cards(pack_flashcards))
+                    if pack_mcqs:
+                        st.session_state.mcqs = pack_mcqs
+                        st.session_state.user_answers = [None] * len(pack_mcqs)
+                        st.session_state.mcq_answer_times = [None] * len(pack_mcqs)
+                        st.session_state.mcq_meta = {
+                            "difficulty": pack_difficulty,
+                            "concept": pack_concept.strip() or "Entire PDF",
+                            "started_at": time.time(),
+                        }
+                    if pack_flashcards or pack_mcqs:
+                        st.rerun()
+                    st.error("Failed to generate the study pack. Please try again.")
 
 # --- Tabs Navigation ---
 tabs = st.tabs([
@@ -387,6 +523,8 @@ with tabs[0]:
                     st.markdown(f"**Original length:** {summary_item['original_length']} words")
                     st.markdown(f"**Requested summary length:** {summary_item['requested_words']} words")
                     st.markdown(f"**Summary:**\n\n{summary_item['summary_text']}")
+                    if summary_item.get('timings'):
+                        st.caption(f"⏱️ {summary.format_timings(summary_item['timings'])}")
                     st.markdown(
                     """
                     <style>
@@ -407,25 +545,7 @@ with tabs[0]:
                         st.rerun()
 
             if st.session_state.summary_history:
-                col1, col2 = st.columns(2)
-                with col1:
-                    pdf_buffer = summary.create_summary_pdf(st.session_state.summary_history)
-                    st.download_button(
-                        label="📄 Download as PDF",
-                        data=pdf_buffer.getvalue(),
-                        file_name="Summary.pdf",
-                        mime="application/pdf",
-                        use_container_width=True
-                    )
-                with col2:
-                    csv_data = summary.create_summary_csv(st.session_state.summary_history)
-                    st.download_button(
-                        label="📊 Download as CSV",
-                        data=csv_data,
-                        file_name="Summary.csv",
-                        mime="text/csv",
-                        use_container_width=True
-                    )
+                export_buttons("summary", st.session_state.summary_history, summary.create_summary_pdf, summary.create_summary_csv, "Summary")
                         
             # This form will now have dark gray (#a8a8a8) bento styling
             with st.form(key='summary_form'):
@@ -451,22 +571,102 @@ with tabs[0]:
                     else:
                         concept_mode = "single"
                         concept_name = concept_input
+                chapter_list = st.session_state.get("chapters") or []
+                selected_chapters = []
+                if chapter_list:
+                    selected_chapters = st.multiselect(
+                        "📚 Summarize chapters (leave empty for the whole PDF):",
+                        options=list(range(len(chapter_list))),
+                        format_func=lambda i: chapters.chapter_label(chapter_list[i]),
+                        help="Each selected chapter gets its own summary of the requested length."
+                    )
+                preselect = st.checkbox(
+                    "Summarize key passages only (faster for long PDFs)",
+                    value=True,
+                    help="Picks the most central, non-overlapping passages, sized to the summary length, before calling the model."
+                )
+                progressive = st.checkbox(
+                    "Show section summaries as they finish",
+                    value=True,
+                    help="Long PDFs are summarized section by section; see each section as soon as it is ready."
+                )
                 submit_button = st.form_submit_button("Generate Summary")
                 
                 if submit_button:
+                    if progressive:
+                        progress_bar = st.progress(0.0, text="Summarizing sections...")
+                        partial_area = st.empty()
+                        partial_container = partial_area.container()
+
+                        def show_summary_progress(stage, done, total, index=None, text=None):
+                            if stage == "map":
+                                progress_bar.progress(done / total, text=f"Summarized {done}/{total} sections")
+                                if text:
+                                    partial_container.markdown(f"**Section {index + 1}:** {text}")
+                                else:
+                                    partial_container.caption(f"Section {index + 1} could not be summarized and was skipped.")
+                            elif stage == "combine":
+                                progress_bar.progress(done / total, text=f"Merging section summaries (level {index}): {done}/{total}")
+                            elif stage == "reduce":
+                                progress_bar.progress(1.0, text="Combining section summaries...")
+                            elif stage == "chapter":
+                                progress_bar.progress(done / total, text=f"Summarized {done}/{total} chapters")
+                                partial_container.markdown(f"**{chapters.chapter_label(selected[index])}:** {text}")
+
+                        summary_progress = show_summary_progress
+                    else:
+                        summary_progress = None
+
                     with st.spinner("Generating summary..."):
-                        summary_text = summary.summarize_pdf(
-                            st.session_state.text,
-                            num_words,
-                            concept_input if concept_mode == "single" else "Entire PDF",
-                            GROK_API_KEY,
-                            GROK_API_URL,
-                            GROK_MODEL
-                        )
+                        summary_timings = {}
+                        focus = concept_input if concept_mode == "single" else "Entire PDF"
+                        if selected_chapters:
+                            selected = [chapter_list[i] for i in selected_chapters]
+                            chapter_summaries = chapters.summarize_chapters(
+                                st.session_state.pages,
+                                selected,
+                                num_words,
+                                focus,
+                                GROK_API_KEY,
+                                GROK_API_URL,
+                                GROK_MODEL,
+                                timings=summary_timings,
+                                on_progress=summary_progress,
+                                doc_hash=st.session_state.get("doc_hash")
+                            )
+                            summary_text = chapters.format_chapter_summaries(selected, chapter_summaries)
+                            original_text = "".join(
+                                page + "\n" for chapter in selected
+                                for page in chapters.chapter_pages(st.session_state.pages, chapter)
+                            )
+                        else:
+                            doc_digest = digest.get_digest(st.session_state.get("doc_hash"))
+                            focus_embedding = embed_focus(focus) if preselect else None
+                            summary_text = summary.summarize_pdf(
+                                st.session_state.text,
+                                num_words,
+                                focus,
+                                GROK_API_KEY,
+                                GROK_API_URL,
+                                GROK_MODEL,
+                                timings=summary_timings,
+                                pages=st.session_state.get("pages"),
+                                on_progress=summary_progress,
+                                passages=st.session_state.chunks if preselect else None,
+                                embeddings=st.session_state.get("embeddings") if preselect else None,
+                                focus_embedding=focus_embedding,
+                                section_summaries=doc_digest["sections"] if doc_digest else None,
+                                doc_hash=st.session_state.get("doc_hash")
+                            )
+                            original_text = st.session_state.text
+                        if progressive:
+                            progress_bar.empty()
+                            partial_area.empty()
                         st.session_state.summary_history.append({
-                            'original_length': len(st.session_state.text.split()),
+                            'original_length': len(original_text.split()),
                             'requested_words': num_words,
-                            'summary_text': summary_text
+                            'summary_text': summary_text,
+                            'timings': summary_timings
                         })
                         st.rerun()
         else:
@@ -518,25 +718,7 @@ with tabs[1]:
 
             # Download buttons
             if st.session_state.qa_history:
-                col1, col2 = st.columns(2)
-                with col1:
-                        pdf_buffer = quest_ans.create_qa_pdf(st.session_state.qa_history)
-                        st.download_button(
-                            label="📄 Download as PDF",
-                            data=pdf_buffer.getvalue(),
-                            file_name="question_answer.pdf",
-                            mime="application/pdf",
-                            use_container_width=True
-                        )
-                with col2:
-                        csv_data = quest_ans.create_qa_csv(st.session_state.qa_history)
-                        st.download_button(
-                            label="📊 Download as CSV",
-                            data=csv_data,
-                            file_name="question_answer.csv",
-                            mime="text/csv",
-                            use_container_width=True
-                        )
+                export_buttons("qa", st.session_state.qa_history, quest_ans.create_qa_pdf, quest_ans.create_qa_csv, "question_answer")
 
             with st.form(key='qa_form'):
                 # Modified text area to match summarization tab style
@@ -605,6 +787,10 @@ with tabs[2]:
                 col_hist, col_del = st.columns([0.95, 0.05])
                 with col_hist:
                     st.markdown(f"**Generation {idx}** (Requested: {generation['requested_cards']} cards)")
+                    if generation.get('from_bank'):
+                        st.caption(f"{generation['from_bank']} card(s) served from the question bank")
+                    if generation.get('suppressed'):
+                        st.caption(f"{generation['suppressed']} near-duplicate card(s) suppressed")
                     for i, card in enumerate(generation['cards'], 1):
                         with st.expander(f"Card {i}: {card['question'][:50]}...", expanded=False):
                             # Add grey border styling
@@ -662,25 +848,34 @@ with tabs[2]:
                 #st.subheader("Download Options")
                 all_cards = [card for gen in st.session_state.flashcard_history for card in gen['cards']]
                 
-                col1, col2 = st.columns(2)
-                with col1:
-                    pdf_buffer = flashcards.create_flashcards_pdf(all_cards)
-                    st.download_button(
-                        label="📄 Download All as PDF",
-                        data=pdf_buffer.getvalue(),
-                        file_name="all_flashcards.pdf",
-                        mime="application/pdf",
-                        use_container_width=True
-                    )
-                with col2:
-                    csv_data = flashcards.create_flashcards_csv(all_cards)
-                    st.download_button(
-                        label="📊 Download All as CSV",
-                        data=csv_data,
-                        file_name="all_flashcards.csv",
-                        mime="text/csv",
-                        use_container_width=True
+                export_buttons("flashcards", all_cards, flashcards.create_flashcards_pdf, flashcards.create_flashcards_csv, "all_flashcards", label="Download All")
+
+            # Spaced-repetition review of every card generated for this document
+            if st.session_state.get("doc_hash"):
+                deck = spaced_repetition.load_deck(st.session_state.doc_hash)
+                with st.expander("🔁 Review due cards", expanded=False):
+                    review_stats = deck.stats()
+                    st.caption(
+                        f"{review_stats['due']} due · {review_stats['cards']} cards · "
+                        f"{review_stats['learned']} learned · {review_stats['lapses']} lapses"
                     )
+                    card_index = deck.next_due()
+                    if card_index is None:
+                        st.write("Nothing is due right now. Generated cards join the deck automatically.")
+                    else:
+                        due_card = deck.card(card_index)
+                        st.markdown(f"**Question:** {due_card['question']}")
+                        if st.session_state.get("review_revealed") == card_index:
+                            st.markdown(f"**Answer:** {due_card['answer']}")
+                            grade_cols = st.columns(len(spaced_repetition.GRADES))
+                            for grade_col, grade in zip(grade_cols, spaced_repetition.GRADES):
+                                if grade_col.button(grade, key=f"review_{grade}", use_container_width=True):
+                                    deck.review(card_index, grade)
+                                    st.session_state.review_revealed = None
+                                    st.rerun()
+                        elif st.button("Show answer", key="review_reveal"):
+                            st.session_state.review_revealed = card_index
+                            st.rerun()
 
             # Current flashcard generation form
             with st.form(key='flashcard_form'):
@@ -707,36 +902,74 @@ with tabs[2]:
                         concept_mode = "single"
                         concept_name = concept_input
                 
+                stream_cards = st.checkbox("Show cards as they are generated", value=True, key="flashcard_stream")
                 submit_button = st.form_submit_button("Generate Flashcards")
                 
                 if submit_button:
+                    live_cards = st.container()
                     with st.spinner("Creating flashcards..."):
-                        flashcard_list = flashcards.generate_flashcards(
-                            st.session_state.text,
-                            num_cards,
-                            concept_input if concept_mode == "single" else "Entire PDF",
-                            GROK_API_KEY,
-                            GROK_API_URL,
-                            GROK_MODEL
-                        )
-                        
-                        # Handle potential parsing issues
-                        if len(flashcard_list) == 1:
-                            qtext = flashcard_list[0]['question']
-                            atext = flashcard_list[0]['answer']
-                            if any(x in qtext for x in ['\nQ:', '\nQuestion:', 'Flashcard']) or any(x in atext for x in ['\nQ:', '\nQuestion:', 'Flashcard']):
-                                text = qtext + '\nA: ' + atext
-                                parsed = flashcards.parse_flashcards(text)
-                                if parsed:
-                                    flashcard_list = parsed
+                        focus_embedding = embed_focus(concept_input)
+                        seen_cards = [card['question'] for gen in st.session_state.flashcard_history for card in gen['cards']]
+                        # Whole-PDF decks come from the question bank first; the LLM only fills the gap
+                        banked = []
+                        if concept_mode == "entire" and st.session_state.get("doc_hash"):
+                            banked = question_bank.draw(st.session_state.doc_hash, "flashcards", num_cards,
+                                                        exclude_questions=seen_cards)
+                        # Skip paraphrases of each other and of cards already in the history
+                        flashcard_list, suppressed = [], 0
+                        if len(banked) < num_cards:
+                            def request_cards(count, exclude, stream=False):
+                                generator = flashcards.stream_flashcards if stream else flashcards.generate_flashcards
+                                return generator(
+                                    st.session_state.text,
+                                    count,
+                                    concept_input if concept_mode == "single" else "Entire PDF",
+                                    GROK_API_KEY,
+                                    GROK_API_URL,
+                                    GROK_MODEL,
+                                    passages=st.session_state.chunks,
+                                    embeddings=st.session_state.get("embeddings"),
+                                    focus_embedding=focus_embedding,
+                                    exclude_questions=exclude
+                                )
+
+                            def generate(count, exclude):
+                                if not stream_cards:
+                                    return request_cards(count, exclude)
+                                # Each card is shown as soon as its Q:/A: pair (or its shard) is done
+                                return collect_stream(
+                                    request_cards(count, exclude, stream=True),
+                                    lambda n, card: live_cards.markdown(f"**Card {len(banked) + n}:** {card['question']}"),
+                                    lambda: request_cards(count, exclude)
+                                )
+
+                            flashcard_list, suppressed = dedup.generate_unique(
+                                generate,
+                                num_cards - len(banked),
+                                embed_texts,
+                                seen_questions=seen_cards + [card['question'] for card in banked],
+                                cache=st.session_state.setdefault("question_vectors", {})
+                            )
+                        if concept_mode == "entire" and st.session_state.get("doc_hash"):
+                            # Whole-document cards stay available for later decks
+                            question_bank.add_items(st.session_state.doc_hash, "flashcards", [
+                                dict(card, difficulty=None, cluster=None, chunk=None)
+                                for card in flashcards.reviewable_cards(flashcard_list)
+                            ])
+                        flashcard_list = banked + flashcard_list
                         
                         if flashcard_list:
                             st.session_state.flashcard_history.append({
                                 'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
                                 'requested_cards': num_cards,
                                 'actual_cards': len(flashcard_list),
-                                'cards': flashcard_list
+                                'cards': flashcard_list,
+                                'suppressed': suppressed,
+                                'from_bank': len(banked)
                             })
+                            if st.session_state.get("doc_hash"):
+                                spaced_repetition.load_deck(st.session_state.doc_hash).add_cards(
+                                    flashcards.reviewable_cards(flashcard_list))
                             st.rerun()
                         else:
                             st.error("Failed to generate flashcards. Please try again.")
@@ -771,6 +1004,8 @@ with tabs[3]:
             # Display history/questions section above the form
             if st.session_state.get("mcqs"):
                 st.subheader("📝 Answer the questions:")
+                if st.session_state.get("mcq_suppressed"):
+                    st.caption(f"{st.session_state.mcq_suppressed} near-duplicate question(s) suppressed")
                 
                 # Add custom styling for questions and buttons
                 st.markdown(
@@ -809,11 +1044,18 @@ with tabs[3]:
                                 index=None
                             )
                             if selected:
-                                st.session_state.user_answers[i] = chr(65 + option_labels.index(selected))
+                                answer = chr(65 + option_labels.index(selected))
+                                if st.session_state.user_answers[i] != answer:
+                                    answer_times = st.session_state.setdefault("mcq_answer_times", [None] * len(st.session_state.mcqs))
+                                    if i < len(answer_times):
+                                        answer_times[i] = time.time()
+                                st.session_state.user_answers[i] = answer
                         with col_del:
                             if st.button("❌", key=f"del_mcq_{i}", help="Delete this question"):
                                 del st.session_state.mcqs[i]
                                 del st.session_state.user_answers[i]
+                                if i < len(st.session_state.get("mcq_answer_times", [])):
+                                    del st.session_state.mcq_answer_times[i]
                                 st.rerun()
                         
                         st.markdown('</div>', unsafe_allow_html=True)
@@ -852,6 +1094,22 @@ with tabs[3]:
                         st.warning("Please answer all questions before submitting.")
                     else:
                         correct, total = mcq_generator.calculate_score(st.session_state.user_answers, st.session_state.mcqs)
+                        # Each quiz is recorded once, on its first complete submission
+                        quiz_meta = st.session_state.setdefault("mcq_meta", {})
+                        if st.session_state.get("doc_hash") and not quiz_meta.get("recorded"):
+                            try:
+                                quiz_store.record_attempt(
+                                    st.session_state.doc_hash,
+                                    st.session_state.mcqs,
+                                    st.session_state.user_answers,
+                                    quiz_meta.get("difficulty"),
+                                    quiz_meta.get("concept", "Entire PDF"),
+                                    started_at=quiz_meta.get("started_at"),
+                                    answered_at=st.session_state.get("mcq_answer_times")
+                                )
+                                quiz_meta["recorded"] = True
+                            except Exception as e:
+                                print(f"[main] Could not record quiz attempt: {e}")
                         percentage = (correct / total) * 100
                         
                         st.subheader("🎯 Quiz Results")
@@ -900,25 +1158,7 @@ with tabs[3]:
                                 st.divider()
 
                 # Download buttons
-                col1, col2 = st.columns(2)
-                with col1:
-                    pdf_buffer = mcq_generator.create_mcqs_pdf(st.session_state.mcqs)
-                    st.download_button(
-                        label="📄 Download as PDF",
-                        data=pdf_buffer.getvalue(),
-                        file_name="mcqs.pdf",
-                        mime="application/pdf",
-                        use_container_width=True
-                    )
-                with col2:
-                    csv_data = mcq_generator.create_mcqs_csv(st.session_state.mcqs)
-                    st.download_button(
-                        label="📊 Download as CSV",
-                        data=csv_data,
-                        file_name="mcqs.csv",
-                        mime="text/csv",
-                        use_container_width=True
-                    )
+                export_buttons("mcqs", st.session_state.mcqs, mcq_generator.create_mcqs_pdf, mcq_generator.create_mcqs_csv, "mcqs")
 
             # Input form for new MCQs
             with st.form(key='mcq_form'):
@@ -946,8 +1186,8 @@ with tabs[3]:
                 
                 target = st.radio(
                     "What's your goal?",
-                    ["🎯 Quick Review", "📚 Thorough Understanding", "🧠 Master the Topic"],
-                    help="Quick Review: Basic concepts | Thorough Understanding: Analysis & application | Master the Topic: Critical thinking & synthesis",
+                    ["🎯 Quick Review", "📚 Thorough Understanding", "🧠 Master the Topic", "🧭 Adaptive"],
+                    help="Quick Review: Basic concepts | Thorough Understanding: Analysis & application | Master the Topic: Critical thinking & synthesis | Adaptive: difficulty per concept from your quiz results",
                     horizontal=True,
                     label_visibility="visible"
                 )
@@ -955,27 +1195,116 @@ with tabs[3]:
                     "🎯 Quick Review": "Easy",
                     "📚 Thorough Understanding": "Medium", 
                     "🧠 Master the Topic": "Hard"
-                }[target]
+                }.get(target)  # None: adaptive
 
+                stream_mcqs = st.checkbox("Show questions as they are generated", value=True, key="mcq_stream")
                 submit_button = st.form_submit_button("Generate MCQs")
             
                 if submit_button:
                     # Only generate new MCQs if the form is submitted
+                    live_mcqs = st.container()
                     with st.spinner("Creating MCQs..."):
-                        mcq_list = mcq_generator.generate_mcqs(
-                            st.session_state.text,
-                            num_questions,
-                            difficulty,
-                            concept_input if concept_mode == "single" else "Entire PDF",
-                            GROK_API_KEY,
-                            GROK_API_URL,
-                            GROK_MODEL
-                        )
+                        focus_embedding = embed_focus(concept_input)
+                        seen_mcqs = st.session_state.setdefault("mcq_seen_questions", [])
+                        doc_hash = st.session_state.get("doc_hash")
+                        banked, needed = [], {}
+                        if difficulty is None and doc_hash:
+                            # Adaptive: earlier items matched to the measured accuracy per concept;
+                            # the LLM only writes what the bank cannot supply
+                            if concept_mode == "entire":
+                                banked, needed = adaptive_quiz.assemble(doc_hash, num_questions, exclude_questions=seen_mcqs)
+                            else:
+                                needed = {adaptive_quiz.concept_level(doc_hash, concept_input): num_questions}
+                        else:
+                            # Whole-PDF quizzes come from the question bank first; the LLM only fills the gap
+                            difficulty = difficulty or "Medium"
+                            if concept_mode == "entire" and doc_hash:
+                                banked = question_bank.draw(doc_hash, "mcqs", num_questions,
+                                                            difficulty=difficulty, exclude_questions=seen_mcqs)
+                            if len(banked) < num_questions:
+                                needed = {difficulty: num_questions - len(banked)}
+                        # Skip paraphrases of each other and of questions from earlier runs
+                        mcq_list, suppressed = [], 0
+                        for level, count_needed in needed.items():
+                            def request_mcqs(count, exclude, stream=False, level=level):
+                                generator = mcq_generator.stream_mcqs if stream else mcq_generator.generate_mcqs
+                                return generator(
+                                    st.session_state.text,
+                                    count,
+                                    level,
+                                    concept_input if concept_mode == "single" else "Entire PDF",
+                                    GROK_API_KEY,
+                                    GROK_API_URL,
+                                    GROK_MODEL,
+                                    passages=st.session_state.chunks,
+                                    embeddings=st.session_state.get("embeddings"),
+                                    focus_embedding=focus_embedding,
+                                    exclude_questions=exclude
+                                )
+
+                            def generate(count, exclude, request_mcqs=request_mcqs, offset=len(banked) + len(mcq_list)):
+                                if not stream_mcqs:
+                                    return request_mcqs(count, exclude)
+                                # Each question is shown as soon as its "Correct Answer:" line (or its shard) is done
+                                return collect_stream(
+                                    request_mcqs(count, exclude, stream=True),
+                                    lambda n, mcq: live_mcqs.markdown(f"**Question {offset + n}:** {mcq['question']}"),
+                                    lambda: request_mcqs(count, exclude)
+                                )
+
+                            generated, dropped = dedup.generate_unique(
+                                generate,
+                                count_needed,
+                                embed_texts,
+                                seen_questions=seen_mcqs + [mcq['question'] for mcq in banked + mcq_list],
+                                cache=st.session_state.setdefault("question_vectors", {})
+                            )
+                            generated = [dict(mcq, difficulty=level) for mcq in generated]
+                            if concept_mode == "entire" and doc_hash:
+                                # Whole-document items stay available for later (adaptive) quizzes
+                                question_bank.add_items(doc_hash, "mcqs", [dict(mcq, cluster=None, chunk=None) for mcq in generated])
+                            mcq_list += generated
+                            suppressed += dropped
+                        mcq_list = banked + mcq_list
+                        st.session_state.mcq_suppressed = suppressed
                         if mcq_list:
+                            seen_mcqs.extend(mcq['question'] for mcq in mcq_list)
                             st.session_state.mcqs = mcq_list
                             st.session_state.user_answers = [None] * len(mcq_list)
+                            st.session_state.mcq_answer_times = [None] * len(mcq_list)
+                            st.session_state.mcq_meta = {
+                                "difficulty": difficulty or "Adaptive",
+                                "concept": concept_input if concept_mode == "single" else "Entire PDF",
+                                "started_at": time.time(),
+                            }
                             st.success(f"✅ Generated {len(mcq_list)} MCQs for {target}!")
                             st.rerun()
+
+            # Analytics over every recorded attempt for this document
+            if st.session_state.get("doc_hash"):
+                with st.expander("📈 Quiz analytics", expanded=False):
+                    try:
+                        quiz_history = quiz_store.history(st.session_state.doc_hash)
+                    except Exception as e:
+                        quiz_history = []
+                        st.caption(f"Quiz history is unavailable: {e}")
+                    if not quiz_history:
+                        st.write("Submit a quiz to start tracking your results.")
+                    else:
+                        st.markdown("**Accuracy over time**")
+                        st.line_chart({"accuracy": [day["accuracy"] for day in quiz_history]})
+                        st.caption(" · ".join(f"{day['date']}: {day['answered']} answered" for day in quiz_history[-7:]))
+                        st.markdown("**By concept** (weakest first)")
+                        st.dataframe(quiz_store.concept_accuracy(st.session_state.doc_hash), use_container_width=True)
+                        calibration = quiz_store.difficulty_calibration(st.session_state.doc_hash)
+                        st.markdown("**By difficulty**")
+                        st.dataframe(calibration["levels"], use_container_width=True)
+                        st.caption("Questions by requested difficulty (columns) and how they actually played (rows):")
+                        st.dataframe(calibration["matrix"], use_container_width=True)
+                        weakest = quiz_store.weakest_questions(st.session_state.doc_hash, limit=5)
+                        if weakest:
+                            st.markdown("**Questions to revisit**")
+                            st.dataframe(weakest, use_container_width=True)
         else:
             st.warning("Please upload and process a PDF first to generate MCQs.")
             
@@ -1025,25 +1354,7 @@ with tabs[4]:
                         st.rerun()
             
             if st.session_state.eli5_history:
-                col1, col2 = st.columns(2)
-                with col1:
-                    pdf_buffer = exp_5.create_eli5_pdf(st.session_state.eli5_history)
-                    st.download_button(
-                        label="📄 Download as PDF",
-                        data=pdf_buffer.getvalue(),
-                        file_name="eli5.pdf",
-                        mime="application/pdf",
-                        use_container_width=True
-                    )
-                with col2:
-                    csv_data = exp_5.create_eli5_csv(st.session_state.eli5_history)
-                    st.download_button(
-                        label="📊 Download as CSV",
-                        data=csv_data,
-                        file_name="eli5.csv",
-                        mime="text/csv",
-                        use_container_width=True
-                    )
+                export_buttons("eli5", st.session_state.eli5_history, exp_5.create_eli5_pdf, exp_5.create_eli5_csv, "eli5")
 
             # Input form
             with st.form(key='eli5_form'):
@@ -1122,25 +1433,7 @@ with tabs[5]:
                             st.rerun()
 
                 if st.session_state.insights_history:
-                    col1, col2 = st.columns(2)
-                    with col1:
-                        pdf_buffer = insights.create_insights_pdf(st.session_state.insights_history)
-                        st.download_button(
-                            label="📄 Download as PDF",
-                            data=pdf_buffer.getvalue(),
-                            file_name="insights.pdf",
-                            mime="application/pdf",
-                            use_container_width=True
-                        )
-                    with col2:
-                        csv_data = insights.create_insights_csv(st.session_state.insights_history)
-                        st.download_button(
-                            label="📊 Download as CSV",
-                            data=csv_data,
-                            file_name="insights.csv",
-                            mime="text/csv",
-                            use_container_width=True
-                        )
+                    export_buttons("insights", st.session_state.insights_history, insights.create_insights_pdf, insights.create_insights_csv, "insights")
 
                 # Input form for new insights
                 with st.form(key='insights_form'):
@@ -1170,4 +1463,21 @@ with tabs[5]:
         else:
             st.warning("Please upload and process a PDF first.")
 
-
+# --- LLM Usage (sidebar) ---
+with st.sidebar:
+    with st.expander("📈 LLM usage", expanded=False):
+        by_tab = st.toggle("Group by tab", value=True, key="usage_by_tab")
+        usage_rows = token_budget.get_usage_report(by_tab=by_tab)
+        if usage_rows:
+            st.dataframe(usage_rows, use_container_width=True, hide_index=True)
+        else:
+            st.caption("No LLM calls yet.")
+        coalescing = llm_client.get_coalescing_stats()
+        st.caption(
+            f"Requests: {coalescing['requests']} · upstream calls: {coalescing['upstream_calls']} · "
+            f"coalesced: {coalescing['coalesced']} · in flight: {coalescing['in_flight']}"
+        )
+        route_rows = model_router.get_route_report()
+        if route_rows:
+            st.markdown("**Latency by route**")
+            st.dataframe(route_rows, use_container_width=True, hide_index=True)
@@ -1,15 +1,29 @@
-import requests
-import re
-import pandas as pd
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-import io
 import re
+from reportlab.platypus import Paragraph, Spacer
+from reportlab.lib.styles import getSampleStyleSheet
+import coverage_sampling
+import dedup
+import digest
+import exports
+import llm_client
+import qa_parser
+import sharding
+import structured_output
+import token_budget
+
+# Difficulty-specific instructions
+DIFFICULTY_INSTRUCTIONS = {
+    "Easy": "Create basic, straightforward questions that test fundamental understanding. Use simple language and obvious answer choices.",
+    "Medium": "Create moderately challenging questions that test comprehension and application. Include some analysis and reasoning.",
+    "Hard": "Create advanced questions that test deep understanding, critical thinking, and complex concepts. Include synthesis and evaluation."
+}
 
-def generate_mcqs(text, num_questions, difficulty, concept, groq_api_key, groq_api_url, groq_model):
+def generate_mcqs(text, num_questions, difficulty, concept, groq_api_key, groq_api_url, groq_model, output_format="json",
+                  condensed_text=None, passages=None, embeddings=None, focus_embedding=None,
+                  exclude_questions=None):
     """
     Generate multiple choice questions from PDF text using Groq's LLM.
+    Sets larger than sharding.SHARD_SIZE are generated in concurrent shards.
     Args:
         text (str): The PDF text content
         num_questions (int): Number of MCQs to generate
@@ -18,82 +32,62 @@ def generate_mcqs(text, num_questions, difficulty, concept, groq_api_key, groq_a
         groq_api_key (str): Groq API key
         groq_api_url (str): Groq API endpoint
         groq_model (str): Model name
+        output_format (str): "json" for JSON-mode generation, "text" for the Q:/A) format
+        condensed_text (str): Optional condensed study text used instead of the
+            shared pre-summary (digest.condensed_text)
+        passages (list): Optional paragraphs with their embeddings; long documents
+            are then sampled across embedding clusters (coverage_sampling.py)
+        embeddings (np.ndarray): Embedding rows for passages
+        focus_embedding (np.ndarray): Optional embedding of the focus concept
+        exclude_questions (list): Questions the model should not repeat
     Returns:
         list: List of dictionaries with 'question', 'options', 'correct_answer' keys
     """
-    # If text is too long, use a summary first
-    max_text_length = 3000
-    if len(text) > max_text_length:
-        # Create a summary for MCQ generation
-        summary_prompt = f"Summarize the following content in 500 words to create MCQs from:\n\n{text}"
-        headers = {
-            "Authorization": f"Bearer {groq_api_key}",
-            "Content-Type": "application/json"
-        }
-        payload = {
-            "model": groq_model,
-            "messages": [{"role": "user", "content": summary_prompt}],
-            "max_tokens": 512,
-            "temperature": 0.3
-        }
-        try:
-            response = requests.post(groq_api_url, headers=headers, json=payload, timeout=120)
-            response.raise_for_status()
-            data = response.json()
-            text = data.get("choices", [{}])[0].get("message", {}).get("content", text[:max_text_length]).strip()
-        except Exception as e:
-            text = text[:max_text_length]  # Fallback to truncated text
-    
-    # Difficulty-specific instructions
-    difficulty_instructions = {
-        "Easy": "Create basic, straightforward questions that test fundamental understanding. Use simple language and obvious answer choices.",
-        "Medium": "Create moderately challenging questions that test comprehension and application. Include some analysis and reasoning.",
-        "Hard": "Create advanced questions that test deep understanding, critical thinking, and complex concepts. Include synthesis and evaluation."
-    }
-
     # Concept-specific instructions
     if concept.lower() == "entire pdf":
         concept_instruction = "Use the contents in the entire PDF to generate MCQs based on the difficulty level."
     else:
         concept_instruction = f"Focus deeply ONLY on: **{concept}** (ignore unrelated content). All questions must be about this specific concept."
+    if exclude_questions:
+        concept_instruction += dedup.exclusion_instruction(exclude_questions)
     
-    # Generate MCQs
-    prompt = f"""Create {num_questions} multiple choice questions from the following content.
-                    Difficulty Level: {difficulty}
-                    {difficulty_instructions.get(difficulty, difficulty_instructions["Medium"])}
-                    Content Scope: 
-                    {concept_instruction}
+    difficulty_instruction = DIFFICULTY_INSTRUCTIONS.get(difficulty, DIFFICULTY_INSTRUCTIONS["Medium"])
 
-Each question should have exactly 4 options (A, B, C, D) with only one correct answer.
-Format each MCQ as:
-Q: [question]
-A) [option A]
-B) [option B] 
-C) [option C]
-D) [option D]
-Correct Answer: [A/B/C/D]
-
-Content:
-{text}
+    # Large sets: concurrent sub-requests over different content slices
+    if output_format == "json" and num_questions > sharding.SHARD_SIZE:
+        slices = sharding.source_slices(
+            condensed_text or text, len(sharding.shard_counts(num_questions)),
+            passages=None if condensed_text else passages, embeddings=embeddings, focus_embedding=focus_embedding
+        )
+        mcqs = sharding.generate_in_shards(
+            num_questions, slices,
+            lambda source, count: generate_mcqs_json(
+                source, count, difficulty, difficulty_instruction, concept_instruction,
+                groq_api_key, groq_api_url, groq_model, max_tokens=512 + 150 * count
+            )
+        )
+        if mcqs:
+            return mcqs
+        print("[DEBUG] Sharded MCQ generation returned nothing usable, using a single request")
 
-MCQs:"""
+    text = _source_text(text, num_questions, groq_api_key, groq_api_url, groq_model,
+                        condensed_text, passages, embeddings, focus_embedding)
     
-    headers = {
-        "Authorization": f"Bearer {groq_api_key}",
-        "Content-Type": "application/json"
-    }
-    payload = {
-        "model": groq_model,
-        "messages": [{"role": "user", "content": prompt}],
-        "max_tokens": 2048,
-        "temperature": 0.3
-    }
+    if output_format == "json":
+        mcqs = generate_mcqs_json(text, num_questions, difficulty, difficulty_instruction, concept_instruction,
+                                  groq_api_key, groq_api_url, groq_model)
+        if mcqs:
+            return mcqs[:num_questions]
+        print("[DEBUG] JSON MCQ generation returned nothing usable, using text format")
+
+    # Generate MCQs
+    prompt = _text_prompt(text, num_questions, difficulty, difficulty_instruction, concept_instruction)
     
     try:
-        response = requests.post(groq_api_url, headers=headers, json=payload, timeout=120)
-        response.raise_for_status()
-        data = response.json()
-        mcq_text = data.get("choices", [{}])[0].get("message", {}).get("content", "").strip()
+        mcq_text = llm_client.complete(
+            prompt, groq_api_key, groq_api_url, groq_model,
+            feature="mcq", max_tokens=2048, temperature=0.3
+        ).strip()
         print("[DEBUG] Raw LLM MCQ response:\n", mcq_text)
         # Parse the MCQs
         mcqs = parse_mcqs(mcq_text)
@@ -107,132 +101,186 @@ MCQs:"""
         print(f"[DEBUG] Exception in generate_mcqs: {e}")
         return [{"question": f"Error generating MCQs: {e}", "options": ["A) Try again", "B) Try again", "C) Try again", "D) Try again"], "correct_answer": "A"}]
 
-def create_simple_mcqs(text, num_questions, groq_api_key, groq_api_url, groq_model):
+def stream_mcqs(text, num_questions, difficulty, concept, groq_api_key, groq_api_url, groq_model,
+                condensed_text=None, passages=None, embeddings=None, focus_embedding=None,
+                exclude_questions=None):
     """
-    Create simple MCQs when parsing fails.
+    Generate MCQs with a streamed Q:/A) completion, yielding each MCQ as soon as
+    its "Correct Answer:" line arrives (qa_parser.MCQStreamParser).
+    Takes the same arguments as generate_mcqs. Sets larger than sharding.SHARD_SIZE
+    run as concurrent JSON shards and yield each shard's MCQs as it finishes.
+    Yields:
+        dict: 'question', 'options', 'correct_answer'
     """
-    prompt = f"""From this content, create {num_questions} simple multiple choice questions.
-Each question should have 4 options (A, B, C, D) with only one correct answer.
-Format: "Q: [question] A) [option] B) [option] C) [option] D) [option] Correct Answer: [A/B/C/D]"
+    if concept.lower() == "entire pdf":
+        concept_instruction = "Use the contents in the entire PDF to generate MCQs based on the difficulty level."
+    else:
+        concept_instruction = f"Focus deeply ONLY on: **{concept}** (ignore unrelated content). All questions must be about this specific concept."
+    if exclude_questions:
+        concept_instruction += dedup.exclusion_instruction(exclude_questions)
+    difficulty_instruction = DIFFICULTY_INSTRUCTIONS.get(difficulty, DIFFICULTY_INSTRUCTIONS["Medium"])
 
-Content: {text[:2000]}
+    if num_questions > sharding.SHARD_SIZE:
+        slices = sharding.source_slices(
+            condensed_text or text, len(sharding.shard_counts(num_questions)),
+            passages=None if condensed_text else passages, embeddings=embeddings, focus_embedding=focus_embedding
+        )
+        yield from sharding.iter_shards(
+            num_questions, slices,
+            lambda source, count: generate_mcqs_json(
+                source, count, difficulty, difficulty_instruction, concept_instruction,
+                groq_api_key, groq_api_url, groq_model, max_tokens=512 + 150 * count
+            )
+        )
+        return
 
-Simple MCQs:"""
-    
-    headers = {
-        "Authorization": f"Bearer {groq_api_key}",
-        "Content-Type": "application/json"
-    }
-    payload = {
-        "model": groq_model,
-        "messages": [{"role": "user", "content": prompt}],
-        "max_tokens": 1024,
-        "temperature": 0.3
-    }
-    
+    text = _source_text(text, num_questions, groq_api_key, groq_api_url, groq_model,
+                        condensed_text, passages, embeddings, focus_embedding)
+
+    parser = qa_parser.MCQStreamParser()
+    emitted = 0
+    stream = llm_client.stream_complete(
+        _text_prompt(text, num_questions, difficulty, difficulty_instruction, concept_instruction),
+        groq_api_key, groq_api_url, groq_model,
+        feature="mcq", max_tokens=512 + 150 * num_questions, temperature=0.3
+    )
+    for delta in stream:
+        for mcq in parser.feed(delta):
+            if emitted < num_questions:
+                emitted += 1
+                yield mcq
+    for mcq in parser.close():
+        if emitted < num_questions:
+            emitted += 1
+            yield mcq
+
+def _source_text(text, num_questions, groq_api_key, groq_api_url, groq_model,
+                 condensed_text=None, passages=None, embeddings=None, focus_embedding=None):
+    """The content a single MCQ request is generated from."""
+    # If text is too long, use a summary first
+    # ~750 tokens is roughly the old 3000-character limit
+    max_text_tokens = 750
+    if condensed_text:
+        return condensed_text
+    if token_budget.count_tokens(text) <= max_text_tokens:
+        return text
+    if focus_embedding is None:
+        # A finished upload digest already condenses the whole document
+        ready = digest.ready_condensed_text(text)
+        if ready:
+            return ready
+    if passages and embeddings is not None:
+        # Representative passages from every topic cluster, not just the first pages
+        return coverage_sampling.sample_text(passages, embeddings, num_questions, focus_embedding=focus_embedding) or \
+            token_budget.truncate_to_tokens(text, max_text_tokens)
+    # One condensation per document, shared with the other generator
     try:
-        response = requests.post(groq_api_url, headers=headers, json=payload, timeout=120)
-        response.raise_for_status()
-        data = response.json()
-        result = data.get("choices", [{}])[0].get("message", {}).get("content", "").strip()
-        
-        # Simple parsing
-        mcqs = []
-        lines = result.split('\n')
-        current_q = None
-        current_options = []
-        current_correct = None
-        
-        for line in lines:
-            line = line.strip()
-            if line.startswith('Q:'):
-                # Save previous MCQ if complete
-                if current_q and len(current_options) == 4 and current_correct:
-                    mcqs.append({
-                        "question": current_q,
-                        "options": current_options,
-                        "correct_answer": current_correct
-                    })
-                
-                # Start new MCQ
-                current_q = line[2:].strip()
-                current_options = []
-                current_correct = None
-            elif line.startswith(('A)', 'A.')):
-                current_options.append(line[2:].strip())
-            elif line.startswith(('B)', 'B.')):
-                current_options.append(line[2:].strip())
-            elif line.startswith(('C)', 'C.')):
-                current_options.append(line[2:].strip())
-            elif line.startswith(('D)', 'D.')):
-                current_options.append(line[2:].strip())
-            elif line.startswith('Correct Answer:'):
-                current_correct = line.split(':')[1].strip().upper()
-        
-        # Add last MCQ
-        if current_q and len(current_options) == 4 and current_correct:
-            mcqs.append({
-                "question": current_q,
-                "options": current_options,
-                "correct_answer": current_correct
-            })
-        
-        return mcqs[:num_questions]
-        
+        return digest.condensed_text(text, groq_api_key, groq_api_url, groq_model)
     except Exception as e:
-        return [{"question": "What is the main topic?", "options": ["A) Various topics", "B) One topic", "C) No topic", "D) Multiple topics"], "correct_answer": "A"}]
+        return token_budget.truncate_to_tokens(text, max_text_tokens)  # Fallback to truncated text
 
-def parse_mcqs(text):
+def _text_prompt(text, num_questions, difficulty, difficulty_instruction, concept_instruction):
+    return f"""Create {num_questions} multiple choice questions from the following content.
+                    Difficulty Level: {difficulty}
+                    {difficulty_instruction}
+                    Content Scope: 
+                    {concept_instruction}
+
+Each question should have exactly 4 options (A, B, C, D) with only one correct answer.
+Format each MCQ as:
+Q: [question]
+A) [option A]
+B) [option B] 
+C) [option C]
+D) [option D]
+Correct Answer: [A/B/C/D]
+
+Content:
+{text}
+
+MCQs:"""
+
+def generate_mcqs_json(text, num_questions, difficulty, difficulty_instruction, concept_instruction,
+                       groq_api_key, groq_api_url, groq_model, max_tokens=2048):
     """
-    Parse MCQ text into structured format.
+    Generate MCQs in JSON mode and parse them locally.
+    Malformed or truncated JSON is repaired locally, and a response that ignored
+    JSON mode is still parsed as Q:/A) text, so no second LLM call is needed.
+    Returns an empty list only when nothing usable came back.
     """
+    prompt = f"""Create {num_questions} multiple choice questions from the following content.
+Difficulty Level: {difficulty}
+{difficulty_instruction}
+Content Scope:
+{concept_instruction}
+
+Each question must have exactly 4 options with only one correct answer.
+Respond with JSON only, using exactly this structure:
+{{"mcqs": [{{"question": "...", "options": ["...", "...", "...", "..."], "correct_answer": "A"}}]}}
+Options must not start with a letter label. correct_answer is one of A, B, C, D.
+
+Content:
+{text}"""
+
+    try:
+        raw = llm_client.complete(
+            prompt, groq_api_key, groq_api_url, groq_model,
+            feature="mcq", max_tokens=max_tokens, temperature=0.3,
+            response_format=structured_output.JSON_RESPONSE_FORMAT
+        )
+    except Exception as e:
+        raw = structured_output.failed_generation_from_error(e)
+        if not raw:
+            print(f"[DEBUG] JSON-mode MCQ request failed: {e}")
+            return []
+
+    mcqs = parse_mcq_json(raw)
+    if not mcqs:
+        mcqs = parse_mcqs(structured_output.strip_wrappers(raw))
+    return mcqs
+
+def parse_mcq_json(text):
+    """Parse a JSON MCQ response (tolerating damage) into the standard MCQ dicts."""
     mcqs = []
-    
-    # Split by question markers
-    question_blocks = re.split(r'(?:^|\n)\s*Q[:\.]?\s*', text, flags=re.IGNORECASE)
-    
-    for block in question_blocks:
-        block = block.strip()
-        if not block:
-            continue
-            
-        # Extract question and options
-        lines = block.split('\n')
-        if len(lines) < 5:  # Need question + 4 options + correct answer
-            continue
-            
-        question = lines[0].strip()
-        if not question:
-            continue
-            
-        options = []
-        correct_answer = None
-        
-        for line in lines[1:]:
-            line = line.strip()
-            if line.startswith(('A)', 'A.')):
-                options.append(line[2:].strip())
-            elif line.startswith(('B)', 'B.')):
-                options.append(line[2:].strip())
-            elif line.startswith(('C)', 'C.')):
-                options.append(line[2:].strip())
-            elif line.startswith(('D)', 'D.')):
-                options.append(line[2:].strip())
-            elif line.startswith('Correct Answer:'):
-                correct = line.split(':')[1].strip().upper()
-                if correct in ['A', 'B', 'C', 'D']:
-                    correct_answer = correct
-        
-        if len(options) == 4 and correct_answer:
-            mcqs.append({
-                "question": question,
-                "options": options,
-                "correct_answer": correct_answer
-            })
-    
+    for item in structured_output.extract_items(text, "mcqs"):
+        mcq = normalize_mcq(item)
+        if mcq:
+            mcqs.append(mcq)
     return mcqs
 
-def create_simple_mcqs(text, num_questions, ollama_base_url, ollama_model):
+def normalize_mcq(item):
+    """
+    Coerce one JSON MCQ into {"question", "options" (4 strings), "correct_answer" (A-D)}.
+    Accepts options as a list or an {"A": ..., "B": ...} mapping, strips "A) " labels,
+    and resolves the answer given as a letter, "B) text", an index or the option text.
+    Returns None if the item cannot be made valid.
+    """
+    question = str(item.get("question") or item.get("q") or "").strip()
+    options = item.get("options") or item.get("choices")
+    if isinstance(options, dict):
+        options = [options[key] for key in sorted(options)]
+    if not question or not isinstance(options, list) or len(options) != 4:
+        return None
+    options = [re.sub(r'^\(?[A-Da-d][\).:]\s+', '', str(option)).strip() for option in options]
+
+    answer = item.get("correct_answer", item.get("answer"))
+    letter = None
+    if isinstance(answer, int) and 0 <= answer < 4:
+        letter = chr(65 + answer)
+    elif isinstance(answer, str):
+        answer = answer.strip()
+        match = re.match(r'^\(?([A-Da-d])(?:[\).:]|$)', answer)
+        if match:
+            letter = match.group(1).upper()
+        else:
+            lowered = [option.lower() for option in options]
+            if answer.lower() in lowered:
+                letter = chr(65 + lowered.index(answer.lower()))
+    if not letter:
+        return None
+    return {"question": question, "options": options, "correct_answer": letter}
+
+def create_simple_mcqs(text, num_questions, groq_api_key, groq_api_url, groq_model):
     """
     Create simple MCQs when parsing fails.
     """
@@ -240,73 +288,28 @@ def create_simple_mcqs(text, num_questions, ollama_base_url, ollama_model):
 Each question should have 4 options (A, B, C, D) with only one correct answer.
 Format: "Q: [question] A) [option] B) [option] C) [option] D) [option] Correct Answer: [A/B/C/D]"
 
-Content: {text[:2000]}
+Content: {token_budget.truncate_to_tokens(text, 500)}
 
 Simple MCQs:"""
     
-    url = f"{ollama_base_url}/api/generate"
-    payload = {
-        "model": ollama_model,
-        "prompt": prompt,
-        "stream": False,
-        "options": {
-            "num_predict": 1024,
-            "stop": ["\n\n\n\n"]
-        }
-    }
-    
     try:
-        response = requests.post(url, json=payload, timeout=120)
-        response.raise_for_status()
-        data = response.json()
-        result = data.get("response", "").strip()
-        
-        # Simple parsing
-        mcqs = []
-        lines = result.split('\n')
-        current_q = None
-        current_options = []
-        current_correct = None
-        
-        for line in lines:
-            line = line.strip()
-            if line.startswith('Q:'):
-                # Save previous MCQ if complete
-                if current_q and len(current_options) == 4 and current_correct:
-                    mcqs.append({
-                        "question": current_q,
-                        "options": current_options,
-                        "correct_answer": current_correct
-                    })
-                
-                # Start new MCQ
-                current_q = line[2:].strip()
-                current_options = []
-                current_correct = None
-            elif line.startswith(('A)', 'A.')):
-                current_options.append(line[2:].strip())
-            elif line.startswith(('B)', 'B.')):
-                current_options.append(line[2:].strip())
-            elif line.startswith(('C)', 'C.')):
-                current_options.append(line[2:].strip())
-            elif line.startswith(('D)', 'D.')):
-                current_options.append(line[2:].strip())
-            elif line.startswith('Correct Answer:'):
-                current_correct = line.split(':')[1].strip().upper()
-        
-        # Add last MCQ
-        if current_q and len(current_options) == 4 and current_correct:
-            mcqs.append({
-                "question": current_q,
-                "options": current_options,
-                "correct_answer": current_correct
-            })
+        result = llm_client.complete(
+            prompt, groq_api_key, groq_api_url, groq_model,
+            feature="mcq_fallback", max_tokens=1024, temperature=0.3
+        ).strip()
         
+        mcqs = parse_mcqs(result)
         return mcqs[:num_questions]
         
     except Exception as e:
         return [{"question": "What is the main topic?", "options": ["A) Various topics", "B) One topic", "C) No topic", "D) Multiple topics"], "correct_answer": "A"}]
 
+def parse_mcqs(text):
+    """
+    Parse MCQ text into structured format (see qa_parser for the accepted variants).
+    """
+    return qa_parser.parse_mcqs(text)
+
 def calculate_score(user_answers, mcqs):
     """
     Calculate the score based on user answers.
@@ -325,63 +328,36 @@ def calculate_score(user_answers, mcqs):
 
 def create_mcqs_pdf(mcqs_list, filename="mcqs.pdf"):
     """Create a PDF file from MCQs"""
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter)
+    return exports.build_pdf(_mcq_flowables(mcqs_list))
+
+
+def _mcq_flowables(mcqs_list):
     styles = getSampleStyleSheet()
-    story = []
-    
-    # Title
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=16,
-        spaceAfter=30,
-        alignment=1
-    )
-    story.append(Paragraph("📋 Multiple Choice Questions", title_style))
-    story.append(Spacer(1, 20))
-    
-    # Add each MCQ
+    yield from exports.title_flowables("📋 Multiple Choice Questions")
     for i, mcq in enumerate(mcqs_list, 1):
         # Question
-        question_text = f"<b>Question {i}:</b> {mcq['question']}"
-        story.append(Paragraph(question_text, styles['Normal']))
-        story.append(Spacer(1, 10))
-        
+        yield Paragraph(f"<b>Question {i}:</b> {mcq['question']}", styles['Normal'])
+        yield Spacer(1, 10)
+
         # Options
-        options_text = ""
-        for j, option in enumerate(mcq['options']):
-            option_letter = chr(65 + j)  # A, B, C, D
-            options_text += f"{option_letter}) {option}<br/>"
-        story.append(Paragraph(options_text, styles['Normal']))
-        story.append(Spacer(1, 10))
-        
+        options_text = "".join(f"{chr(65 + j)}) {option}<br/>" for j, option in enumerate(mcq['options']))
+        yield Paragraph(options_text, styles['Normal'])
+        yield Spacer(1, 10)
+
         # Correct Answer (robust mapping)
         answer_letter = str(mcq['correct_answer']).strip()[0] if mcq['correct_answer'] else 'A'
         answer_map = {'A': 0, 'B': 1, 'C': 2, 'D': 3}
         correct_index = answer_map.get(answer_letter, 0)
-        correct_text = f"<b>Correct Answer:</b> {answer_letter}) {mcq['options'][correct_index]}"
-        story.append(Paragraph(correct_text, styles['Normal']))
-        story.append(Spacer(1, 20))
-    
-    doc.build(story)
-    buffer.seek(0)
-    return buffer
+        yield Paragraph(f"<b>Correct Answer:</b> {answer_letter}) {mcq['options'][correct_index]}", styles['Normal'])
+        yield Spacer(1, 20)
 
 def create_mcqs_csv(mcqs_list):
     """Create a CSV file from MCQs"""
-    data = []
-    for i, mcq in enumerate(mcqs_list, 1):
-        options_text = " | ".join([f"{chr(65+j)}) {option}" for j, option in enumerate(mcq['options'])])
-        data.append({
-            'Question Number': i,
-            'Question': mcq['question'],
-            'Options': options_text,
-            'Correct Answer': f"{mcq['correct_answer']}) {mcq['options'][ord(mcq['correct_answer']) - 65]}"
-        })
-    
-    df = pd.DataFrame(data)
-    csv_buffer = io.StringIO()
-    df.to_csv(csv_buffer, index=False)
-    csv_buffer.seek(0)
-    return csv_buffer.getvalue() 
\ No newline at end of file
+    return exports.build_csv(
+        ['Question Number', 'Question', 'Options', 'Correct Answer'],
+        ((i,
+          mcq['question'],
+          " | ".join(f"{chr(65 + j)}) {option}" for j, option in enumerate(mcq['options'])),
+          f"{mcq['correct_answer']}) {mcq['options'][ord(mcq['correct_answer']) - 65]}")
+         for i, mcq in enumerate(mcqs_list, 1))
+    )
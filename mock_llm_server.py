@@ -0,0 +1,382 @@
+"""
+Local stand-in for the Groq / OpenAI-compatible chat completions API.
+
+Speaks POST /v1/chat/completions (plain and "stream": true SSE) so the app and
+the benchmark scripts can run offline without API spend.
+
+Usage:
+    python mock_llm_server.py --port 8000 --latency lognormal:0.8:0.4 --error-rate 0.05
+
+Then point the app at it:
+    GROK_API_URL=http://127.0.0.1:8000/v1/chat/completions streamlit run main.py
+"""
+import argparse
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ==================== Canned Outputs ====================
+FLASHCARD_FACTS = [
+    ("What does RAG stand for?", "RAG stands for Retrieval-Augmented Generation."),
+    ("What does FAISS provide?", "FAISS provides fast similarity search over dense vectors."),
+    ("What is an embedding?", "An embedding is a numeric vector that represents the meaning of a text."),
+    ("Why are documents split into chunks?", "Chunks keep each piece small enough to embed and retrieve precisely."),
+    ("What is active recall?", "Active recall is studying by retrieving answers from memory."),
+    ("What is spaced repetition?", "Spaced repetition schedules reviews at growing intervals to improve retention."),
+    ("What does an LLM generate?", "An LLM generates text one token at a time."),
+    ("What is cosine similarity?", "Cosine similarity measures the angle between two vectors."),
+]
+
+MCQ_FACTS = [
+    ("Which library is used for semantic search?", ["FAISS", "ReportLab", "Pandas", "Streamlit"], "A"),
+    ("What does PyMuPDF extract?", ["Audio", "Text from PDFs", "Images from video", "Spreadsheets"], "B"),
+    ("Which technique retrieves context before generation?", ["Fine-tuning", "Pruning", "RAG", "Quantization"], "C"),
+    ("What is used to render the UI?", ["Django", "Flask", "React", "Streamlit"], "D"),
+    ("What do sentence embeddings capture?", ["Meaning", "File size", "Font style", "Page count"], "A"),
+    ("Which measure compares two embeddings?", ["Word count", "Cosine similarity", "Page number", "Line length"], "B"),
+]
+
+SUMMARY_SENTENCES = [
+    "The document introduces the core ideas and motivates why they matter.",
+    "It explains the main methods step by step with supporting examples.",
+    "Key definitions are given before the more advanced material is discussed.",
+    "The middle sections compare alternative approaches and their trade-offs.",
+    "Practical applications show how the concepts are used in real systems.",
+    "The final part summarizes the findings and points to further reading.",
+]
+
+THINK_BLOCK = "<think>Let me work through the content and plan the answer.</think>\n"
+
+
+def _requested_count(prompt, default=5):
+    """Pull the requested item count ("Create 7 flashcards") out of a prompt."""
+    match = re.search(r"\b(\d{1,3})\s+(?:flashcards|multiple choice|simple multiple|simple flashcards|questions|mcqs)", prompt, re.IGNORECASE)
+    return int(match.group(1)) if match else default
+
+
+def _requested_words(prompt, default=120):
+    match = re.search(r"(\d{2,4})\s+words", prompt)
+    return int(match.group(1)) if match else default
+
+
+def canned_flashcards(prompt, rng):
+    count = _requested_count(prompt)
+    offset = rng.randrange(len(FLASHCARD_FACTS))
+    cards = []
+    for i in range(count):
+        question, answer = FLASHCARD_FACTS[(offset + i) % len(FLASHCARD_FACTS)]
+        cards.append(f"Q: {question}\nA: {answer}")
+    return "\n\n".join(cards)
+
+
+def canned_mcqs(prompt, rng):
+    count = _requested_count(prompt)
+    offset = rng.randrange(len(MCQ_FACTS))
+    blocks = []
+    for i in range(count):
+        question, options, correct = MCQ_FACTS[(offset + i) % len(MCQ_FACTS)]
+        lines = [f"Q: {question}"]
+        lines += [f"{chr(65 + j)}) {option}" for j, option in enumerate(options)]
+        lines.append(f"Correct Answer: {correct}")
+        blocks.append("\n".join(lines))
+    return "\n\n".join(blocks)
+
+
+def canned_summary(prompt, rng):
+    words = []
+    target = _requested_words(prompt)
+    while len(words) < target:
+        words += rng.choice(SUMMARY_SENTENCES).split()
+    return " ".join(words[:target])
+
+
+def canned_answer(prompt, rng):
+    return " ".join(rng.sample(SUMMARY_SENTENCES, 3))
+
+
+def canned_json(prompt, rng):
+    """JSON-mode variant of the canned flashcard / MCQ outputs."""
+    lowered = prompt.lower()
+    count = _requested_count(prompt)
+    if "multiple choice" in lowered or "mcq" in lowered:
+        offset = rng.randrange(len(MCQ_FACTS))
+        items = [MCQ_FACTS[(offset + i) % len(MCQ_FACTS)] for i in range(count)]
+        return json.dumps({"mcqs": [{"question": q, "options": o, "correct_answer": c} for q, o, c in items]})
+    if "flashcard" in lowered:
+        offset = rng.randrange(len(FLASHCARD_FACTS))
+        items = [FLASHCARD_FACTS[(offset + i) % len(FLASHCARD_FACTS)] for i in range(count)]
+        return json.dumps({"flashcards": [{"question": q, "answer": a} for q, a in items]})
+    if '"terms"' in prompt:
+        material = prompt.split("Material:", 1)[-1]
+        words = list(dict.fromkeys(w.lower() for w in re.findall(r"[A-Za-z]{6,}", material)))
+        return json.dumps({"terms": [{"term": w, "definition": f"A key concept the material uses when discussing {w}."}
+                                     for w in words[:count]]})
+    return json.dumps({"answer": canned_answer(prompt, rng)})
+
+
+def pick_canned_output(messages, rng, json_mode=False):
+    """Choose a response shape that matches what the prompt asks for."""
+    prompt = "\n".join(str(m.get("content", "")) for m in messages)
+    if json_mode:
+        return canned_json(prompt, rng)
+    lowered = prompt.lower()
+    if "multiple choice" in lowered or "mcq" in lowered:
+        return canned_mcqs(prompt, rng)
+    if "flashcard" in lowered:
+        return canned_flashcards(prompt, rng)
+    if "summar" in lowered or "combine these" in lowered:
+        return canned_summary(prompt, rng)
+    return canned_answer(prompt, rng)
+
+
+# ==================== Latency and Errors ====================
+def parse_latency(spec):
+    """
+    Parse a latency distribution spec into a sampler returning seconds.
+    Supported forms:
+        fixed:0.5
+        uniform:0.2:1.5
+        normal:0.8:0.2
+        lognormal:0.8:0.4   (median seconds, sigma)
+    """
+    kind, *params = spec.split(":")
+    values = [float(p) for p in params]
+    if kind == "fixed":
+        return lambda rng: values[0]
+    if kind == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "normal":
+        return lambda rng: max(0.0, rng.gauss(values[0], values[1]))
+    if kind == "lognormal":
+        mu = math.log(values[0])
+        return lambda rng: rng.lognormvariate(mu, values[1])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+class MockConfig:
+    """Runtime settings shared by all request handlers."""
+
+    def __init__(self, latency="fixed:0", token_delay=0.0, error_rate=0.0,
+                 rate_limit_rate=0.0, timeout_rate=0.0, timeout_seconds=130.0,
+                 think_rate=0.0, seed=None):
+        self.latency = parse_latency(latency)
+        self.token_delay = token_delay
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.timeout_rate = timeout_rate
+        self.timeout_seconds = timeout_seconds
+        self.think_rate = think_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.request_count = 0
+
+    def draw(self):
+        """Draw the latency and fault decision for one request."""
+        with self.lock:
+            self.request_count += 1
+            roll = self.rng.random()
+            latency = self.latency(self.rng)
+            think = self.rng.random() < self.think_rate
+            seed = self.rng.random()
+        if roll < self.rate_limit_rate:
+            fault = "429"
+        elif roll < self.rate_limit_rate + self.error_rate:
+            fault = "500"
+        elif roll < self.rate_limit_rate + self.error_rate + self.timeout_rate:
+            fault = "timeout"
+        else:
+            fault = None
+        return latency, fault, think, random.Random(seed)
+
+
+def _count_tokens(text):
+    # Rough whitespace count; the mock only needs plausible usage numbers
+    return len(text.split())
+
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+    config = MockConfig()
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        if os.getenv("MOCK_LLM_VERBOSE"):
+            super().log_message(format, *args)
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path.rstrip("/") in ("/health", "/v1/models"):
+            self._send_json(200, {"object": "list", "data": [{"id": "mock", "object": "model"}],
+                                  "requests_served": self.config.request_count})
+        else:
+            self._send_json(404, {"error": {"message": "Not found"}})
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"Unknown endpoint {self.path}"}})
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            self._send_json(400, {"error": {"message": "Invalid JSON body"}})
+            return
+
+        messages = payload.get("messages") or []
+        model = payload.get("model", "mock")
+        latency, fault, think, rng = self.config.draw()
+
+        if fault == "timeout":
+            time.sleep(self.config.timeout_seconds)
+            self.close_connection = True
+            return
+        time.sleep(latency)
+        if fault == "429":
+            self._send_json(429, {"error": {"message": "Rate limit reached (mock)", "type": "rate_limit_exceeded"}})
+            return
+        if fault == "500":
+            self._send_json(500, {"error": {"message": "Internal server error (mock)", "type": "server_error"}})
+            return
+
+        json_mode = (payload.get("response_format") or {}).get("type") in ("json_object", "json_schema")
+        content = pick_canned_output(messages, rng, json_mode=json_mode)
+        if think:
+            content = THINK_BLOCK + content
+
+        prompt_tokens = sum(_count_tokens(str(m.get("content", ""))) for m in messages)
+        completion_tokens = _count_tokens(content)
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+
+        if payload.get("stream"):
+            self._stream(completion_id, model, content, usage)
+            return
+
+        self._send_json(200, {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": usage,
+        })
+
+    def _stream(self, completion_id, model, content, usage):
+        """Send the completion as OpenAI-style server-sent events."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def send_event(delta, finish_reason=None, extra=None):
+            event = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            if extra:
+                event.update(extra)
+            self.wfile.write(f"data: {json.dumps(event)}\n\n".encode())
+            self.wfile.flush()
+
+        try:
+            send_event({"role": "assistant"})
+            # Keep whitespace attached to the tokens so the stream reassembles exactly
+            for token in re.findall(r"\s*\S+", content):
+                send_event({"content": token})
+                if self.config.token_delay:
+                    time.sleep(self.config.token_delay)
+            send_event({}, finish_reason="stop", extra={"x_groq": {"usage": usage}, "usage": usage})
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+def make_server(host="127.0.0.1", port=8000, config=None):
+    """Build (but do not start) a mock server; port 0 picks a free port."""
+    handler = type("ConfiguredMockLLMHandler", (MockLLMHandler,), {"config": config or MockConfig()})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def start_background_server(host="127.0.0.1", port=0, config=None):
+    """
+    Start a mock server on a daemon thread. Returns (server, chat_completions_url).
+    Benchmarks call this so they can run without any external service.
+    """
+    server = make_server(host, port, config)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    bound_host, bound_port = server.server_address[:2]
+    return server, f"http://{bound_host}:{bound_port}/v1/chat/completions"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock OpenAI-compatible chat completions server")
+    parser.add_argument("--host", default=os.getenv("MOCK_LLM_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("MOCK_LLM_PORT", "8000")))
+    parser.add_argument("--latency", default=os.getenv("MOCK_LLM_LATENCY", "fixed:0.2"),
+                        help="fixed:S | uniform:LO:HI | normal:MEAN:SD | lognormal:MEDIAN:SIGMA")
+    parser.add_argument("--token-delay", type=float, default=float(os.getenv("MOCK_LLM_TOKEN_DELAY", "0.01")),
+                        help="Seconds between streamed tokens")
+    parser.add_argument("--error-rate", type=float, default=float(os.getenv("MOCK_LLM_ERROR_RATE", "0")),
+                        help="Fraction of requests answered with HTTP 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=float(os.getenv("MOCK_LLM_RATE_LIMIT_RATE", "0")),
+                        help="Fraction of requests answered with HTTP 429")
+    parser.add_argument("--timeout-rate", type=float, default=float(os.getenv("MOCK_LLM_TIMEOUT_RATE", "0")),
+                        help="Fraction of requests that hang past the client timeout")
+    parser.add_argument("--timeout-seconds", type=float, default=130.0)
+    parser.add_argument("--think-rate", type=float, default=float(os.getenv("MOCK_LLM_THINK_RATE", "0.5")),
+                        help="Fraction of responses prefixed with a <think> block")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    config = MockConfig(
+        latency=args.latency,
+        token_delay=args.token_delay,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        timeout_rate=args.timeout_rate,
+        timeout_seconds=args.timeout_seconds,
+        think_rate=args.think_rate,
+        seed=args.seed,
+    )
+    server = make_server(args.host, args.port, config)
+    print(f"Mock LLM server listening on http://{args.host}:{args.port}/v1/chat/completions")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Per-task model routing with fallback chains.
+
+Intermediate steps (pre-summaries, summary map calls) go to a small fast model;
+everything else uses the main model passed in by the caller. A route maps to a
+list of models tried in order, and the main model is always the last fallback.
+
+The table is configurable with a JSON file (model_routes.json next to this
+module, or LLM_ROUTES_FILE) or inline JSON in LLM_ROUTES, e.g.
+    LLM_ROUTES='{"summary_map": ["llama-3.1-8b-instant"], "study_pre_summary": []}'
+An empty list sends that route straight to the main model.
+"""
+import json
+import os
+import threading
+from collections import deque
+from pathlib import Path
+
+import requests
+
+import token_budget
+
+FAST_MODEL = os.getenv("LLM_FAST_MODEL", "llama-3.1-8b-instant")
+
+DEFAULT_ROUTES = {
+    "study_pre_summary": [FAST_MODEL],
+    "summary_map": [FAST_MODEL],
+    "summary_combine": [FAST_MODEL],
+}
+
+ROUTES_FILE = Path(os.getenv("LLM_ROUTES_FILE", Path(__file__).with_name("model_routes.json")))
+
+# HTTP statuses worth trying the next model for (rate limits, overload,
+# unknown/decommissioned model, request too large)
+RETRYABLE_STATUS = {400, 404, 408, 413, 429, 500, 502, 503, 504}
+
+LATENCY_SAMPLES = 500
+
+_routes_lock = threading.Lock()
+_routes_cache = None
+_latency_lock = threading.Lock()
+_latency = {}
+
+
+def load_routes():
+    """Load the routing table: defaults, then the routes file, then LLM_ROUTES."""
+    routes = dict(DEFAULT_ROUTES)
+    if ROUTES_FILE.exists():
+        try:
+            routes.update(json.loads(ROUTES_FILE.read_text()))
+        except (ValueError, OSError) as e:
+            print(f"[model_router] Ignoring unreadable {ROUTES_FILE}: {e}")
+    raw = os.getenv("LLM_ROUTES")
+    if raw:
+        try:
+            routes.update(json.loads(raw))
+        except ValueError as e:
+            print(f"[model_router] Ignoring invalid LLM_ROUTES: {e}")
+    return {name: list(models) for name, models in routes.items()}
+
+
+def get_routes():
+    global _routes_cache
+    with _routes_lock:
+        if _routes_cache is None:
+            _routes_cache = load_routes()
+        return _routes_cache
+
+
+def set_routes(routes):
+    """Replace the routing table at runtime (None reloads from config)."""
+    global _routes_cache
+    with _routes_lock:
+        _routes_cache = None if routes is None else {name: list(models) for name, models in routes.items()}
+
+
+def resolve(route, main_model):
+    """Return the ordered list of models to try for a route."""
+    chain = [model for model in get_routes().get(route, []) if model]
+    if main_model not in chain:
+        chain.append(main_model)
+    return chain
+
+
+def is_retryable(error):
+    """Whether a failed call should fall through to the next model in the chain."""
+    if isinstance(error, token_budget.PromptBudgetError):
+        return True
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        return error.response.status_code in RETRYABLE_STATUS
+    return isinstance(error, (requests.Timeout, requests.ConnectionError))
+
+
+# ==================== Latency Reporting ====================
+def record_call(route, model, latency, ok):
+    with _latency_lock:
+        entry = _latency.setdefault((route, model), {
+            "calls": 0,
+            "failures": 0,
+            "samples": deque(maxlen=LATENCY_SAMPLES),
+        })
+        entry["calls"] += 1
+        if ok:
+            entry["samples"].append(latency)
+        else:
+            entry["failures"] += 1
+
+
+def _percentile(ordered, pct):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def get_route_report():
+    """Per (route, model) call counts, failures and p50/p95 latency of successful calls."""
+    with _latency_lock:
+        snapshot = {key: (entry["calls"], entry["failures"], sorted(entry["samples"]))
+                    for key, entry in _latency.items()}
+    rows = []
+    for (route, model), (calls, failures, samples) in sorted(snapshot.items()):
+        rows.append({
+            "route": route,
+            "model": model,
+            "calls": calls,
+            "failures": failures,
+            "p50_s": round(_percentile(samples, 50), 3),
+            "p95_s": round(_percentile(samples, 95), 3),
+            "avg_s": round(sum(samples) / len(samples), 3) if samples else 0.0,
+        })
+    return rows
+
+
+def reset_route_report():
+    with _latency_lock:
+        _latency.clear()
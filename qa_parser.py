@@ -0,0 +1,296 @@
+"""
+Single-pass parser for the plain-text MCQ and flashcard formats.
+
+Every text-format response goes through these parsers: whole completions
+(parse_mcqs / parse_flashcards) and token streams (MCQStreamParser /
+FlashcardStreamParser, fed from llm_client.stream_completion). Each line is
+cleaned once (bold/heading/bullet markup), split into marker tokens by one
+anchored pattern (plus an inline scan only on lines that could hold a
+one-line item), and the tokens drive a small state machine:
+
+    Q: [question]              Q: [question]
+    A) [option] ... D) [...]   A: [answer]
+    Correct Answer: [A-D]
+
+Tolerated variations: numbered questions ("1.", "Q1:", "Question 2:"),
+A) / A. / (A) / A: options, options (uppercase A) to D) in order) and
+answers on the question's line, **bold** markers, "Answer: B" or the option
+text as the answer, and <think> blocks. An MCQ closes on its answer line; a flashcard closes at the blank line
+after its answer, at the next question, or at the end of the text.
+"""
+import re
+
+import structured_output
+
+_MARKUP = re.compile(r'\*\*|__|`')
+_LINE_PREFIX = re.compile(r'^(?:#+|>|[-*•])\s*')
+
+_NUMBERED = r'(?:\d+\s*[.)]\s*)?'
+_QUESTION = _NUMBERED + r'(?i:Q(?:uestion)?\s*\d*\s*[:.)]\s*)|\d+\s*[.)]\s+|(?i:Question\s*\d+\s*$)'
+
+# Markers at the start of a line
+_MCQ_START = re.compile(
+    r'(?P<correct>(?i:Correct\s+(?:Answer|Option)|Correct|Answer)\s*[:.\-]\s*)'
+    r'|(?P<question>' + _QUESTION + r')'
+    r'|(?P<option>\(?[A-Da-d]\s*[).:]\s*)'
+)
+_FLASHCARD_START = re.compile(
+    r'(?P<question>' + _QUESTION + r'|(?i:Front)\s*:\s*)'
+    r'|(?P<answer>(?i:A(?:nswer)?|Back)\s*\d*\s*[:.)]\s*)'
+)
+# Markers inside a line, for items written on one line. These are stricter
+# (uppercase, colon forms) and only count in context; see _tokens.
+_MCQ_INLINE = re.compile(
+    r'(?<=\s)(?:(?P<correct>(?i:Correct\s+Answer|Answer)\s*:\s*)'
+    r'|(?P<question>Q\d*\s*:\s*)'
+    r'|(?P<option>\(?[A-D][).]\s+))'
+)
+_FLASHCARD_INLINE = re.compile(
+    r'(?<=\s)(?:(?P<answer>(?:A|[Aa]nswer)\s*\d*\s*:\s*)'
+    r'|(?P<question>Q\d*\s*:\s*))'
+)
+_ANSWER_LETTER = re.compile(r'^(?i:Option\s+)?\(?([A-Da-d])(?:[).:,\s]|$)')
+# Substrings an inline marker needs after each kind of line start; lines
+# without them skip the inline scan (most lines)
+_MCQ_INLINE_HINTS = {"option": ("nswer",), "correct": ("Q",), "question": ("B)", "B."), "text": ("B)", "B.")}
+_FLASHCARD_INLINE_HINTS = {"answer": ("Q",), "question": (":",), "text": (":",)}
+# Text before an inline flashcard answer must end a sentence ("...? A: ...")
+_SENTENCE_END = ("?", ".", "!", ")")
+
+
+def _clean(line):
+    line = line.strip()
+    if "*" in line or "_" in line or "`" in line:
+        line = _MARKUP.sub("", line).strip()
+    if line[:1] in ("#", ">", "-", "*", "•"):
+        line = _LINE_PREFIX.sub("", line)
+    return line
+
+
+def _inline_options(matches):
+    """
+    The inline option markers that spell A, B, C, D in order (all four, or none).
+    Each letter takes its last candidate before the next one, so an "A)" in the
+    question itself is skipped, and markers in the answer are not considered.
+    """
+    candidates = []
+    for match in matches:
+        if match.lastgroup == "correct":
+            break
+        if match.lastgroup == "option":
+            candidates.append(match)
+    picked = []
+    for letter in "DCBA":
+        while candidates and not candidates[-1].group().lstrip("(").startswith(letter):
+            candidates.pop()
+        if not candidates:
+            return []
+        picked.append(candidates.pop())
+    return picked
+
+
+def _tokens(line, head, inline):
+    """
+    Split one cleaned line into (kind, marker, text) tokens.
+    head is the line-start marker match (or None). kind is a marker group
+    name or "text". A line-start marker always counts; inline markers only
+    where a one-line item needs them:
+      - options, when the line does not start with one and carries A-D in order
+      - MCQ answers, after an option; flashcard answers, after a full sentence
+      - questions, after the previous item's answer
+    An answer's text runs to the next question, so "Correct Answer: B) Paris"
+    stays one token.
+    """
+    kind, marker, last = (head.lastgroup, head.group(), head.end()) if head else ("text", "", 0)
+    first = kind
+    matches = list(inline.finditer(line, last))
+    options = set(_inline_options(matches)) if first != "option" else set()
+    tokens = []
+    seen_option = first == "option"
+    seen_answer = first in ("correct", "answer")
+    for match in matches:
+        group = match.lastgroup
+        if group == "question":
+            accept = seen_answer
+        elif seen_answer:
+            accept = False  # part of the answer text
+        elif group == "option":
+            accept = match in options
+        elif group == "correct":
+            accept = seen_option
+        else:
+            accept = line[last:match.start()].rstrip().endswith(_SENTENCE_END)
+        if not accept:
+            continue
+        text = line[last:match.start()].strip()
+        if text or kind != "text":
+            tokens.append((kind, marker, text))
+        kind, marker, last = group, match.group(), match.end()
+        seen_option = seen_option or group == "option"
+        seen_answer = group in ("correct", "answer")
+    text = line[last:].strip()
+    if text or kind != "text":
+        tokens.append((kind, marker, text))
+    return tokens
+
+
+def _answer_letter(value, options):
+    """Resolve "B", "(b)", "Option B", "B) Paris" or the option text to a letter."""
+    match = _ANSWER_LETTER.match(value)
+    if match:
+        return match.group(1).upper()
+    wanted = value.strip().rstrip(".").lower()
+    for index, option in enumerate(options):
+        if wanted and option.lower().rstrip(".") == wanted:
+            return "ABCD"[index]
+    return None
+
+
+class _LineParser:
+    """Feeds complete lines of (streamed) text through the token state machine."""
+
+    start_markers = None
+    inline_markers = None
+    inline_hints = None
+
+    def __init__(self):
+        self._think = structured_output.ThinkTagFilter()
+        self._buffer = ""
+        self._items = []
+        self._handlers = {kind: getattr(self, "_on_" + kind) for kind in self.inline_hints}
+
+    def feed(self, chunk):
+        """Consume more text and return the list of newly completed items."""
+        self._buffer += self._think.feed(chunk)
+        lines = self._buffer.split("\n")
+        self._buffer = lines.pop()
+        for line in lines:
+            self._line(line)
+        return self._take()
+
+    def close(self):
+        """Finish the text and return any items completed by its end."""
+        rest = self._buffer + self._think.flush()
+        self._buffer = ""
+        for line in rest.split("\n"):
+            self._line(line)
+        self._finish()
+        return self._take()
+
+    def parse(self, text):
+        """Parse a complete response in one pass."""
+        return self.feed(text) + self.close()
+
+    def _take(self):
+        items, self._items = self._items, []
+        return items
+
+    def _line(self, line):
+        line = _clean(line)
+        if not line:
+            self._on_blank()
+            return
+        head = self.start_markers.match(line)
+        kind, marker, rest = (head.lastgroup, head.group(), line[head.end():]) if head else ("text", "", line)
+        for hint in self.inline_hints[kind]:
+            if hint in rest:
+                for kind, marker, text in _tokens(line, head, self.inline_markers):
+                    self._handlers[kind](marker, text)
+                return
+        # No inline markers possible: the common one-token line
+        self._handlers[kind](marker, rest.strip())
+
+    def _on_blank(self):
+        pass
+
+    def _finish(self):
+        pass
+
+
+class MCQStreamParser(_LineParser):
+    """Emits {"question", "options", "correct_answer"} dicts as each MCQ closes."""
+
+    start_markers = _MCQ_START
+    inline_markers = _MCQ_INLINE
+    inline_hints = _MCQ_INLINE_HINTS
+
+    def __init__(self):
+        super().__init__()
+        self._question = None
+        self._options = []
+
+    def _on_question(self, marker, text):
+        self._question, self._options = text, []
+
+    def _on_option(self, marker, text):
+        # Only the next letter in sequence opens an option, so "vitamin A) ..."
+        # inside a question or a stray "D." in an option stays text
+        if self._question is not None and len(self._options) < 4 \
+                and marker.lstrip("(").upper().startswith("ABCD"[len(self._options)]):
+            self._options.append(text)
+        else:
+            self._on_text(marker, f"{marker}{text}")
+
+    def _on_correct(self, marker, text):
+        answer = _answer_letter(text, self._options)
+        if self._question and len(self._options) == 4 and all(self._options) and answer:
+            self._items.append({"question": self._question, "options": self._options, "correct_answer": answer})
+        self._question, self._options = None, []
+
+    def _on_text(self, marker, text):
+        # Unmarked text opens a question (e.g. "What is X?" straight after the
+        # previous answer) or continues one wrapped onto the next line
+        if self._question is None:
+            self._question = text
+        elif not self._options:
+            self._question = f"{self._question} {text}".strip()
+
+
+class FlashcardStreamParser(_LineParser):
+    """Emits {"question", "answer"} dicts as each flashcard closes."""
+
+    start_markers = _FLASHCARD_START
+    inline_markers = _FLASHCARD_INLINE
+    inline_hints = _FLASHCARD_INLINE_HINTS
+
+    def __init__(self):
+        super().__init__()
+        self._question = None
+        self._answer = None
+
+    def _on_question(self, marker, text):
+        self._finish()
+        self._question = text
+
+    def _on_answer(self, marker, text):
+        if self._answer is None and self._question:
+            self._answer = text
+        else:
+            self._on_text(marker, text)
+
+    def _on_text(self, marker, text):
+        if self._answer is not None:
+            self._answer = f"{self._answer} {text}".strip()
+        elif self._question is not None:
+            self._question = f"{self._question} {text}".strip()
+        else:
+            self._question = text
+
+    def _on_blank(self):
+        if self._answer is not None:
+            self._finish()
+
+    def _finish(self):
+        if self._question and self._answer:
+            self._items.append({"question": self._question, "answer": self._answer})
+        self._question, self._answer = None, None
+
+
+def parse_mcqs(text):
+    """Parse a complete Q:/A)..D)/Correct Answer: response into MCQ dicts."""
+    return MCQStreamParser().parse(text)
+
+
+def parse_flashcards(text):
+    """Parse a complete Q:/A: response into flashcard dicts."""
+    return FlashcardStreamParser().parse(text)
@@ -1,12 +1,10 @@
 import numpy as np
-import requests
-from reportlab.lib.styles import ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-from reportlab.lib.pagesizes import letter
+from reportlab.platypus import Paragraph, Spacer
 from reportlab.lib.styles import getSampleStyleSheet
-import pandas as pd
-import io
 import re
+import exports
+import llm_client
+import token_budget
 
 def retrieve_top_k(query, embedder, index, chunks, k=2):
     """Retrieve top k most relevant chunks using FAISS index"""
@@ -40,29 +38,25 @@ def grok_generate_answer(context_chunks, question, grok_api_key, grok_api_url, g
         context_str = "\n".join(context_chunks)
     else:
         context_str = str(context_chunks)
-        
-    prompt = (
+
+    instructions = (
         "You are a helpful assistant. Use ONLY the context below to answer the question. "
         "If the answer is not in the context, say you don't know.\n\n"
+    )
+    context_str = token_budget.fit_to_budget(
+        context_str, grok_model, 1024,
+        prompt_template=f"{instructions}Context:\n\n\nQuestion: {question}\nAnswer:"
+    )
+    prompt = (
+        instructions +
         f"Context:\n{context_str}\n\nQuestion: {question}\nAnswer:"
     )
     
-    headers = {
-        "Authorization": f"Bearer {grok_api_key}",
-        "Content-Type": "application/json"
-    }
-    
-    payload = {
-        "model": grok_model,
-        "messages": [{"role": "user", "content": prompt}],
-        "temperature": 0.7,
-        "max_tokens": 1024
-    }
-    
     try:
-        response = requests.post(grok_api_url, headers=headers, json=payload, timeout=120)
-        response.raise_for_status()
-        raw_output = response.json()["choices"][0]["message"]["content"].strip()
+        raw_output = llm_client.complete(
+            prompt, grok_api_key, grok_api_url, grok_model,
+            feature="qa", temperature=0.7, max_tokens=1024
+        ).strip()
         return clean_generated_text(raw_output)
     except Exception as e:
         return f"Error querying Grok API: {str(e)}"
@@ -75,50 +69,24 @@ def answer_question(query, embedder, index, chunks, grok_api_key, grok_api_url,
 # ==================== QA Export Functions ====================
 def create_qa_pdf(qa_list, filename="qa_pairs.pdf"):
     """Create a PDF file from Q&A pairs"""
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter)
+    return exports.build_pdf(_qa_flowables(qa_list))
+
+
+def _qa_flowables(qa_list):
     styles = getSampleStyleSheet()
-    story = []
-    
-    # Title
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=16,
-        spaceAfter=30,
-        alignment=1
-    )
-    story.append(Paragraph("❓ Question & Answer Pairs", title_style))
-    story.append(Spacer(1, 20))
-    
-    # Add each QA pair
+    yield from exports.title_flowables("❓ Question & Answer Pairs")
     for i, qa in enumerate(qa_list, 1):
         # Question
-        question_text = f"<b>Question {i}:</b> {qa['question']}"
-        story.append(Paragraph(question_text, styles['Normal']))
-        story.append(Spacer(1, 10))
-        
+        yield Paragraph(f"<b>Question {i}:</b> {qa['question']}", styles['Normal'])
+        yield Spacer(1, 10)
+
         # Answer
-        answer_text = f"<b>Answer:</b> {qa['answer']}"
-        story.append(Paragraph(answer_text, styles['Normal']))
-        story.append(Spacer(1, 20))
-    
-    doc.build(story)
-    buffer.seek(0)
-    return buffer
+        yield Paragraph(f"<b>Answer:</b> {qa['answer']}", styles['Normal'])
+        yield Spacer(1, 20)
 
 def create_qa_csv(qa_list):
     """Create a CSV file from Q&A pairs"""
-    data = []
-    for i, qa in enumerate(qa_list, 1):
-        data.append({
-            'Question Number': i,
-            'Question': qa['question'],
-            'Answer': qa['answer']
-        })
-    
-    df = pd.DataFrame(data)
-    csv_buffer = io.StringIO()
-    df.to_csv(csv_buffer, index=False)
-    csv_buffer.seek(0)
-    return csv_buffer.getvalue()
\ No newline at end of file
+    return exports.build_csv(
+        ['Question Number', 'Question', 'Answer'],
+        ((i, qa['question'], qa['answer']) for i, qa in enumerate(qa_list, 1))
+    )
@@ -0,0 +1,282 @@
+"""
+Per-document question bank.
+
+When QUESTION_BANK_ON_UPLOAD is set, a background job clusters the
+document's paragraph embeddings after upload into concept clusters and
+generates MCQs (for every difficulty) and flashcards from each cluster's
+most representative passages. Without it, whole-document MCQs and flashcards
+generated in the tabs are added as they are made (cluster and chunk None),
+and the clusters are planned on the first top-up. Every item is
+tagged with its difficulty (None for flashcards), cluster and source chunk
+(paragraph index):
+
+    {"question": "...", "options": [...], "correct_answer": "B",
+     "difficulty": "Medium", "cluster": 3, "chunk": 118}
+
+Banks are JSON files under QUESTION_BANK_DIR (default .cache/question_banks),
+keyed by document hash. Quiz and deck requests are served from the bank
+without an LLM call, spread across clusters; when a slice (kind and
+difficulty) runs low, a background top-up generates more for the clusters
+with the fewest items.
+"""
+import json
+import os
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+import coverage_sampling
+import extractive
+import flashcards
+import mcq_generator
+import sharding
+import token_budget
+
+BANK_DIR = Path(os.getenv("QUESTION_BANK_DIR", Path(__file__).resolve().parent / ".cache" / "question_banks"))
+BANK_ON_UPLOAD = os.getenv("QUESTION_BANK_ON_UPLOAD", "false").lower() in ("1", "true", "yes")
+BANK_CLUSTERS = int(os.getenv("QUESTION_BANK_CLUSTERS", "6"))
+BANK_WORKERS = 2
+
+DIFFICULTIES = ("Easy", "Medium", "Hard")
+MCQS_PER_SLICE = 3          # per cluster and difficulty
+FLASHCARDS_PER_CLUSTER = 4
+SLICE_SOURCE_TOKENS = 1200
+# Unserved items left in a slice below which a top-up is started
+LOW_WATERMARK = 5
+TOP_UP_CLUSTERS = 2
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="question-bank")
+_lock = threading.Lock()
+_banks = {}
+_plans = {}
+_sources = {}
+_jobs = {}
+
+
+# ==================== Storage ====================
+def _path(doc_hash):
+    return BANK_DIR / f"{doc_hash}.json"
+
+
+def load_bank(doc_hash):
+    """The bank for a document ({"doc_hash", "mcqs", "flashcards"}), empty if none yet."""
+    with _lock:
+        if doc_hash not in _banks:
+            try:
+                _banks[doc_hash] = json.loads(_path(doc_hash).read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                _banks[doc_hash] = {"doc_hash": doc_hash, "mcqs": [], "flashcards": []}
+        return _banks[doc_hash]
+
+
+def _save(bank):
+    path = _path(bank["doc_hash"])
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+        tmp.write_text(json.dumps(bank), encoding="utf-8")
+        os.replace(tmp, path)
+    except OSError as e:
+        print(f"[question_bank] Could not write {path}: {e}")
+
+
+def add_items(doc_hash, kind, items):
+    """Add tagged items to a bank (skipping repeated questions) and persist it."""
+    bank = load_bank(doc_hash)
+    with _lock:
+        known = {sharding.question_key(item["question"]) for item in bank[kind]}
+        added = 0
+        for item in items:
+            key = sharding.question_key(item.get("question", ""))
+            if key and key not in known:
+                known.add(key)
+                bank[kind].append(item)
+                added += 1
+        if added:
+            _save(bank)
+    return added
+
+
+# ==================== Filling ====================
+def plan_clusters(passages, embeddings, num_clusters=BANK_CLUSTERS):
+    """
+    Concept clusters over the paragraph embeddings, each with the source text
+    of its most representative passages.
+    Returns:
+        list[dict]: {"cluster": id, "chunk": representative passage index, "text": source}
+    """
+    vectors = np.asarray(embeddings, dtype="float32")
+    tokens = np.array([token_budget.count_tokens(p) for p in passages])
+    candidates = np.flatnonzero(tokens >= extractive.MIN_PASSAGE_TOKENS)
+    if not len(candidates):
+        return []
+    centroids, labels = coverage_sampling.kmeans(extractive.normalize(vectors[candidates]), num_clusters)
+    plans = []
+    for cluster in range(len(centroids)):
+        members = candidates[labels == cluster]
+        if not len(members):
+            continue
+        order = members[np.argsort(-(extractive.normalize(vectors[members]) @ centroids[cluster]))]
+        picked, used = [], 0
+        for idx in order:
+            if used + tokens[idx] > SLICE_SOURCE_TOKENS and picked:
+                break
+            picked.append(int(idx))
+            used += tokens[idx]
+        plans.append({
+            "cluster": cluster,
+            "chunk": picked[0],
+            "text": token_budget.truncate_to_tokens("\n\n".join(passages[i] for i in sorted(picked)), SLICE_SOURCE_TOKENS),
+        })
+    return plans
+
+
+def _generate_slice(plan, kind, difficulty, count, grok_api_key, grok_api_url, grok_model):
+    instruction = "Use only the content below; cover its main ideas."
+    if kind == "mcqs":
+        items = mcq_generator.generate_mcqs_json(
+            plan["text"], count, difficulty, mcq_generator.DIFFICULTY_INSTRUCTIONS[difficulty], instruction,
+            grok_api_key, grok_api_url, grok_model, max_tokens=512 + 150 * count
+        )
+    else:
+        items = flashcards.generate_flashcards_json(
+            plan["text"], count, instruction, grok_api_key, grok_api_url, grok_model,
+            max_tokens=384 + 80 * count
+        )
+    return [dict(item, difficulty=difficulty, cluster=plan["cluster"], chunk=plan["chunk"]) for item in items]
+
+
+def _fill(doc_hash, tasks, grok_api_key, grok_api_url, grok_model):
+    """Run (plan, kind, difficulty, count) generation tasks, saving as each finishes."""
+    with ThreadPoolExecutor(max_workers=BANK_WORKERS) as pool:
+        futures = [(kind, pool.submit(_generate_slice, plan, kind, difficulty, count,
+                                      grok_api_key, grok_api_url, grok_model))
+                   for plan, kind, difficulty, count in tasks]
+        for kind, future in futures:
+            try:
+                add_items(doc_hash, kind, future.result())
+            except Exception as e:
+                print(f"[question_bank] Slice failed: {e}")
+
+
+def register(doc_hash, passages, embeddings, grok_api_key, grok_api_url, grok_model):
+    """
+    Remember what a document's clusters are planned from, so top-ups can plan
+    them on demand when no upload-time fill ran. Makes no LLM calls.
+    """
+    with _lock:
+        _sources.setdefault(doc_hash, (passages, embeddings, grok_api_key, grok_api_url, grok_model))
+
+
+def _document_plans(doc_hash):
+    """The document's (plans, key, url, model), planning its clusters on first use."""
+    with _lock:
+        entry = _plans.get(doc_hash)
+        source = _sources.get(doc_hash)
+    if entry or not source:
+        return entry
+    passages, embeddings, grok_api_key, grok_api_url, grok_model = source
+    plans = plan_clusters(passages, embeddings)
+    with _lock:
+        if not _plans.get(doc_hash):
+            _plans[doc_hash] = (plans, grok_api_key, grok_api_url, grok_model)
+        return _plans[doc_hash]
+
+
+def start_bank(doc_hash, passages, embeddings, grok_api_key, grok_api_url, grok_model):
+    """
+    Plan the document's clusters and fill its bank in the background, unless the
+    bank already has items or a job is running. Safe to call on every rerun.
+    """
+    register(doc_hash, passages, embeddings, grok_api_key, grok_api_url, grok_model)
+    with _lock:
+        if doc_hash in _plans:
+            return
+        _plans[doc_hash] = None  # planning reserved
+    plans = plan_clusters(passages, embeddings)
+    with _lock:
+        _plans[doc_hash] = (plans, grok_api_key, grok_api_url, grok_model)
+    bank = load_bank(doc_hash)
+    if bank["mcqs"] or bank["flashcards"] or not plans:
+        return
+    tasks = [(plan, "mcqs", difficulty, MCQS_PER_SLICE) for difficulty in DIFFICULTIES for plan in plans]
+    tasks += [(plan, "flashcards", None, FLASHCARDS_PER_CLUSTER) for plan in plans]
+    with _lock:
+        _jobs[(doc_hash, "fill")] = _executor.submit(_fill, doc_hash, tasks, grok_api_key, grok_api_url, grok_model)
+
+
+def _top_up(doc_hash, kind, difficulty):
+    entry = _document_plans(doc_hash)
+    if not entry or not entry[0]:
+        return
+    plans, grok_api_key, grok_api_url, grok_model = entry
+    counts = {plan["cluster"]: 0 for plan in plans}
+    for item in load_bank(doc_hash)[kind]:
+        if item.get("cluster") in counts and item.get("difficulty") == difficulty:
+            counts[item["cluster"]] += 1
+    sparse = sorted(plans, key=lambda plan: counts[plan["cluster"]])[:TOP_UP_CLUSTERS]
+    count = MCQS_PER_SLICE if kind == "mcqs" else FLASHCARDS_PER_CLUSTER
+    _fill(doc_hash, [(plan, kind, difficulty, count) for plan in sparse], grok_api_key, grok_api_url, grok_model)
+
+
+def top_up(doc_hash, kind, difficulty=None):
+    """
+    Generate more items for the clusters with the fewest in this slice (in the
+    background), planning the clusters first if only register() has run.
+    """
+    with _lock:
+        job = _jobs.get((doc_hash, kind, difficulty))
+        if not (_plans.get(doc_hash) or doc_hash in _sources) or (job and not job.done()):
+            return
+        _jobs[(doc_hash, kind, difficulty)] = _executor.submit(_top_up, doc_hash, kind, difficulty)
+
+
+def is_filling(doc_hash):
+    with _lock:
+        return any(key[0] == doc_hash and not job.done() for key, job in _jobs.items())
+
+
+# ==================== Serving ====================
+def available(doc_hash, kind, difficulty=None, exclude_questions=()):
+    """Bank items of a slice that are not in exclude_questions."""
+    excluded = {sharding.question_key(q) for q in exclude_questions}
+    items = list(load_bank(doc_hash)[kind])
+    return [item for item in items
+            if (difficulty is None or item.get("difficulty") == difficulty)
+            and sharding.question_key(item["question"]) not in excluded]
+
+
+def draw(doc_hash, kind, num_items, difficulty=None, exclude_questions=()):
+    """
+    Serve up to num_items unseen items from the bank, spread across clusters.
+    Starts a background top-up when the slice is running low.
+    Returns:
+        list: Item dicts (fewer than num_items if the slice is short)
+    """
+    pool = available(doc_hash, kind, difficulty, exclude_questions)
+    by_cluster = {}
+    for item in pool:
+        by_cluster.setdefault(item.get("cluster"), []).append(item)
+    for items in by_cluster.values():
+        random.shuffle(items)
+    served = []
+    while len(served) < num_items and any(by_cluster.values()):
+        for items in by_cluster.values():
+            if items and len(served) < num_items:
+                served.append(items.pop())
+    if len(pool) - len(served) < LOW_WATERMARK:
+        top_up(doc_hash, kind, difficulty)
+    return served
+
+
+def bank_stats(doc_hash):
+    bank = load_bank(doc_hash)
+    return {
+        "mcqs": {difficulty: sum(1 for item in bank["mcqs"] if item.get("difficulty") == difficulty)
+                 for difficulty in DIFFICULTIES},
+        "flashcards": len(bank["flashcards"]),
+        "filling": is_filling(doc_hash),
+    }
@@ -0,0 +1,315 @@
+"""
+Persistent quiz attempts and vectorized quiz analytics.
+
+Every submitted quiz is recorded in a local SQLite database (QUIZ_DB, default
+.cache/quiz_attempts.sqlite3): one row per attempt and one per answered
+question, with the chosen and correct option, time spent, difficulty, focus
+concept and question-bank cluster.
+
+Analytics read the response table into NumPy columns once per process and
+afterwards fetch only rows added since, so per-concept accuracy, difficulty
+calibration and history over time are bincount passes over in-memory arrays,
+whether there are hundreds or hundreds of thousands of recorded answers.
+"""
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+
+import sharding
+
+QUIZ_DB = Path(os.getenv("QUIZ_DB", Path(__file__).resolve().parent / ".cache" / "quiz_attempts.sqlite3"))
+
+DIFFICULTIES = ("Easy", "Medium", "Hard")
+# Observed accuracy at or above which a question behaves as Easy / Medium
+CALIBRATION_BANDS = (0.8, 0.5)
+# Answers a question needs before it counts in the calibration matrix
+MIN_CALIBRATION_ANSWERS = 3
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS attempts (
+    id INTEGER PRIMARY KEY, doc_hash TEXT, concept TEXT, difficulty TEXT,
+    started_at REAL, submitted_at REAL, correct INTEGER, total INTEGER
+);
+CREATE TABLE IF NOT EXISTS concepts (id INTEGER PRIMARY KEY, name TEXT UNIQUE);
+CREATE TABLE IF NOT EXISTS questions (id INTEGER PRIMARY KEY, key TEXT UNIQUE, question TEXT);
+CREATE TABLE IF NOT EXISTS responses (
+    id INTEGER PRIMARY KEY, attempt_id INTEGER, doc_hash TEXT, question_id INTEGER,
+    concept_id INTEGER, difficulty INTEGER, cluster INTEGER, chosen TEXT, correct_answer TEXT,
+    is_correct INTEGER, seconds REAL, answered_at REAL
+);
+CREATE INDEX IF NOT EXISTS responses_doc ON responses (doc_hash, id);
+"""
+# Columns loaded for analytics, in SELECT order
+_COLUMNS = (("id", "int64"), ("question_id", "int64"), ("concept_id", "int64"), ("difficulty", "int64"),
+            ("cluster", "int64"), ("is_correct", "int64"), ("seconds", "float64"), ("answered_at", "float64"))
+
+_lock = threading.Lock()
+_columns = {}
+# Database paths whose schema exists, and each thread's open connections
+_schema_lock = threading.Lock()
+_schema_ready = set()
+_local = threading.local()
+
+
+def _connection():
+    """This thread's connection to QUIZ_DB, creating the schema on the path's first use."""
+    path = str(QUIZ_DB)
+    connections = _local.__dict__.setdefault("connections", {})
+    connection = connections.get(path)
+    if connection is None:
+        QUIZ_DB.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(path, timeout=30)
+        connection.execute("PRAGMA journal_mode=WAL")
+        with _schema_lock:
+            if path not in _schema_ready:
+                connection.executescript(_SCHEMA)
+                _schema_ready.add(path)
+        connections[path] = connection
+    return connection
+
+
+@contextmanager
+def _connect():
+    """The thread's connection, committing on success and rolling back on error."""
+    connection = _connection()
+    with connection:
+        yield connection
+
+
+def _label_id(connection, table, column, value, extra=None):
+    """Id of a row in a lookup table, inserting it if new."""
+    row = connection.execute(f"SELECT id FROM {table} WHERE {column} = ?", (value,)).fetchone()
+    if row:
+        return row[0]
+    if extra:
+        return connection.execute(f"INSERT INTO {table} ({column}, {extra[0]}) VALUES (?, ?)",
+                                  (value, extra[1])).lastrowid
+    return connection.execute(f"INSERT INTO {table} ({column}) VALUES (?)", (value,)).lastrowid
+
+
+def answer_seconds(started_at, answered_at):
+    """
+    Time spent per question, taking questions in the order they were answered.
+    Args:
+        started_at: When the quiz was shown
+        answered_at: Per-question answer timestamps (None if unknown)
+    Returns:
+        np.ndarray: Seconds per question (NaN where unknown)
+    """
+    times = np.array([np.nan if t is None else t for t in answered_at], dtype="float64")
+    known = np.flatnonzero(~np.isnan(times))
+    seconds = np.full(len(times), np.nan)
+    order = known[np.argsort(times[known])]
+    seconds[order] = np.diff(np.concatenate([[started_at], times[order]]))
+    return seconds
+
+
+def record_attempt(doc_hash, mcqs, user_answers, difficulty, concept, started_at=None, answered_at=None):
+    """
+    Record a submitted quiz.
+    Args:
+        doc_hash: Document the quiz was generated from
+        mcqs: MCQ dicts as shown (bank items may carry "difficulty" and "cluster")
+        user_answers: Chosen letters, one per MCQ
+        difficulty: The quiz's requested difficulty
+        concept: Focus concept ("Entire PDF" for whole-document quizzes)
+        started_at: When the quiz was shown
+        answered_at: Per-question answer timestamps
+    Returns:
+        int: The attempt id
+    """
+    now = time.time()
+    started_at = now if started_at is None else started_at
+    answered_at = answered_at or [None] * len(mcqs)
+    seconds = answer_seconds(started_at, answered_at)
+    correct = sum(answer == mcq["correct_answer"] for answer, mcq in zip(user_answers, mcqs))
+    with _lock, _connect() as connection:
+        attempt_id = connection.execute(
+            "INSERT INTO attempts (doc_hash, concept, difficulty, started_at, submitted_at, correct, total) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (doc_hash, concept, difficulty, started_at, now, correct, len(mcqs))
+        ).lastrowid
+        concept_id = _label_id(connection, "concepts", "name", concept or "Entire PDF")
+        rows = []
+        for i, (mcq, answer) in enumerate(zip(mcqs, user_answers)):
+            level = mcq.get("difficulty") or difficulty
+            rows.append((
+                attempt_id, doc_hash,
+                _label_id(connection, "questions", "key", sharding.question_key(mcq["question"]),
+                          ("question", mcq["question"])),
+                concept_id,
+                DIFFICULTIES.index(level) if level in DIFFICULTIES else -1,
+                -1 if mcq.get("cluster") is None else mcq["cluster"],
+                answer, mcq["correct_answer"], int(answer == mcq["correct_answer"]),
+                None if np.isnan(seconds[i]) else float(seconds[i]),
+                answered_at[i] if answered_at[i] is not None else now,
+            ))
+        connection.executemany(
+            "INSERT INTO responses (attempt_id, doc_hash, question_id, concept_id, difficulty, cluster, "
+            "chosen, correct_answer, is_correct, seconds, answered_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            rows
+        )
+    return attempt_id
+
+
+# ==================== Analytics ====================
+def load_columns(doc_hash=None):
+    """
+    Response columns as NumPy arrays (all documents when doc_hash is None).
+    Cached per process; later calls only fetch rows recorded since.
+    Returns:
+        dict: Column name -> array (seconds is NaN where unknown)
+    """
+    with _lock:
+        cached = _columns.get(doc_hash)
+        last_id = int(cached["id"][-1]) if cached is not None and len(cached["id"]) else 0
+        query = ("SELECT " + ", ".join(name for name, _ in _COLUMNS) +
+                 " FROM responses WHERE id > ?" + (" AND doc_hash = ?" if doc_hash else "") + " ORDER BY id")
+        with _connect() as connection:
+            rows = connection.execute(query, (last_id, doc_hash) if doc_hash else (last_id,)).fetchall()
+        fresh = np.array(rows, dtype="float64").reshape(len(rows), len(_COLUMNS))
+        added = {name: fresh[:, i].astype(dtype) for i, (name, dtype) in enumerate(_COLUMNS)}
+        if cached is not None:
+            added = {name: np.concatenate([cached[name], added[name]]) for name in added}
+        _columns[doc_hash] = added
+        return added
+
+
+def _names(table, ids, column=None):
+    """{id: text} for rows of a lookup table (concept name or question text by default)."""
+    column = column or ("name" if table == "concepts" else "question")
+    ids = [int(i) for i in ids]
+    names = {}
+    with _connect() as connection:
+        for start in range(0, len(ids), 900):  # stay under SQLite's bound-parameter limit
+            batch = ids[start:start + 900]
+            placeholders = ",".join("?" * len(batch))
+            names.update(connection.execute(
+                f"SELECT id, {column} FROM {table} WHERE id IN ({placeholders})", batch).fetchall())
+    return names
+
+
+def _group(codes, is_correct, seconds, size=0):
+    """Answered, correct, accuracy and mean seconds per non-negative code (at least size codes)."""
+    size = max(size, int(codes.max()) + 1 if len(codes) else 0)
+    answered = np.bincount(codes, minlength=size)
+    correct = np.bincount(codes, weights=is_correct, minlength=size)
+    timed = ~np.isnan(seconds)
+    timed_count = np.bincount(codes[timed], minlength=size)
+    timed_sum = np.bincount(codes[timed], weights=seconds[timed], minlength=size)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return answered, correct, correct / answered, timed_sum / timed_count
+
+
+def concept_accuracy(doc_hash=None):
+    """
+    Accuracy per focus concept.
+    Returns:
+        list[dict]: {"concept", "answered", "correct", "accuracy", "avg_seconds"}, weakest first
+    """
+    cols = load_columns(doc_hash)
+    answered, correct, accuracy, avg_seconds = _group(cols["concept_id"], cols["is_correct"], cols["seconds"])
+    present = np.flatnonzero(answered)
+    names = _names("concepts", present)
+    rows = [{"concept": names.get(int(i), "?"), "answered": int(answered[i]), "correct": int(correct[i]),
+             "accuracy": float(accuracy[i]),
+             "avg_seconds": None if np.isnan(avg_seconds[i]) else float(avg_seconds[i])}
+            for i in present]
+    return sorted(rows, key=lambda row: row["accuracy"])
+
+
+def cluster_accuracy(doc_hash):
+    """Accuracy per question-bank cluster for one document: {cluster: accuracy}."""
+    cols = load_columns(doc_hash)
+    known = cols["cluster"] >= 0
+    answered, _, accuracy, _ = _group(cols["cluster"][known], cols["is_correct"][known], cols["seconds"][known])
+    return {int(i): float(accuracy[i]) for i in np.flatnonzero(answered)}
+
+
+def difficulty_calibration(doc_hash=None, min_answers=MIN_CALIBRATION_ANSWERS):
+    """
+    How well the requested difficulty matches how students actually do.
+    Returns:
+        dict: {"levels": [{"difficulty", "answered", "accuracy", "avg_seconds"}],
+               "matrix": {labeled: {observed: questions}}} where observed is the
+               level a question's own accuracy falls in (CALIBRATION_BANDS)
+    """
+    cols = load_columns(doc_hash)
+    labeled = cols["difficulty"] >= 0
+    level_codes = cols["difficulty"][labeled]
+    answered, _, accuracy, avg_seconds = _group(level_codes, cols["is_correct"][labeled],
+                                                cols["seconds"][labeled], size=len(DIFFICULTIES))
+    levels = [{"difficulty": name, "answered": int(answered[i]),
+               "accuracy": float(accuracy[i]) if answered[i] else None,
+               "avg_seconds": None if np.isnan(avg_seconds[i]) else float(avg_seconds[i])}
+              for i, name in enumerate(DIFFICULTIES)]
+
+    # Per question: its labeled level (most frequent) against its observed accuracy band
+    questions = cols["question_id"][labeled]
+    q_answered = np.bincount(questions)
+    q_correct = np.bincount(questions, weights=cols["is_correct"][labeled], minlength=len(q_answered))
+    q_level = np.zeros((len(q_answered), len(DIFFICULTIES)))
+    np.add.at(q_level, (questions, level_codes), 1)
+    enough = np.flatnonzero(q_answered >= min_answers)
+    observed = np.digitize(q_correct[enough] / q_answered[enough], CALIBRATION_BANDS[::-1])
+    observed = len(DIFFICULTIES) - 1 - observed  # high accuracy -> Easy (0)
+    matrix = np.zeros((len(DIFFICULTIES), len(DIFFICULTIES)), dtype=int)
+    np.add.at(matrix, (q_level[enough].argmax(axis=1), observed), 1)
+    return {
+        "levels": levels,
+        "matrix": {DIFFICULTIES[i]: {DIFFICULTIES[j]: int(matrix[i, j]) for j in range(len(DIFFICULTIES))}
+                   for i in range(len(DIFFICULTIES))},
+    }
+
+
+def history(doc_hash=None, bucket_days=1):
+    """
+    Answers and accuracy over time in buckets of bucket_days (UTC).
+    Returns:
+        list[dict]: {"date": "YYYY-MM-DD", "answered", "accuracy"} in date order
+    """
+    cols = load_columns(doc_hash)
+    if not len(cols["id"]):
+        return []
+    days = (cols["answered_at"] // (86400 * bucket_days)).astype("int64")
+    buckets, codes = np.unique(days, return_inverse=True)
+    answered = np.bincount(codes)
+    correct = np.bincount(codes, weights=cols["is_correct"])
+    dates = (buckets * bucket_days).astype("datetime64[D]").astype(str).tolist()
+    return [{"date": date, "answered": int(n), "accuracy": float(c / n)}
+            for date, n, c in zip(dates, answered, correct)]
+
+
+def weakest_questions(doc_hash=None, limit=10, min_answers=2):
+    """Questions answered at least min_answers times, lowest accuracy first."""
+    cols = load_columns(doc_hash)
+    if not len(cols["id"]):
+        return []
+    answered = np.bincount(cols["question_id"])
+    correct = np.bincount(cols["question_id"], weights=cols["is_correct"])
+    candidates = np.flatnonzero(answered >= min_answers)
+    worst = candidates[np.argsort(correct[candidates] / answered[candidates], kind="stable")[:limit]]
+    names = _names("questions", worst)
+    return [{"question": names.get(int(i), "?"), "answered": int(answered[i]),
+             "accuracy": float(correct[i] / answered[i])} for i in worst]
+
+
+def question_stats(doc_hash=None):
+    """
+    Answers per question, keyed by sharding.question_key.
+    Returns:
+        dict: key -> (answered, correct)
+    """
+    cols = load_columns(doc_hash)
+    if not len(cols["id"]):
+        return {}
+    answered = np.bincount(cols["question_id"])
+    correct = np.bincount(cols["question_id"], weights=cols["is_correct"], minlength=len(answered))
+    present = np.flatnonzero(answered)
+    keys = _names("questions", present, column="key")
+    return {keys[int(i)]: (int(answered[i]), int(correct[i])) for i in present if int(i) in keys}
@@ -0,0 +1,124 @@
+"""
+Sharded generation for large MCQ sets and flashcard decks.
+
+A request for more than GENERATION_SHARD_SIZE items is split into
+sub-requests of at most that many items. Each sub-request gets its own slice
+of the source content and a small completion budget, and the sub-requests run
+concurrently. Results are merged in shard order, de-duplicated by question
+text and trimmed to the requested count, so latency stays roughly flat as the
+set grows and a bad response only costs its own shard.
+iter_shards yields each shard's items as it finishes, for streamed display.
+"""
+import math
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import coverage_sampling
+import token_budget
+
+SHARD_SIZE = int(os.getenv("GENERATION_SHARD_SIZE", "5"))
+SHARD_MAX_WORKERS = int(os.getenv("GENERATION_SHARD_WORKERS", "4"))
+# Source tokens given to each shard
+SHARD_SOURCE_TOKENS = 1500
+
+
+def shard_counts(total, shard_size=SHARD_SIZE):
+    """Split total items into near-equal shards of at most shard_size."""
+    shards = max(1, math.ceil(total / max(1, shard_size)))
+    base, extra = divmod(total, shards)
+    return [base + (1 if i < extra else 0) for i in range(shards)]
+
+
+def source_slices(text, num_shards, passages=None, embeddings=None, focus_embedding=None,
+                  shard_tokens=SHARD_SOURCE_TOKENS):
+    """
+    Give each shard a different part of the document.
+    With paragraph embeddings, a coverage sample sized for all shards is cut into
+    consecutive slices; otherwise the text is cut into num_shards parts and each
+    part is fitted to shard_tokens.
+    """
+    if passages and embeddings is not None:
+        picked = coverage_sampling.sample_passages(passages, embeddings, num_shards * SHARD_SIZE,
+                                                   max_tokens=shard_tokens * num_shards,
+                                                   focus_embedding=focus_embedding)
+        if len(picked) >= num_shards:
+            groups = [picked[i * len(picked) // num_shards:(i + 1) * len(picked) // num_shards]
+                      for i in range(num_shards)]
+            return ["\n\n".join(passages[i] for i in group) for group in groups]
+    total = token_budget.count_tokens(text)
+    parts = token_budget.split_by_tokens(text, max(1, math.ceil(total / num_shards))) or [text]
+    parts = (parts * num_shards)[:num_shards]  # very short texts: shards share the content
+    return [token_budget.truncate_to_tokens(part, shard_tokens) for part in parts]
+
+
+def question_key(question):
+    """Normalized question text used to spot exact and near-exact repeats."""
+    return re.sub(r"\W+", " ", str(question).lower()).strip()
+
+
+def merge_unique(batches, limit=None):
+    """Concatenate item batches in order, dropping items whose question repeats."""
+    seen, merged = set(), []
+    for batch in batches:
+        for item in batch or []:
+            key = question_key(item.get("question", ""))
+            if not key or key in seen:
+                continue
+            seen.add(key)
+            merged.append(item)
+    return merged[:limit] if limit else merged
+
+
+def generate_in_shards(num_items, slices, generate_shard, shard_size=SHARD_SIZE, max_workers=SHARD_MAX_WORKERS):
+    """
+    Run generate_shard(source_text, count) for every shard concurrently.
+    Args:
+        num_items: Items requested in total
+        slices: Source text per shard (len(slices) shards)
+        generate_shard: Callable returning a list of item dicts; a shard that
+            raises contributes nothing
+    Returns:
+        list: Merged, de-duplicated items, at most num_items
+    """
+    counts = shard_counts(num_items, shard_size)
+    slices = (list(slices) * len(counts))[:len(counts)]
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(counts)))) as pool:
+        futures = [pool.submit(generate_shard, source, count) for source, count in zip(slices, counts)]
+        batches = []
+        for shard, future in enumerate(futures):
+            try:
+                batches.append(future.result())
+            except Exception as e:
+                print(f"[sharding] Shard {shard + 1}/{len(counts)} failed: {e}")
+                batches.append([])
+    return merge_unique(batches, num_items)
+
+
+def iter_shards(num_items, slices, generate_shard, shard_size=SHARD_SIZE, max_workers=SHARD_MAX_WORKERS):
+    """
+    Like generate_in_shards, but yield each shard's items as soon as that shard
+    finishes (in completion order), so a caller can show them while the other
+    shards are still running.
+    Yields:
+        dict: De-duplicated items, at most num_items in total
+    """
+    counts = shard_counts(num_items, shard_size)
+    slices = (list(slices) * len(counts))[:len(counts)]
+    seen, emitted = set(), 0
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(counts)))) as pool:
+        futures = {pool.submit(generate_shard, source, count): shard
+                   for shard, (source, count) in enumerate(zip(slices, counts))}
+        for future in as_completed(futures):
+            try:
+                batch = future.result()
+            except Exception as e:
+                print(f"[sharding] Shard {futures[future] + 1}/{len(counts)} failed: {e}")
+                continue
+            for item in batch or []:
+                key = question_key(item.get("question", ""))
+                if not key or key in seen or emitted >= num_items:
+                    continue
+                seen.add(key)
+                emitted += 1
+                yield item
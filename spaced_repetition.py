@@ -0,0 +1,285 @@
+"""
+Spaced-repetition review of flashcards (SM-2).
+
+Every generated flashcard joins its document's review deck. Card state lives in
+parallel NumPy arrays (ease, interval, repetitions, lapses, due time), and a
+heap of (due, card) entries yields the next due card without scanning the
+deck; entries made stale by a later review are dropped when they reach the top.
+
+Decks persist under REVIEW_DIR (default .cache/reviews), one directory per
+document hash:
+
+    state.npz      snapshot of the arrays and of how far each log was applied
+    cards.jsonl    card text, one line per card, appended as cards are added
+    reviews.jsonl  one line per review, appended as it happens
+
+Adding a card or grading one appends a single line; card text is read by byte
+offset only when the card is shown. Loading a deck reads the snapshot and
+replays the log lines written after it, re-snapshotting when that tail is long.
+"""
+import hashlib
+import heapq
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+import sharding
+
+REVIEW_DIR = Path(os.getenv("REVIEW_DIR", Path(__file__).resolve().parent / ".cache" / "reviews"))
+
+DAY = 86400.0
+INITIAL_EASE = 2.5
+MIN_EASE = 1.3
+# Button labels mapped to SM-2 response quality (0-5; below 3 is a lapse)
+GRADES = {"Again": 1, "Hard": 3, "Good": 4, "Easy": 5}
+# Log lines replayed on load after which a fresh snapshot is written
+SNAPSHOT_EVERY = 500
+
+_FIELDS = {"ease": "float32", "interval": "float32", "repetitions": "int32", "lapses": "int32",
+           "due": "float64", "last_review": "float64", "key": "uint64", "offset": "int64"}
+
+_lock = threading.Lock()
+_decks = {}
+
+
+def schedule(ease, interval, repetitions, quality):
+    """
+    One SM-2 step.
+    Args:
+        ease: Current ease factor
+        interval: Current interval in days
+        repetitions: Successful reviews in a row
+        quality: Response quality 0-5
+    Returns:
+        tuple: (ease, interval in days, repetitions)
+    """
+    if quality < 3:
+        # Start the card over without changing its ease
+        return ease, 1.0, 0
+    ease = max(MIN_EASE, ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+    repetitions += 1
+    if repetitions == 1:
+        interval = 1.0
+    elif repetitions == 2:
+        interval = 6.0
+    else:
+        interval = float(round(interval * ease))
+    return ease, interval, repetitions
+
+
+def _key_hash(question):
+    digest = hashlib.blake2b(sharding.question_key(question).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+class ReviewDeck:
+    """Array-backed SM-2 state for one document's flashcards."""
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.size = 0
+        self._arrays = {name: np.zeros(0, dtype=dtype) for name, dtype in _FIELDS.items()}
+        self._heap = []
+        self._applied = {"cards": 0, "reviews": 0}
+        self._lock = threading.RLock()
+        self._load()
+
+    def __len__(self):
+        return self.size
+
+    def _view(self, name):
+        return self._arrays[name][:self.size]
+
+    # ---------- storage ----------
+    def _file(self, name):
+        return self.directory / name
+
+    def _load(self):
+        try:
+            with np.load(self._file("state.npz")) as state:
+                self.size = int(state["size"])
+                self._arrays = {name: state[name].astype(dtype) for name, dtype in _FIELDS.items()}
+                self._applied = {"cards": int(state["cards_bytes"]), "reviews": int(state["reviews_bytes"])}
+        except (OSError, KeyError, ValueError):
+            pass
+        replayed = self._replay("cards.jsonl", self._register) + self._replay("reviews.jsonl", self._replay_review)
+        self._heap = list(zip(self._view("due").tolist(), range(self.size)))
+        heapq.heapify(self._heap)
+        if replayed >= SNAPSHOT_EVERY:
+            self.snapshot()
+
+    def _replay(self, name, apply):
+        """Apply log lines written after the snapshot. Returns the number replayed."""
+        count = 0
+        try:
+            with open(self._file(name), "rb") as f:
+                f.seek(self._applied[name.split(".")[0]])
+                while True:
+                    offset = f.tell()
+                    line = f.readline()
+                    if not line.endswith(b"\n"):
+                        break  # missing or half-written last line
+                    try:
+                        apply(json.loads(line), offset)
+                    except (ValueError, KeyError, IndexError):
+                        pass
+                    count += 1
+                self._applied[name.split(".")[0]] = f.tell() if line.endswith(b"\n") else offset
+        except OSError:
+            pass
+        return count
+
+    def _replay_review(self, entry, offset):
+        if not 0 <= int(entry["i"]) < self.size:
+            raise IndexError(entry["i"])
+        self._apply(int(entry["i"]), int(entry["q"]), float(entry["t"]))
+
+    def _append(self, name, entries):
+        """Append JSON lines to a log. Returns the byte offset of each line."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        offsets = []
+        with open(self._file(name), "ab") as f:
+            for entry in entries:
+                offsets.append(f.tell())
+                f.write(json.dumps(entry).encode("utf-8") + b"\n")
+            self._applied[name.split(".")[0]] = f.tell()
+        return offsets
+
+    def snapshot(self):
+        """Write the arrays to state.npz so later loads skip the replayed log lines."""
+        with self._lock:
+            path = self._file("state.npz")
+            try:
+                self.directory.mkdir(parents=True, exist_ok=True)
+                tmp = path.with_name(f"state.{threading.get_ident()}.tmp.npz")
+                np.savez(tmp, size=self.size, cards_bytes=self._applied["cards"],
+                         reviews_bytes=self._applied["reviews"],
+                         **{name: array[:self.size] for name, array in self._arrays.items()})
+                os.replace(tmp, path)
+            except OSError as e:
+                print(f"[spaced_repetition] Could not write {path}: {e}")
+
+    # ---------- cards ----------
+    def _grow(self, needed):
+        capacity = len(self._arrays["due"])
+        if needed <= capacity:
+            return
+        capacity = max(needed, 2 * capacity, 64)
+        for name, array in self._arrays.items():
+            grown = np.zeros(capacity, dtype=array.dtype)
+            grown[:self.size] = array[:self.size]
+            self._arrays[name] = grown
+
+    def _register(self, entry, offset):
+        """Give the card logged at offset the next index, due at entry["t"]."""
+        index = self.size
+        self._grow(index + 1)
+        arrays = self._arrays
+        arrays["ease"][index] = INITIAL_EASE
+        arrays["interval"][index] = 0.0
+        arrays["repetitions"][index] = 0
+        arrays["lapses"][index] = 0
+        arrays["due"][index] = float(entry["t"])
+        arrays["last_review"][index] = 0.0
+        arrays["key"][index] = _key_hash(entry["question"])
+        arrays["offset"][index] = offset
+        self.size += 1
+        return index
+
+    def add_cards(self, cards, now=None):
+        """
+        Add flashcards to the deck, skipping questions it already holds.
+        New cards are due immediately.
+        Returns:
+            int: Number of cards added
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            known = set(self._view("key").tolist())
+            entries = []
+            for card in cards:
+                question, answer = card.get("question"), card.get("answer")
+                key = _key_hash(question or "")
+                if question and answer and key not in known:
+                    known.add(key)
+                    entries.append({"question": question, "answer": answer, "t": now})
+            if not entries:
+                return 0
+            for entry, offset in zip(entries, self._append("cards.jsonl", entries)):
+                index = self._register(entry, offset)
+                heapq.heappush(self._heap, (now, index))
+            return len(entries)
+
+    def card(self, index):
+        """The {"question", "answer"} text of a card."""
+        with open(self._file("cards.jsonl"), "rb") as f:
+            f.seek(int(self._arrays["offset"][index]))
+            entry = json.loads(f.readline())
+        return {"question": entry["question"], "answer": entry["answer"]}
+
+    # ---------- reviewing ----------
+    def next_due(self, now=None):
+        """Index of the most overdue card, or None if nothing is due."""
+        now = time.time() if now is None else now
+        with self._lock:
+            due = self._arrays["due"]
+            while self._heap:
+                when, index = self._heap[0]
+                if when != due[index]:
+                    heapq.heappop(self._heap)  # superseded by a later review
+                    continue
+                return index if when <= now else None
+            return None
+
+    def _apply(self, index, quality, now):
+        arrays = self._arrays
+        ease, interval, repetitions = schedule(
+            float(arrays["ease"][index]), float(arrays["interval"][index]),
+            int(arrays["repetitions"][index]), quality
+        )
+        arrays["ease"][index] = ease
+        arrays["interval"][index] = interval
+        arrays["repetitions"][index] = repetitions
+        arrays["lapses"][index] += quality < 3
+        arrays["due"][index] = now + interval * DAY
+        arrays["last_review"][index] = now
+
+    def review(self, index, grade, now=None):
+        """
+        Record a review and reschedule the card.
+        Args:
+            index: Card index (from next_due)
+            grade: A GRADES label or an SM-2 quality 0-5
+        Returns:
+            float: Days until the card is due again
+        """
+        now = time.time() if now is None else now
+        quality = GRADES.get(grade, grade)
+        with self._lock:
+            self._apply(index, int(quality), now)
+            heapq.heappush(self._heap, (float(self._arrays["due"][index]), index))
+            self._append("reviews.jsonl", [{"i": int(index), "q": int(quality), "t": now}])
+            return float(self._arrays["interval"][index])
+
+    def stats(self, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            return {
+                "cards": self.size,
+                "due": int((self._view("due") <= now).sum()),
+                "new": int((self._view("last_review") == 0).sum()),
+                "learned": int((self._view("repetitions") >= 2).sum()),
+                "lapses": int(self._view("lapses").sum()),
+            }
+
+
+def load_deck(doc_hash):
+    """The review deck for a document (loaded once per process)."""
+    with _lock:
+        if doc_hash not in _decks:
+            _decks[doc_hash] = ReviewDeck(REVIEW_DIR / doc_hash)
+        return _decks[doc_hash]
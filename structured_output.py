@@ -0,0 +1,266 @@
+"""
+JSON-mode helpers for structured MCQ / flashcard generation.
+
+- StreamingJSONParser pulls each complete object out of a JSON array as soon as
+  it closes, so truncated or still-streaming output yields every finished item.
+- repair_json() fixes common LLM damage locally (<think> blocks, code fences,
+  trailing commas, raw newlines in strings, unclosed strings/brackets) so a bad
+  response does not need a second LLM round trip.
+"""
+import json
+import re
+
+THINK_OPEN = "<think>"
+THINK_CLOSE = "</think>"
+
+JSON_RESPONSE_FORMAT = {"type": "json_object"}
+
+
+class ThinkTagFilter:
+    """Incrementally drops <think>...</think> content from streamed text."""
+
+    def __init__(self):
+        self._pending = ""
+        self._in_think = False
+
+    def feed(self, chunk):
+        self._pending += chunk
+        out = []
+        while True:
+            if self._in_think:
+                end = self._pending.find(THINK_CLOSE)
+                if end < 0:
+                    # Keep enough to recognise a closing tag split across chunks
+                    self._pending = self._pending[-(len(THINK_CLOSE) - 1):]
+                    return "".join(out)
+                self._pending = self._pending[end + len(THINK_CLOSE):]
+                self._in_think = False
+            else:
+                start = self._pending.find(THINK_OPEN)
+                if start < 0:
+                    keep = _partial_tag_suffix(self._pending, THINK_OPEN)
+                    safe = len(self._pending) - keep
+                    out.append(self._pending[:safe].replace(THINK_CLOSE, ""))
+                    self._pending = self._pending[safe:]
+                    return "".join(out)
+                out.append(self._pending[:start].replace(THINK_CLOSE, ""))
+                self._pending = self._pending[start + len(THINK_OPEN):]
+                self._in_think = True
+
+    def flush(self):
+        rest = "" if self._in_think else self._pending
+        self._pending = ""
+        return rest
+
+
+def _partial_tag_suffix(text, tag):
+    """Length of the longest suffix of text that is a proper prefix of tag."""
+    for size in range(min(len(tag) - 1, len(text)), 0, -1):
+        if text.endswith(tag[:size]):
+            return size
+    return 0
+
+
+class StreamingJSONParser:
+    """
+    Tolerant incremental parser that emits every object found as an element of a
+    JSON array, e.g. each MCQ in {"mcqs": [{...}, {...}]}, as soon as it closes.
+    """
+
+    def __init__(self):
+        self._think = ThinkTagFilter()
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        self._current = None
+        self._capture_depth = None
+
+    def feed(self, chunk):
+        """Consume more text and return the list of newly completed items."""
+        items = []
+        for ch in self._think.feed(chunk):
+            if self._current is not None:
+                self._current.append(ch)
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+            if ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                if ch == "{" and self._current is None and self._stack and self._stack[-1] == "[":
+                    self._current = ["{"]
+                    self._capture_depth = len(self._stack)
+                self._stack.append(ch)
+            elif ch in "}]":
+                if self._stack:
+                    self._stack.pop()
+                if self._current is not None and len(self._stack) == self._capture_depth:
+                    item = loads_lenient("".join(self._current))
+                    if isinstance(item, dict):
+                        items.append(item)
+                    self._current = None
+        return items
+
+    def close(self):
+        """Finish the stream, salvaging a final item that never closed."""
+        items = self.feed(self._think.flush())
+        if self._current is not None:
+            item = loads_lenient("".join(self._current))
+            if isinstance(item, dict):
+                items.append(item)
+            self._current = None
+        return items
+
+
+# ==================== Repair ====================
+def strip_wrappers(text):
+    """Remove <think> blocks and markdown code fences around JSON."""
+    text = re.sub(r"<think>.*?</think>", "", text, flags=re.DOTALL)
+    text = re.sub(r"<think>.*", "", text, flags=re.DOTALL)
+    text = text.replace(THINK_CLOSE, "")
+    text = re.sub(r"```(?:json|JSON)?", "", text)
+    return text.strip()
+
+
+def _close(out, stack, in_string, escape):
+    fixed = list(out)
+    if in_string:
+        if escape:
+            fixed.pop()
+        fixed.append('"')
+    while fixed and fixed[-1] in " \t\r\n,:":
+        fixed.pop()
+    for opener in reversed(stack):
+        fixed.append("}" if opener == "{" else "]")
+    return "".join(fixed)
+
+
+def repair_json(text):
+    """
+    Best-effort local repair of malformed or truncated JSON from an LLM.
+    Returns a string (which may still fail to parse if the damage is severe).
+    """
+    text = strip_wrappers(text or "")
+    starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+    if not starts:
+        return text
+    text = text[min(starts):]
+
+    out = []
+    stack = []
+    in_string = False
+    escape = False
+    checkpoints = []  # (output length, open brackets) just before each comma
+
+    for ch in text:
+        if in_string:
+            if escape:
+                escape = False
+                out.append(ch)
+            elif ch == "\\":
+                escape = True
+                out.append(ch)
+            elif ch == '"':
+                in_string = False
+                out.append(ch)
+            elif ch == "\n":
+                out.append("\\n")
+            elif ch == "\t":
+                out.append("\\t")
+            elif ch != "\r":
+                out.append(ch)
+            continue
+        if ch == '"':
+            in_string = True
+            out.append(ch)
+        elif ch in "{[":
+            stack.append(ch)
+            out.append(ch)
+        elif ch in "}]":
+            # Drop trailing commas before a closer
+            while out and out[-1] in " \t\r\n,":
+                out.pop()
+            if not stack:
+                break
+            out.append("}" if stack.pop() == "{" else "]")
+            if not stack:
+                break  # ignore prose after the top-level value
+        elif ch == ",":
+            checkpoints.append((len(out), list(stack)))
+            out.append(ch)
+        else:
+            out.append(ch)
+
+    as_is = _close(out, stack, in_string, escape)
+    # Output cut off inside a string means the last element is partial: prefer
+    # dropping it over keeping a half-written value
+    if not in_string and _parses(as_is):
+        return as_is
+    for length, open_stack in reversed(checkpoints):
+        candidate = _close(out[:length], open_stack, False, False)
+        if _parses(candidate):
+            return candidate
+    return as_is
+
+
+def _parses(text):
+    try:
+        json.loads(text)
+        return True
+    except ValueError:
+        return False
+
+
+def loads_lenient(text):
+    """json.loads with local repair; returns None when nothing can be recovered."""
+    if not text:
+        return None
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+    try:
+        return json.loads(repair_json(text))
+    except ValueError:
+        return None
+
+
+def extract_items(text, list_key):
+    """
+    Pull the list of item dicts out of a JSON response.
+    Accepts {"<list_key>": [...]}, any object holding a single list, a bare list,
+    or (as a last resort) whatever complete items a streaming pass can salvage.
+    """
+    data = loads_lenient(text)
+    items = None
+    if isinstance(data, dict):
+        if isinstance(data.get(list_key), list):
+            items = data[list_key]
+        else:
+            lists = [value for value in data.values() if isinstance(value, list)]
+            items = lists[0] if lists else None
+    elif isinstance(data, list):
+        items = data
+    if items is None:
+        parser = StreamingJSONParser()
+        items = parser.feed(text or "") + parser.close()
+    return [item for item in items if isinstance(item, dict)]
+
+
+def failed_generation_from_error(error):
+    """
+    Groq answers a JSON-mode validation failure with HTTP 400 and the model's
+    output in error.failed_generation; return that text so it can be repaired.
+    """
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return response.json().get("error", {}).get("failed_generation")
+    except ValueError:
+        return None
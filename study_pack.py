@@ -0,0 +1,46 @@
+"""
+Study pack: flashcards and MCQs generated together from one shared source text.
+
+The source text is prepared once, as a coverage sample across embedding
+clusters when paragraph embeddings are available (coverage_sampling.py) or else as the
+shared condensation (digest.condensed_text). The flashcard and MCQ calls then
+run concurrently on that shared text, so a pack takes about as long as the
+slower of the two.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+import coverage_sampling
+import digest
+import flashcards
+import mcq_generator
+import token_budget
+
+# Below this size the generators use the text directly
+CONDENSE_MIN_TOKENS = 750
+
+
+def generate_study_pack(text, num_cards, num_questions, difficulty, concept,
+                        groq_api_key, groq_api_url, groq_model,
+                        passages=None, embeddings=None, focus_embedding=None):
+    """
+    Generate flashcards and MCQs concurrently from one shared source text.
+    Returns:
+        tuple: (list of flashcard dicts, list of MCQ dicts)
+    """
+    condensed = None
+    if token_budget.count_tokens(text) > CONDENSE_MIN_TOKENS:
+        if passages and embeddings is not None:
+            condensed = coverage_sampling.sample_text(passages, embeddings, num_cards + num_questions,
+                                                      focus_embedding=focus_embedding) or None
+        if condensed is None:
+            try:
+                condensed = digest.condensed_text(text, groq_api_key, groq_api_url, groq_model)
+            except Exception as e:
+                print(f"[study_pack] Condensation failed, generators will fall back: {e}")
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        cards = pool.submit(flashcards.generate_flashcards, text, num_cards, concept,
+                            groq_api_key, groq_api_url, groq_model, condensed_text=condensed)
+        mcqs = pool.submit(mcq_generator.generate_mcqs, text, num_questions, difficulty, concept,
+                           groq_api_key, groq_api_url, groq_model, condensed_text=condensed)
+        return cards.result(), mcqs.result()
@@ -1,37 +1,36 @@
-import requests
 import math
 import io
-import pandas as pd
 import textwrap
 from reportlab.lib.pagesizes import letter
 from reportlab.pdfgen import canvas
 import re
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import chunking
+import exports
+import extractive
+import llm_client
+import summary_cache
+import token_budget
+
+# Concurrent map-phase requests per summary
+SUMMARY_MAX_WORKERS = int(os.getenv("SUMMARY_MAX_WORKERS", "4"))
+# Summaries combined per call in each level of a tree reduce
+REDUCE_GROUP_SIZE = int(os.getenv("SUMMARY_REDUCE_GROUP_SIZE", "8"))
 
 # Configuration parameters now come from the calling function
 def grok_generate(prompt, grok_api_key, grok_api_url, grok_model, 
-                 system_prompt=None, temperature=0.7, max_tokens=1024):
+                 system_prompt=None, temperature=0.7, max_tokens=1024, feature="summary"):
     """Helper to query Grok API. Automatically cleans <think> tags from output."""
-    headers = {
-        "Authorization": f"Bearer {grok_api_key}",
-        "Content-Type": "application/json"
-    }
-    
-    messages = []
-    if system_prompt:
-        messages.append({"role": "system", "content": system_prompt})
-    messages.append({"role": "user", "content": prompt})
-    
-    payload = {
-        "model": grok_model,
-        "messages": messages,
-        "temperature": temperature,
-        "max_tokens": max_tokens
-    }
-    
     try:
-        response = requests.post(grok_api_url, headers=headers, json=payload)
-        response.raise_for_status()
-        raw_output = response.json()["choices"][0]["message"]["content"]
+        raw_output = llm_client.complete(
+            prompt, grok_api_key, grok_api_url, grok_model,
+            feature=feature,
+            system_prompt=system_prompt,
+            temperature=temperature,
+            max_tokens=max_tokens
+        )
         return clean_generated_text(raw_output)  # Clean here
     except Exception as e:
         return f"[Error] {str(e)}"
@@ -56,7 +55,85 @@ def clean_generated_text(text):
     # Clean up extra whitespace
     return ' '.join(text.split()).strip()
 
-def summarize_pdf(text, num_words, concept, grok_api_key, grok_api_url, grok_model):
+def summarize_chunk(chunk, words_per_chunk, grok_api_key, grok_api_url, grok_model, retries=1):
+    """
+    Map step: summarize one chunk. Raises on failure (after retries) instead of
+    returning an "[Error]" string, so the caller can leave the chunk out.
+    """
+    prompt = f"""Create a brief summary of about {words_per_chunk} words:
+        {chunk}"""
+    for attempt in range(retries + 1):
+        try:
+            summary = clean_generated_text(llm_client.complete(
+                prompt, grok_api_key, grok_api_url, grok_model,
+                feature="summary_map"
+            ))
+            if summary:
+                return summary
+            raise ValueError("Empty chunk summary")
+        except Exception:
+            if attempt == retries:
+                raise
+
+def combine_group(summaries, num_words, focus, grok_api_key, grok_api_url, grok_model):
+    """Intermediate reduce step: merge one group of summaries into one."""
+    template = f"Merge these partial summaries into one summary of about {num_words} words, keeping all key points:\nFocus: {focus}"
+    combined = token_budget.fit_to_budget(" ".join(summaries), grok_model, 1024, prompt_template=template)
+    prompt = f"""Merge these partial summaries into one summary of about {num_words} words, keeping all key points:
+    {combined}
+    Focus: {focus}"""
+    result = clean_generated_text(llm_client.complete(
+        prompt, grok_api_key, grok_api_url, grok_model,
+        feature="summary_combine"
+    ))
+    if not result:
+        raise ValueError("Empty combined summary")
+    return result
+
+def tree_reduce(summaries, num_words, focus, grok_api_key, grok_api_url, grok_model,
+                group_size=REDUCE_GROUP_SIZE, max_workers=SUMMARY_MAX_WORKERS, on_progress=None):
+    """
+    Combine summaries in fixed-size groups, level by level (each level in
+    parallel), until they fit a single final prompt. Returns (summaries, levels).
+    Every call sees at most group_size inputs, so per-call latency is bounded
+    regardless of document size.
+    on_progress("combine", groups_done, groups_total, level, None) is called from
+    the caller's thread as each group finishes.
+    """
+    group_size = max(2, group_size)
+    levels = 0
+    final_template = f"Combine these into one cohesive summary of {num_words} words:\nFocus: {focus}"
+    budget = token_budget.prompt_budget(grok_model, 1024) - token_budget.count_tokens(final_template)
+
+    while len(summaries) > group_size or token_budget.count_tokens(" ".join(summaries)) > budget:
+        if len(summaries) == 1:
+            break
+        groups = [summaries[i:i + group_size] for i in range(0, len(summaries), group_size)]
+        merged = [None] * len(groups)
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(groups)))) as pool:
+            futures = {
+                pool.submit(combine_group, group, num_words, focus, grok_api_key, grok_api_url, grok_model): idx
+                for idx, group in enumerate(groups)
+            }
+            for done, future in enumerate(as_completed(futures), 1):
+                idx = futures[future]
+                try:
+                    merged[idx] = future.result()
+                except Exception as e:
+                    # Keep the group's content, cut to the size a merged summary would have
+                    print(f"[summary] Reduce group {idx + 1}/{len(groups)} at level {levels + 1} failed: {e}")
+                    merged[idx] = token_budget.truncate_to_tokens(" ".join(groups[idx]), num_words * 2)
+                if on_progress:
+                    on_progress("combine", done, len(groups), levels + 1, None)
+        summaries = merged
+        levels += 1
+    return summaries, levels
+
+def summarize_pdf(text, num_words, concept, grok_api_key, grok_api_url, grok_model,
+                  max_workers=SUMMARY_MAX_WORKERS, timings=None, reduce_mode="auto",
+                  group_size=REDUCE_GROUP_SIZE, use_cache=True, pages=None, chunker="semantic",
+                  on_progress=None, passages=None, embeddings=None, focus_embedding=None,
+                  section_summaries=None, doc_hash=None):
     """
     Summarize the given text using Grok API.
     Args:
@@ -66,9 +143,60 @@ def summarize_pdf(text, num_words, concept, grok_api_key, grok_api_url, grok_mod
         grok_api_key: API key
         grok_api_url: API endpoint
         grok_model: Model to use
+        max_workers: Concurrent map-phase requests
+        timings: Optional dict filled with per-phase timings and chunk counts
+        reduce_mode: "flat" combines all chunk summaries in one call (truncated to
+            the budget); "tree" / "auto" combine in groups over several levels
+            when they do not fit one call
+        group_size: Summaries merged per call in tree mode
+        use_cache: Reuse chunk summaries from the on-disk summary_cache
+        pages: Optional per-page texts from extraction (page breaks become chunk boundaries)
+        chunker: "semantic" packs whole paragraphs/sections up to the token budget;
+            "tokens" cuts every max_chunk_tokens tokens
+        on_progress: Optional callback on_progress(stage, done, total, index, text),
+            always called from the caller's thread:
+            ("map", chunks_done, chunks_total, chunk_index, chunk_summary or None)
+            ("combine", groups_done, groups_total, level, None) during a tree reduce
+            ("reduce", 0, 1, None, None) when the final combine call starts
+        passages: Optional paragraphs of text with their embeddings; when the
+            document is larger than the selection budget for num_words, only the
+            most central, diverse passages are summarized (see extractive.py)
+        embeddings: Embedding rows for passages
+        focus_embedding: Optional embedding of the focus concept to steer the selection
+        section_summaries: Optional precomputed section summaries (from digest.py);
+            when given, the text is not re-read and only the reduce step runs
+        doc_hash: Optional summary_cache.document_hash of text (e.g. the session's),
+            saves re-hashing it
     """
-    max_chunk_size = 10000
-    chunks = [text[i:i+max_chunk_size] for i in range(0, len(text), max_chunk_size)]
+    timings = timings if timings is not None else {}
+    start = time.perf_counter()
+
+    if section_summaries:
+        # Section summaries from the document digest stand in for the map phase
+        timings.update({"chunks": len(section_summaries), "digest_sections": len(section_summaries),
+                        "map_seconds": 0.0, "failed_chunks": 0})
+        return reduce_summaries(list(section_summaries), num_words, concept, grok_api_key, grok_api_url,
+                                grok_model, timings, start, reduce_mode=reduce_mode, group_size=group_size,
+                                max_workers=max_workers, on_progress=on_progress)
+
+    # The chunk cache is keyed on the whole document, not on a length-dependent selection
+    doc_hash = doc_hash or summary_cache.document_hash(text)
+    preselected = False
+    if passages and embeddings is not None and len(passages) == len(embeddings):
+        if token_budget.count_tokens(text) > extractive.selection_budget(num_words):
+            text, selected = extractive.preselect_text(passages, embeddings, num_words, focus_embedding)
+            pages = None
+            preselected = True
+            timings["selected_passages"] = selected
+            timings["total_passages"] = len(passages)
+
+    # ~2500 tokens is roughly the old 10000-character slice
+    max_chunk_tokens = chunking.DEFAULT_CHUNK_TOKENS
+    if chunker == "semantic":
+        chunks = chunking.chunk_for_summary(text, max_chunk_tokens, pages=pages) or [text]
+    else:
+        chunks = token_budget.split_by_tokens(text, max_chunk_tokens)
+    timings["chunks"] = len(chunks)
     
     if concept.lower() == "entire pdf":
         concept_instruction = "Summarize the entire content comprehensively."
@@ -80,23 +208,117 @@ def summarize_pdf(text, num_words, concept, grok_api_key, grok_api_url, grok_mod
         {concept_instruction}
         Content to summarize:
         {text}"""
-        return grok_generate(prompt, grok_api_key, grok_api_url, grok_model)
+        result = grok_generate(prompt, grok_api_key, grok_api_url, grok_model)
+        timings["map_seconds"] = 0.0
+        timings["reduce_seconds"] = timings["total_seconds"] = time.perf_counter() - start
+        timings["failed_chunks"] = 0
+        return result
 
-    # Multi-chunk processing
-    chunk_summaries = []
-    words_per_chunk = max(30, math.floor(num_words / len(chunks)))
+    # Multi-chunk processing: map phase runs concurrently, results kept in order.
+    # Chunk summaries are generated at a canonical length so they can be cached.
+    words_per_chunk = summary_cache.canonical_words(max(30, math.floor(num_words / len(chunks))))
+    # Chunks of a selection move between requests, so they are keyed by content only
+    cache_keys = ["selected" if preselected else idx for idx in range(len(chunks))]
+    chunk_summaries = [None] * len(chunks)
+    failed = []
 
-    for chunk in chunks:
-        prompt = f"""Create a brief summary of about {words_per_chunk} words:
-        {chunk}"""
-        summary = grok_generate(prompt, grok_api_key, grok_api_url, grok_model)
-        chunk_summaries.append(summary)
+    map_start = time.perf_counter()
+    if use_cache:
+        for idx, chunk in enumerate(chunks):
+            chunk_summaries[idx] = summary_cache.get(doc_hash, cache_keys[idx], words_per_chunk, chunk)
+    pending = [idx for idx, cached in enumerate(chunk_summaries) if cached is None]
+    timings["cached_chunks"] = len(chunks) - len(pending)
+    done = 0
+    if on_progress:
+        for idx, cached in enumerate(chunk_summaries):
+            if cached is not None:
+                done += 1
+                on_progress("map", done, len(chunks), idx, cached)
+
+    if pending:
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(pending)))) as pool:
+            futures = {
+                pool.submit(summarize_chunk, chunks[idx], words_per_chunk, grok_api_key, grok_api_url, grok_model): idx
+                for idx in pending
+            }
+            for future in as_completed(futures):
+                idx = futures[future]
+                done += 1
+                try:
+                    chunk_summaries[idx] = future.result()
+                except Exception as e:
+                    failed.append(idx)
+                    print(f"[summary] Chunk {idx + 1}/{len(chunks)} failed: {e}")
+                    if on_progress:
+                        on_progress("map", done, len(chunks), idx, None)
+                    continue
+                if use_cache:
+                    summary_cache.put(doc_hash, cache_keys[idx], words_per_chunk, chunks[idx], chunk_summaries[idx])
+                if on_progress:
+                    on_progress("map", done, len(chunks), idx, chunk_summaries[idx])
+    timings["map_seconds"] = time.perf_counter() - map_start
+    timings["failed_chunks"] = len(failed)
+
+    chunk_summaries = [summary for summary in chunk_summaries if summary]
+    if not chunk_summaries:
+        timings["reduce_seconds"] = 0.0
+        timings["total_seconds"] = time.perf_counter() - start
+        return f"[Error] All {len(chunks)} chunks failed to summarize."
 
+    return reduce_summaries(chunk_summaries, num_words, concept, grok_api_key, grok_api_url, grok_model,
+                            timings, start, reduce_mode=reduce_mode, group_size=group_size,
+                            max_workers=max_workers, on_progress=on_progress)
+
+def reduce_summaries(chunk_summaries, num_words, concept, grok_api_key, grok_api_url, grok_model,
+                     timings, start, reduce_mode="auto", group_size=REDUCE_GROUP_SIZE,
+                     max_workers=SUMMARY_MAX_WORKERS, on_progress=None):
+    """Reduce step: combine chunk (or digest section) summaries into the final summary."""
+    focus = concept if concept.lower() != 'entire pdf' else 'all key aspects'
+    reduce_start = time.perf_counter()
+    timings["reduce_levels"] = 1
+    if reduce_mode in ("auto", "tree"):
+        chunk_summaries, levels = tree_reduce(
+            chunk_summaries, num_words, focus, grok_api_key, grok_api_url, grok_model,
+            group_size=group_size, max_workers=max_workers, on_progress=on_progress
+        )
+        timings["reduce_levels"] += levels
+    combined = token_budget.fit_to_budget(
+        " ".join(chunk_summaries), grok_model, 1024,
+        prompt_template=f"Combine these into one cohesive summary of {num_words} words:\nFocus: {focus}"
+    )
     final_prompt = f"""Combine these into one cohesive summary of {num_words} words:
-    {" ".join(chunk_summaries)}
-    Focus: {concept if concept.lower() != 'entire pdf' else 'all key aspects'}"""
-    
-    return grok_generate(final_prompt, grok_api_key, grok_api_url, grok_model)
+    {combined}
+    Focus: {focus}"""
+
+    if on_progress:
+        on_progress("reduce", 0, 1, None, None)
+    result = grok_generate(final_prompt, grok_api_key, grok_api_url, grok_model, feature="summary_reduce")
+    timings["reduce_seconds"] = time.perf_counter() - reduce_start
+    timings["total_seconds"] = time.perf_counter() - start
+    return result
+
+def format_timings(timings):
+    """One-line description of summarize_pdf timings for display."""
+    if not timings:
+        return ""
+    if timings.get("chapters"):
+        text = f"{timings['chapters']} chapter(s) · total {timings.get('total_seconds', 0):.1f}s"
+        if timings.get("cached_chapters"):
+            text += f" · {timings['cached_chapters']} from cache"
+        return text
+    text = (f"{timings.get('chunks', 0)} chunk(s) · map {timings.get('map_seconds', 0):.1f}s · "
+            f"reduce {timings.get('reduce_seconds', 0):.1f}s · total {timings.get('total_seconds', 0):.1f}s")
+    if timings.get("digest_sections"):
+        text += " · from document digest"
+    if timings.get("selected_passages"):
+        text += f" · {timings['selected_passages']}/{timings['total_passages']} passages selected"
+    if timings.get("cached_chunks"):
+        text += f" · {timings['cached_chunks']} from cache"
+    if timings.get("reduce_levels", 1) > 1:
+        text += f" · {timings['reduce_levels']} reduce levels"
+    if timings.get("failed_chunks"):
+        text += f" · {timings['failed_chunks']} chunk(s) skipped after errors"
+    return text
 
 def create_summary_pdf(summary_history, filename="summaries.pdf"):
     buffer = io.BytesIO()
@@ -139,19 +361,12 @@ def create_summary_pdf(summary_history, filename="summaries.pdf"):
             y_position = page_height - 50
 
     c.save()
-    buffer.seek(0)
-    return buffer
+    return buffer.getvalue()
 
 def create_summary_csv(summaries):
     """Create CSV content from summaries."""
-    data = []
-    for i, summary in enumerate(summaries, 1):
-        data.append({
-            "Summary #": i,
-            "Original Length": summary['original_length'],
-            "Requested Length": summary['requested_words'],
-            "Summary Text": summary['summary_text']
-        })
-    
-    df = pd.DataFrame(data)
-    return df.to_csv(index=False)
\ No newline at end of file
+    return exports.build_csv(
+        ["Summary #", "Original Length", "Requested Length", "Summary Text"],
+        ((i, summary['original_length'], summary['requested_words'], summary['summary_text'])
+         for i, summary in enumerate(summaries, 1))
+    )
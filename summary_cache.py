@@ -0,0 +1,113 @@
+"""
+On-disk cache of map-phase chunk summaries.
+
+Chunk summaries barely depend on the requested summary length, so they are
+stored per document hash, chunk index and a few canonical word counts. A later
+summary request with a different length or focus then only pays for the
+reduce step. Files live under SUMMARY_CACHE_DIR (default .cache/chunk_summaries)
+and survive restarts:
+
+    <cache dir>/<document hash>/w<words>/<chunk index>_<chunk hash>.txt
+
+Chunks of an extractive selection (which shifts with the requested length)
+use "selected" in place of the chunk index, so only their content matters.
+Finished chapter summaries are kept apart, per page range, length and focus:
+
+    <cache dir>/<document hash>/chapters/p<start>-<end>_w<words>_<focus hash>.txt
+"""
+import hashlib
+import os
+import shutil
+import threading
+from pathlib import Path
+
+CACHE_DIR = Path(os.getenv("SUMMARY_CACHE_DIR", Path(__file__).resolve().parent / ".cache" / "chunk_summaries"))
+
+# Word counts chunk summaries are generated at; requests snap up to the nearest one
+CANONICAL_WORDS = (50, 100, 200, 400)
+
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "writes": 0}
+
+
+def document_hash(text):
+    """Hash identifying a document's extracted text."""
+    return hashlib.sha256(text.encode("utf-8", errors="ignore")).hexdigest()[:32]
+
+
+def _chunk_hash(chunk):
+    return hashlib.sha256(chunk.encode("utf-8", errors="ignore")).hexdigest()[:12]
+
+
+def canonical_words(words):
+    """Snap a per-chunk word target to the nearest canonical granularity at or above it."""
+    for size in CANONICAL_WORDS:
+        if words <= size:
+            return size
+    return CANONICAL_WORDS[-1]
+
+
+def _path(doc_hash, chunk_index, words, chunk):
+    # The chunk hash guards against serving a summary for differently chunked text
+    return CACHE_DIR / doc_hash / f"w{words}" / f"{chunk_index}_{_chunk_hash(chunk)}.txt"
+
+
+def get(doc_hash, chunk_index, words, chunk):
+    """Return the cached summary for a chunk, or None."""
+    return _read(_path(doc_hash, chunk_index, words, chunk))
+
+
+def put(doc_hash, chunk_index, words, chunk, summary):
+    """Store a chunk summary (atomic write, safe from worker threads)."""
+    _write(_path(doc_hash, chunk_index, words, chunk), summary)
+
+
+def _chapter_path(doc_hash, chapter, words, focus):
+    return CACHE_DIR / doc_hash / "chapters" / \
+        f"p{chapter['start_page']}-{chapter['end_page']}_w{words}_{_chunk_hash(focus)}.txt"
+
+
+def get_chapter(doc_hash, chapter, words, focus):
+    """Return the cached finished summary of a chapter, or None."""
+    return _read(_chapter_path(doc_hash, chapter, words, focus))
+
+
+def put_chapter(doc_hash, chapter, words, focus, summary):
+    """Store a chapter's finished summary for this length and focus."""
+    _write(_chapter_path(doc_hash, chapter, words, focus), summary)
+
+
+def _read(path):
+    try:
+        summary = path.read_text(encoding="utf-8")
+    except OSError:
+        summary = None
+    with _stats_lock:
+        _stats["hits" if summary else "misses"] += 1
+    return summary or None
+
+
+def _write(path, summary):
+    if not summary:
+        return
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+        tmp.write_text(summary, encoding="utf-8")
+        os.replace(tmp, path)
+    except OSError as e:
+        print(f"[summary_cache] Could not write {path}: {e}")
+        return
+    with _stats_lock:
+        _stats["writes"] += 1
+
+
+def clear(doc_hash=None):
+    """Delete cached summaries for one document, or the whole cache."""
+    target = CACHE_DIR / doc_hash if doc_hash else CACHE_DIR
+    shutil.rmtree(target, ignore_errors=True)
+
+
+def get_stats():
+    with _stats_lock:
+        return dict(_stats)
@@ -0,0 +1,203 @@
+"""
+Token counting, per-model prompt budgets and per-feature usage accounting.
+
+Counts use tiktoken's cl100k_base encoding when it is installed. It is not the
+exact Qwen/Llama vocabulary, so SAFETY_MARGIN leaves slack for the difference.
+Without tiktoken a word/punctuation regex is used as an approximation.
+"""
+import json
+import os
+import re
+import threading
+
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+except Exception:  # tiktoken missing or its vocab file cannot be downloaded
+    _ENCODING = None
+
+# Context windows (prompt + completion) in tokens.
+# Override with LLM_CONTEXT_WINDOWS='{"model-name": 32768}'.
+MODEL_CONTEXT_WINDOWS = {
+    "qwen/qwen3-32b": 131072,
+    "llama-3.1-8b-instant": 131072,
+    "llama-3.3-70b-versatile": 131072,
+    "openai/gpt-oss-20b": 131072,
+    "openai/gpt-oss-120b": 131072,
+    "gemma2-9b-it": 8192,
+}
+DEFAULT_CONTEXT_WINDOW = 8192
+
+# Hard cap on prompt tokens per request regardless of the context window, to keep
+# single calls inside provider tokens-per-minute limits. Override with LLM_MAX_PROMPT_TOKENS.
+MAX_PROMPT_TOKENS = int(os.getenv("LLM_MAX_PROMPT_TOKENS", "12000"))
+
+SAFETY_MARGIN = 256
+MESSAGE_OVERHEAD_TOKENS = 4  # role and separator tokens per chat message
+
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+
+class PromptBudgetError(ValueError):
+    """Raised when a prompt does not fit the model's token budget."""
+
+
+def _context_overrides():
+    raw = os.getenv("LLM_CONTEXT_WINDOWS")
+    if not raw:
+        return {}
+    try:
+        return {k: int(v) for k, v in json.loads(raw).items()}
+    except (ValueError, TypeError, AttributeError):
+        return {}
+
+
+def context_window(model):
+    """Return the context window (in tokens) for a model."""
+    overrides = _context_overrides()
+    if model in overrides:
+        return overrides[model]
+    return MODEL_CONTEXT_WINDOWS.get(model, DEFAULT_CONTEXT_WINDOW)
+
+
+def prompt_budget(model, max_tokens):
+    """Tokens available for the prompt once the completion is reserved."""
+    available = context_window(model) - max_tokens - SAFETY_MARGIN
+    return max(0, min(available, MAX_PROMPT_TOKENS))
+
+
+# ==================== Counting ====================
+def count_tokens(text):
+    """Count tokens in a string."""
+    if not text:
+        return 0
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text, disallowed_special=()))
+    return len(_TOKEN_PATTERN.findall(text))
+
+
+def count_message_tokens(messages):
+    """Count tokens for a list of chat messages including per-message overhead."""
+    total = 2  # priming tokens for the assistant reply
+    for message in messages:
+        total += MESSAGE_OVERHEAD_TOKENS + count_tokens(str(message.get("content", "")))
+    return total
+
+
+def truncate_to_tokens(text, max_tokens):
+    """Cut text down to at most max_tokens tokens, keeping the beginning."""
+    if not text or max_tokens <= 0:
+        return ""
+    if _ENCODING is not None:
+        tokens = _ENCODING.encode(text, disallowed_special=())
+        if len(tokens) <= max_tokens:
+            return text
+        return _ENCODING.decode(tokens[:max_tokens])
+    for i, match in enumerate(_TOKEN_PATTERN.finditer(text)):
+        if i == max_tokens:
+            return text[:match.start()].rstrip()
+    return text
+
+
+def split_by_tokens(text, max_tokens):
+    """Split text into consecutive pieces of at most max_tokens tokens each."""
+    if not text:
+        return []
+    if _ENCODING is not None:
+        tokens = _ENCODING.encode(text, disallowed_special=())
+        return [_ENCODING.decode(tokens[i:i + max_tokens]) for i in range(0, len(tokens), max_tokens)]
+    starts = [m.start() for m in _TOKEN_PATTERN.finditer(text)]
+    cuts = starts[max_tokens::max_tokens]
+    bounds = [0] + cuts + [len(text)]
+    return [text[bounds[i]:bounds[i + 1]] for i in range(len(bounds) - 1) if text[bounds[i]:bounds[i + 1]].strip()]
+
+
+# ==================== Budget Enforcement ====================
+def fit_to_budget(text, model, max_tokens, prompt_template=""):
+    """
+    Truncate `text` so that prompt_template + text fits the prompt budget.
+    prompt_template is the rest of the prompt (instructions etc.) without the text.
+    """
+    available = prompt_budget(model, max_tokens) - count_tokens(prompt_template) - MESSAGE_OVERHEAD_TOKENS - 2
+    return truncate_to_tokens(text, available)
+
+
+def enforce_budget(messages, model, max_tokens):
+    """
+    Check that messages fit the model's budget. Returns the prompt token count.
+    Raises PromptBudgetError when the prompt is too large.
+    """
+    prompt_tokens = count_message_tokens(messages)
+    budget = prompt_budget(model, max_tokens)
+    if prompt_tokens > budget:
+        raise PromptBudgetError(
+            f"Prompt is {prompt_tokens} tokens but {model} allows {budget} "
+            f"(context {context_window(model)}, {max_tokens} reserved for the answer)."
+        )
+    return prompt_tokens
+
+
+# ==================== Usage Accounting ====================
+_usage_lock = threading.Lock()
+_usage = {}
+
+
+def record_usage(feature, model, prompt_tokens, completion_tokens, latency):
+    """Record one completed call for a feature (e.g. "mcq_fallback")."""
+    with _usage_lock:
+        entry = _usage.setdefault(feature, {
+            "calls": 0,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "latency_seconds": 0.0,
+            "models": set(),
+        })
+        entry["calls"] += 1
+        entry["prompt_tokens"] += int(prompt_tokens or 0)
+        entry["completion_tokens"] += int(completion_tokens or 0)
+        entry["latency_seconds"] += latency
+        entry["models"].add(model)
+
+
+def feature_tab(feature):
+    """Map a feature name like "flashcards_fallback" to its tab ("flashcards")."""
+    return feature.split("_", 1)[0]
+
+
+def get_usage_report(by_tab=False):
+    """
+    Return usage rows sorted by total tokens, one per feature (or per tab).
+    Each row has calls, prompt/completion tokens and average latency.
+    """
+    with _usage_lock:
+        snapshot = {name: dict(entry, models=set(entry["models"])) for name, entry in _usage.items()}
+
+    if by_tab:
+        grouped = {}
+        for name, entry in snapshot.items():
+            tab = grouped.setdefault(feature_tab(name), {
+                "calls": 0, "prompt_tokens": 0, "completion_tokens": 0,
+                "latency_seconds": 0.0, "models": set(),
+            })
+            for key in ("calls", "prompt_tokens", "completion_tokens", "latency_seconds"):
+                tab[key] += entry[key]
+            tab["models"] |= entry["models"]
+        snapshot = grouped
+
+    rows = []
+    for name, entry in snapshot.items():
+        rows.append({
+            "feature": name,
+            "calls": entry["calls"],
+            "prompt_tokens": entry["prompt_tokens"],
+            "completion_tokens": entry["completion_tokens"],
+            "total_tokens": entry["prompt_tokens"] + entry["completion_tokens"],
+            "avg_latency_s": round(entry["latency_seconds"] / entry["calls"], 3) if entry["calls"] else 0.0,
+            "models": ", ".join(sorted(entry["models"])),
+        })
+    return sorted(rows, key=lambda row: row["total_tokens"], reverse=True)
+
+
+def reset_usage():
+    with _usage_lock:
+        _usage.clear()